@@ -16,6 +16,7 @@
 ================================================
 """
 # Stdlib
+import copy
 import logging
 import os
 import struct
@@ -23,6 +24,15 @@ import threading
 from itertools import product
 
 # SCION
+from endhost.sciond_api import (
+    API_ADDR_REQ,
+    API_BATCH_PATH_REQ,
+    API_PATH_REQ,
+    AsyncAPIServer,
+    pack_batch_path_reply,
+    parse_batch_path_request,
+)
+from external.expiring_dict import ExpiringDict
 from infrastructure.scion_elem import SCIONElement
 from lib.crypto.hash_chain import HashChain
 from lib.defines import (
@@ -31,7 +41,7 @@ from lib.defines import (
     SCION_UDP_EH_DATA_PORT,
     SCION_UDP_PORT,
 )
-from lib.errors import SCIONServiceLookupError
+from lib.errors import SCIONParseError, SCIONServiceLookupError
 from lib.log import log_exception
 from lib.packet.host_addr import haddr_parse
 from lib.packet.path import PathCombinator, SCIONPath
@@ -52,6 +62,19 @@ from lib.util import SCIONTime
 SCIOND_API_SOCKDIR = "/run/shm/sciond/"
 
 
+class _PathCacheEntry(object):
+    """
+    Paths resolved for a (destination, flags) pair, along with the segment db
+    generations they were resolved from. The list of paths is empty if none
+    could be resolved.
+    """
+    def __init__(self, generations, paths):  # pragma: no cover
+        self.generations = generations
+        self.paths = paths
+        # Reply to an API path request, built on first use.
+        self.api_reply = None
+
+
 class SCIONDaemon(SCIONElement):
     """
     The SCION Daemon used for retrieving and combining paths.
@@ -63,11 +86,17 @@ class SCIONDaemon(SCIONElement):
     # Time a path segment is cached at a host (in seconds).
     SEGMENT_TTL = 300
     MAX_SEG_NO = 5  # TODO: replace by config variable.
+    # Max number of (destination, flags) pairs to cache resolved paths for.
+    PATH_CACHE_SIZE = 1000
 
     def __init__(self, conf_dir, addr, api_addr, run_local_api=False,
-                 port=SCION_UDP_PORT):
+                 port=SCION_UDP_PORT, async_api=False):
         """
         Initialize an instance of the class SCIONDaemon.
+
+        :param bool async_api:
+            Serve the local API from an asyncio event loop (see
+            :mod:`endhost.sciond_api`), instead of a thread per request.
         """
         super().__init__("sciond", conf_dir, host_addr=addr, port=port)
         # TODO replace by pathstore instance
@@ -77,12 +106,24 @@ class SCIONDaemon(SCIONElement):
                                            max_res_no=self.MAX_SEG_NO)
         self.core_segments = PathSegmentDB(segment_ttl=self.SEGMENT_TTL,
                                            max_res_no=self.MAX_SEG_NO)
+        # Maps (dst_ia, flags) to a _PathCacheEntry, which has no paths if
+        # none could be resolved. Entries older than the segment TTL can't be
+        # current anymore.
+        #
+        # Entries are invalidated by any change to a segment db, not just the
+        # changes affecting their destination, as a new up or core segment can
+        # change the paths to any destination. This is done lazily: an entry
+        # is only resolved again when its destination is next requested, so a
+        # burst of new segments costs at most one resolution per destination
+        # that is actually in use.
+        self._path_cache = ExpiringDict(self.PATH_CACHE_SIZE, self.SEGMENT_TTL)
         req_name = "SCIONDaemon Requests %s" % self.addr.isd_as
         self.requests = RequestHandler.start(
             req_name, self._check_segments, self._fetch_segments,
             self._reply_segments, ttl=self.TIMEOUT, key_map=self._req_key_map,
         )
         self._api_sock = None
+        self._api_server = None
         self.daemon_thread = None
         os.makedirs(SCIOND_API_SOCKDIR, exist_ok=True)
         self.api_addr = (api_addr or
@@ -95,13 +136,15 @@ class SCIONDaemon(SCIONElement):
                 PMT.REVOCATION: self.handle_revocation,
             }
         }
-        if run_local_api:
+        if run_local_api and async_api:
+            self._api_server = AsyncAPIServer(self, self.api_addr)
+        elif run_local_api:
             self._api_sock = ReliableSocket(bind=(self.api_addr, "sciond"))
             self._socks.add(self._api_sock, self.handle_accept)
 
     @classmethod
     def start(cls, conf_dir, addr, api_addr=None, run_local_api=False,
-              port=SCION_UDP_PORT):
+              port=SCION_UDP_PORT, async_api=False):
         """
         Initializes, starts, and returns a SCIONDaemon object.
 
@@ -109,7 +152,7 @@ class SCIONDaemon(SCIONElement):
         sd = SCIONDaemon.start(conf_dir, addr)
         paths = sd.get_paths(isd_as)
         """
-        inst = cls(conf_dir, addr, api_addr, run_local_api, port)
+        inst = cls(conf_dir, addr, api_addr, run_local_api, port, async_api)
         name = "SCIONDaemon.run %s" % inst.addr.isd_as
         inst.daemon_thread = threading.Thread(
             target=thread_safety_net, args=(inst.run,), name=name, daemon=True)
@@ -117,6 +160,21 @@ class SCIONDaemon(SCIONElement):
         logging.debug("sciond started with api_addr = %s", inst.api_addr)
         return inst
 
+    def run(self):
+        if self._api_server:
+            threading.Thread(
+                target=thread_safety_net, args=(self._api_server.run,),
+                name="SCIONDaemon.api_server", daemon=True).start()
+        super().run()
+
+    def stop(self):
+        """
+        Stop the daemon, including the async API server.
+        """
+        if self._api_server:
+            self._api_server.stop()
+        super().stop()
+
     def handle_request(self, packet, sender, from_local_socket=True, sock=None):
         # PSz: local_socket may be misleading, especially that we have
         # api_socket which is local (in the localhost sense). What do you think
@@ -177,13 +235,19 @@ class SCIONDaemon(SCIONElement):
         """
         Handle local API's requests.
         """
-        if packet[0] == 0:  # path request
+        if packet[0] == API_PATH_REQ:
             logging.debug('API: path request')
             threading.Thread(
                 target=thread_safety_net,
                 args=(self._api_handle_path_request, packet, sock),
                 daemon=True).start()
-        elif packet[0] == 1:  # address request
+        elif packet[0] == API_BATCH_PATH_REQ:
+            logging.debug('API: batched path request')
+            threading.Thread(
+                target=thread_safety_net,
+                args=(self._api_handle_batch_path_request, packet, sock),
+                daemon=True).start()
+        elif packet[0] == API_ADDR_REQ:
             logging.debug('API: local ISD-AS request')
             sock.send(self.addr.isd_as.pack())
         else:
@@ -205,10 +269,40 @@ class SCIONDaemon(SCIONElement):
         thread = threading.current_thread()
         thread.name = "SCIONDaemon API id:%s %s -> %s" % (
             thread.ident, self.addr.isd_as, dst_ia)
-        paths = self.get_paths(dst_ia)
-        reply = []
+        sock.send(self._api_path_reply(dst_ia, self._get_paths_entry(dst_ia)))
+
+    def _api_handle_batch_path_request(self, packet, sock):
+        """
+        Batched path request, see
+        :func:`endhost.sciond_api.parse_batch_path_request` and
+        :func:`endhost.sciond_api.pack_batch_path_reply`. Segments for all
+        uncached destinations are requested at once.
+        """
+        try:
+            dst_ias = parse_batch_path_request(packet)
+        except SCIONParseError as e:
+            logging.warning("API: %s", e)
+            return
+        entries = self._get_paths_entries(dst_ias)
+        sock.send(pack_batch_path_reply([
+            self._api_path_reply(dst_ia, entry)
+            for dst_ia, entry in zip(dst_ias, entries)]))
+
+    def _api_path_reply(self, dst_ia, entry):
+        """
+        Return the reply to an API path request, given the _PathCacheEntry
+        (or None) for the destination.
+        """
         logging.debug("Replying to api request for %s with %d paths",
-                      dst_ia, len(paths))
+                      dst_ia, len(entry.paths) if entry else 0)
+        if not entry:
+            return b""
+        if entry.api_reply is None:
+            entry.api_reply = self._build_api_reply(entry.paths)
+        return entry.api_reply
+
+    def _build_api_reply(self, paths):
+        reply = []
         for path in paths:
             raw_path = path.pack()
             # assumed IPv4 addr
@@ -229,7 +323,7 @@ class SCIONDaemon(SCIONElement):
                 isd_as, link = interface
                 reply.append(isd_as.pack())
                 reply.append(struct.pack("!H", link))
-        sock.send(b"".join(reply))
+        return b"".join(reply)
 
     def handle_revocation(self, pkt):
         rev_info = pkt.get_payload()
@@ -239,37 +333,64 @@ class SCIONDaemon(SCIONElement):
 #             logging.info("Revocation verification failed.")
 #             return
         # Go through all segment databases and remove affected segments.
-        deletions = self._remove_revoked_pcbs(self.up_segments,
-                                              rev_info.rev_token)
-        deletions += self._remove_revoked_pcbs(self.core_segments,
-                                               rev_info.rev_token)
-        deletions += self._remove_revoked_pcbs(self.down_segments,
-                                               rev_info.rev_token)
+        rev_tokens = HashChain.walk(rev_info.rev_token, self.N_TOKENS_CHECK)
+        deletions = 0
+        for db in self.up_segments, self.core_segments, self.down_segments:
+            deletions += db.delete_revoked(rev_tokens)
         logging.debug("Removed %d segments due to revocation.", deletions)
 
-    def _remove_revoked_pcbs(self, db, rev_token):
-        """
-        Removes all segments from 'db' that contain an IF token for which
-        rev_token is a preimage (within 20 calls).
+    def get_paths(self, dst_ia, flags=()):
+        """Return a list of paths."""
+        entry = self._get_paths_entry(dst_ia, flags)
+        if not entry:
+            return []
+        # The cached paths are shared, so callers get their own copy.
+        return copy.deepcopy(entry.paths)
 
-        :param db: The PathSegmentDB.
-        :type db: :class:`lib.path_db.PathSegmentDB`
-        :param rev_token: The revocation token.
-        :type rev_token: bytes
+    def _get_paths_entry(self, dst_ia, flags=()):
+        """
+        Return a _PathCacheEntry with the paths to dst_ia, requesting segments
+        from the local path server if needed, or None if there are none.
+        """
+        return self._get_paths_entries([dst_ia], flags)[0]
 
-        :returns: The number of deletions.
-        :rtype: int
+    def _get_paths_entries(self, dst_ias, flags=()):
+        """
+        Return a list with a _PathCacheEntry (or None if there are no paths)
+        for each destination in dst_ias. Segments for all destinations that
+        can't be resolved yet are requested at once, and waited for with a
+        single deadline.
         """
-        to_remove = []
-        for segment in db():
-            for iftoken in segment.get_all_iftokens():
-                if HashChain.verify(rev_token, iftoken, self.N_TOKENS_CHECK):
-                    to_remove.append(segment.get_hops_hash())
+        entries = [self._lookup_paths_entry(dst_ia, flags)
+                   for dst_ia in dst_ias]
+        missing = {}
+        for dst_ia, entry in zip(dst_ias, entries):
+            if not entry and dst_ia not in missing:
+                missing[dst_ia] = threading.Event()
+        if not missing:
+            return entries
+        deadline = SCIONTime.get_time() + self.TIMEOUT
+        for dst_ia, e in missing.items():
+            self.requests.put(((dst_ia, flags), e))
+        self._wait_for_events(missing.values(), deadline)
+        resolved = {}
+        for dst_ia, e in missing.items():
+            if e.is_set():
+                resolved[dst_ia] = self._resolve_cached(dst_ia, flags)
+            else:
+                logging.error("Query timed out for %s", dst_ia)
+        return [entry or resolved.get(dst_ia)
+                for dst_ia, entry in zip(dst_ias, entries)]
 
-        return db.delete_all(to_remove)
+    def _lookup_paths_entry(self, dst_ia, flags=(), resolve=True):
+        """
+        Return a _PathCacheEntry with the paths to dst_ia, if they can be
+        resolved without requesting segments, otherwise None.
 
-    def get_paths(self, dst_ia, flags=()):
-        """Return a list of paths."""
+        :param bool resolve:
+            If False, only a current cache entry is returned, i.e. paths are
+            never resolved (again) by this call.
+        """
         logging.debug("Paths requested for %s %s", dst_ia, flags)
         if self.addr.isd_as == dst_ia or (
                 self.addr.isd_as.any_as() == dst_ia and
@@ -278,14 +399,49 @@ class SCIONDaemon(SCIONElement):
             # core AS in this ISD, and the local AS is in the core
             empty = SCIONPath()
             empty.mtu = self.topology.mtu
-            return [empty]
-        deadline = SCIONTime.get_time() + self.TIMEOUT
-        e = threading.Event()
-        self.requests.put(((dst_ia, flags), e))
-        if not self._wait_for_events([e], deadline):
-            logging.error("Query timed out for %s", dst_ia)
-            return []
-        return self.path_resolution(dst_ia, flags=flags)
+            return _PathCacheEntry(None, [empty])
+        if not resolve:
+            return self._cached_paths_entry(dst_ia, flags)
+        return self._resolve_cached(dst_ia, flags)
+
+    def _db_generations(self):  # pragma: no cover
+        return (self.up_segments.get_generation(),
+                self.core_segments.get_generation(),
+                self.down_segments.get_generation())
+
+    def _cached_paths_entry(self, dst_ia, flags=(), current=True):
+        """
+        Return the cached _PathCacheEntry for dst_ia, or None if there are no
+        cached paths. If `current` is True, entries resolved from outdated
+        segment dbs are ignored.
+        """
+        entry = self._path_cache.get((dst_ia, tuple(flags)))
+        if not entry or not entry.paths:
+            return None
+        if current and entry.generations != self._db_generations():
+            return None
+        return entry
+
+    def _resolve_cached(self, dst_ia, flags=()):
+        """
+        Return a _PathCacheEntry with the paths to dst_ia, or None if there
+        are none. Paths are only resolved again if a segment db changed since
+        they were cached.
+
+        Finding no paths is cached as well, so that a cache miss is only
+        resolved once, rather than again by the request handler's check (see
+        :any:`_check_segments`) before segments are requested.
+        """
+        key = (dst_ia, tuple(flags))
+        generations = self._db_generations()
+        entry = self._path_cache.get(key)
+        if not entry or entry.generations != generations:
+            paths = self.path_resolution(dst_ia, flags=flags)
+            entry = _PathCacheEntry(generations, paths or [])
+            self._path_cache[key] = entry
+        if not entry.paths:
+            return None
+        return entry
 
     def path_resolution(self, dst_ia, flags=()):
         # dst as == 0 means any core AS in the specified ISD.
@@ -448,7 +604,7 @@ class SCIONDaemon(SCIONElement):
         fulfilled.
         """
         dst_ia, flags = key
-        return self.path_resolution(dst_ia, flags=flags)
+        return self._resolve_cached(dst_ia, flags=flags)
 
     def _fetch_segments(self, key, _):
         """
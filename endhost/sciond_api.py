@@ -0,0 +1,300 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`sciond_api` --- asyncio server for the SCION Daemon API
+==============================================================
+
+Serves the local SCIOND API from a single event loop thread, instead of
+starting a thread per path request. Requests use the same framing as
+:class:`lib.socket.ReliableSocket`, and can be pipelined on a connection;
+replies are sent in request order.
+"""
+# Stdlib
+import asyncio
+import logging
+import struct
+from collections import deque
+
+# SCION
+from lib.errors import SCIONParseError
+from lib.packet.scion_addr import ISD_AS
+from lib.socket import ReliableSocket
+
+# Framing header: cookie, address length, payload length.
+_HDR_FMT = "=8sBI"
+_HDR_LEN = struct.calcsize(_HDR_FMT)
+
+API_PATH_REQ = 0
+API_ADDR_REQ = 1
+API_BATCH_PATH_REQ = 2
+
+
+def _frame(data):
+    return struct.pack(_HDR_FMT, ReliableSocket.COOKIE, 0, len(data)) + data
+
+
+def parse_path_request(data):
+    """
+    Parse a path request:
+      | \x00 (1B) | ISD-AS (4B) |
+
+    :returns: the destination ISD-AS.
+    :raises: SCIONParseError if the request is truncated.
+    """
+    if len(data) < 1 + ISD_AS.LEN:
+        raise SCIONParseError("Path request too short: %dB" % len(data))
+    return ISD_AS(data[1:ISD_AS.LEN + 1])
+
+
+def parse_batch_path_request(data):
+    """
+    Parse a batched path request:
+      | \x02 (1B) | count (2B) | ISD-AS 1 (4B) | ... | ISD-AS count (4B) |
+
+    :returns: the list of destination ISD-ASes.
+    :raises: SCIONParseError if the request is truncated.
+    """
+    if len(data) < 3:
+        raise SCIONParseError("Batched path request too short: %dB" %
+                              len(data))
+    count = struct.unpack("!H", data[1:3])[0]
+    if len(data) < 3 + count * ISD_AS.LEN:
+        raise SCIONParseError(
+            "Batched path request too short for %d destinations: %dB" %
+            (count, len(data)))
+    dst_ias = []
+    for i in range(count):
+        offset = 3 + i * ISD_AS.LEN
+        dst_ias.append(ISD_AS(data[offset:offset + ISD_AS.LEN]))
+    return dst_ias
+
+
+def pack_batch_path_reply(replies):
+    """
+    Pack the replies to a batched path request. Each reply is in the format
+    of a (single) path request reply:
+      | count (2B) | reply 1 len (4B) | reply 1 | ... |
+    """
+    ret = [struct.pack("!H", len(replies))]
+    for reply in replies:
+        ret.append(struct.pack("!I", len(reply)))
+        ret.append(reply)
+    return b"".join(ret)
+
+
+class APIProtocol(asyncio.Protocol):
+    """
+    A single API client connection.
+    """
+    def __init__(self, server):  # pragma: no cover
+        """
+        :param AsyncAPIServer server: the server handling the requests.
+        """
+        self._server = server
+        self._transport = None
+        self._buf = bytearray()
+        # Reply slots, in request order. A slot is a list holding the reply
+        # (None if there's nothing to send), or nothing if it's still pending.
+        self._slots = deque()
+
+    def connection_made(self, transport):  # pragma: no cover
+        self._transport = transport
+
+    def connection_lost(self, exc):  # pragma: no cover
+        self._transport = None
+        self._slots.clear()
+
+    def data_received(self, data):
+        self._buf.extend(data)
+        while len(self._buf) >= _HDR_LEN:
+            cookie, addr_len, data_len = struct.unpack_from(
+                _HDR_FMT, self._buf)
+            if cookie != ReliableSocket.COOKIE:
+                logging.error("API client out of sync, closing connection.")
+                self._transport.close()
+                return
+            start = _HDR_LEN + addr_len + (2 if addr_len else 0)
+            end = start + data_len
+            if len(self._buf) < end:
+                return
+            request = bytes(self._buf[start:end])
+            del self._buf[:end]
+            slot = []
+            self._slots.append(slot)
+            self._server.handle_request(request, self._make_reply_cb(slot))
+
+    def _make_reply_cb(self, slot):
+        def _reply(data):
+            slot.append(data)
+            self._flush()
+        return _reply
+
+    def _flush(self):
+        while self._slots and self._slots[0]:
+            data = self._slots.popleft()[0]
+            if data is not None and self._transport:
+                self._transport.write(_frame(data))
+
+
+class AsyncAPIServer(object):
+    """
+    SCIOND API server running an asyncio event loop.
+
+    Path requests that can't be answered from the daemon's path cache are
+    queued with its :class:`lib.requests.RequestHandler`. Concurrent requests
+    for the same destination wait on a single queued request. Paths are only
+    ever resolved by the request handler's thread, so that the event loop
+    never blocks on the segment dbs.
+    """
+    def __init__(self, daemon, api_addr):  # pragma: no cover
+        """
+        :param daemon: the :class:`endhost.sciond.SCIONDaemon` to serve.
+        :param str api_addr: path of the unix socket to listen on.
+        """
+        self._daemon = daemon
+        self._api_addr = api_addr
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        # Maps a request key to the list of reply callbacks waiting on it.
+        self._waiting = {}
+
+    def run(self):  # pragma: no cover
+        """
+        Run the event loop, until :any:`stop` is called.
+        """
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            self._loop.create_unix_server(
+                lambda: APIProtocol(self), path=self._api_addr))
+        logging.debug("Async SCIOND API bound to %s", self._api_addr)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    def stop(self):
+        """
+        Stop the event loop, which closes the server. Can be called from any
+        thread.
+        """
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def handle_request(self, request, reply_cb):
+        """
+        Handle a single API request.
+
+        :param bytes request: the request.
+        :param reply_cb:
+            function to call with the reply, or None if no reply is to be
+            sent. It may be called from within this method.
+        """
+        if not request:
+            logging.warning("API: empty request.")
+            reply_cb(None)
+        elif request[0] == API_PATH_REQ:
+            logging.debug('API: path request')
+            try:
+                dst_ia = parse_path_request(request)
+            except SCIONParseError as e:
+                logging.warning("API: %s", e)
+                reply_cb(None)
+                return
+            self._handle_path_request(dst_ia, reply_cb)
+        elif request[0] == API_BATCH_PATH_REQ:
+            logging.debug('API: batched path request')
+            try:
+                dst_ias = parse_batch_path_request(request)
+            except SCIONParseError as e:
+                logging.warning("API: %s", e)
+                reply_cb(None)
+                return
+            self._handle_batch_path_request(dst_ias, reply_cb)
+        elif request[0] == API_ADDR_REQ:
+            logging.debug('API: local ISD-AS request')
+            reply_cb(self._daemon.addr.isd_as.pack())
+        else:
+            logging.warning("API: type %d not supported.", request[0])
+            reply_cb(None)
+
+    def _handle_path_request(self, dst_ia, reply_cb):
+        entry = self._daemon._lookup_paths_entry(dst_ia, resolve=False)
+        if entry:
+            reply_cb(self._daemon._api_path_reply(dst_ia, entry))
+            return
+        key = (dst_ia, ())
+        waiting = self._waiting.get(key)
+        if waiting is not None:
+            waiting.append(reply_cb)
+            return
+        waiting = self._waiting[key] = [reply_cb]
+        self._daemon.requests.put(
+            (key, _LoopEvent(self._loop, self._answer, key, waiting)))
+        self._loop.call_later(self._daemon.TIMEOUT, self._answer, key,
+                              waiting, True)
+
+    def _handle_batch_path_request(self, dst_ias, reply_cb):
+        replies = [None] * len(dst_ias)
+        pending = [len(dst_ias)]
+
+        def _reply(i, data):
+            replies[i] = data
+            pending[0] -= 1
+            if not pending[0]:
+                reply_cb(pack_batch_path_reply(replies))
+        if not dst_ias:
+            reply_cb(pack_batch_path_reply([]))
+        for i, dst_ia in enumerate(dst_ias):
+            self._handle_path_request(
+                dst_ia, lambda data, i=i: _reply(i, data))
+
+    def _answer(self, key, waiting, timed_out=False):
+        """
+        Reply to all requests waiting on `key`. Called when the daemon's
+        request handler signals that the request has been fulfilled, or when
+        it times out, whichever happens first.
+        """
+        if self._waiting.get(key) is not waiting:
+            # Already answered.
+            return
+        del self._waiting[key]
+        dst_ia, flags = key
+        entry = None
+        if timed_out:
+            logging.error("Query timed out for %s", dst_ia)
+        else:
+            # The request handler has just resolved the paths, so use them even
+            # if a segment db has changed since.
+            entry = self._daemon._cached_paths_entry(
+                dst_ia, flags, current=False)
+        reply = self._daemon._api_path_reply(dst_ia, entry)
+        for reply_cb in waiting:
+            reply_cb(reply)
+
+
+class _LoopEvent(object):
+    """
+    Stands in for a :class:`threading.Event` in a
+    :class:`lib.requests.RequestHandler` request, calling a function in the
+    event loop when set.
+    """
+    def __init__(self, loop, func, *args):  # pragma: no cover
+        self._loop = loop
+        self._func = func
+        self._args = args
+
+    def set(self):  # pragma: no cover
+        self._loop.call_soon_threadsafe(self._func, *self._args)
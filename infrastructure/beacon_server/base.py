@@ -23,6 +23,7 @@ import threading
 import time
 from _collections import deque
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 # External packages
 from Crypto.Hash import SHA256
@@ -31,9 +32,11 @@ from Crypto.Protocol.KDF import PBKDF2
 # SCION
 from infrastructure.scion_elem import SCIONElement
 from infrastructure.beacon_server.if_state import InterfaceState
+from infrastructure.beacon_server.pcb_snapshot import PCBSnapshot
 from infrastructure.beacon_server.rev_obj import RevocationObject
 from lib.crypto.certificate import verify_sig_chain_trc
 from lib.crypto.hash_chain import HashChain, HashChainExhausted
+from lib.crypto.symcrypto import CBCMac
 from lib.defines import (
     BEACON_SERVICE,
     CERTIFICATE_SERVICE,
@@ -95,6 +98,12 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
     REQUESTS_TIMEOUT = 10
     # ZK path for incoming PCBs
     ZK_PCB_CACHE_PATH = "pcb_cache"
+    # ZK path for the master's PCB snapshot.
+    ZK_PCB_SNAPSHOT_PATH = "pcb_snapshot"
+    # Interval (in seconds) at which the master stores a PCB snapshot.
+    PCB_SNAPSHOT_INTERVAL = 30
+    # Max size of a PCB snapshot, as ZK limits the size of nodes to 1MiB.
+    PCB_SNAPSHOT_MAX_LEN = 1000 * 1024
     # ZK path for revocations.
     ZK_REVOCATIONS_PATH = "rev_cache"
     # Time revocation objects are cached in memory (in seconds).
@@ -114,11 +123,15 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         self.path_policy = PathPolicy.from_file(
             os.path.join(conf_dir, PATH_POLICY_FILE))
         self.unverified_beacons = deque()
+        self._verify_pool = ThreadPoolExecutor(
+            max_workers=self.config.pcb_verify_threads)
+        self._worker_thread = None
         self.trc_requests = {}
         self.trcs = {}
         sig_key_file = get_sig_key_file_path(self.conf_dir)
         self.signing_key = base64.b64decode(read_file(sig_key_file))
-        self.of_gen_key = PBKDF2(self.config.master_as_key, b"Derive OF Key")
+        self.of_gen_key = CBCMac(
+            PBKDF2(self.config.master_as_key, b"Derive OF Key"))
         logging.info(self.config.__dict__)
         self.if2rev_tokens = {}
         self._if_rev_token_lock = threading.Lock()
@@ -145,6 +158,8 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
                             self.topology.zookeepers)
         self.zk.retry("Joining party", self.zk.party_setup)
         self.incoming_pcbs = deque()
+        # Digests of the (packed) verified PCBs restored from a snapshot.
+        self._snapshot_digests = set()
         self.pcb_cache = ZkSharedCache(
             self.zk, self.ZK_PCB_CACHE_PATH, self.process_pcbs)
         self.revobjs_cache = ZkSharedCache(
@@ -198,15 +213,19 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         :type pcb: PathSegment
         """
         for r in self.topology.child_edge_routers:
-            beacon = self._mk_prop_beacon(pcb.copy(), r.interface.isd_as,
+            beacon = self._mk_prop_beacon(pcb, r.interface.isd_as,
                                           r.interface.if_id)
             self.send(beacon, r.addr)
             logging.info("Downstream PCB propagated!")
 
     def _mk_prop_beacon(self, pcb, dst_ia, egress_if):
+        """
+        Build the beacon to propagate on an interface. `pcb` is left unchanged,
+        so that it can be used for all interfaces.
+        """
         ts = pcb.get_timestamp()
         asm = self._create_asm(pcb.p.ifID, egress_if, ts, pcb.last_hof())
-        pcb.add_asm(asm)
+        pcb = pcb.copy_with_asm(asm)
         pcb.sign(self.signing_key)
         return self._build_packet(SVCType.BS, dst_ia=dst_ia, payload=pcb)
 
@@ -263,6 +282,13 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         # Inform the local PS
         self._send_rev_to_local_ps(rev_info=rev_info)
 
+    @abstractmethod
+    def _pcb_stores(self):
+        """
+        Return the path stores holding verified PCBs.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def process_pcbs(self, pcbs, raw=True):
         """
@@ -289,25 +315,37 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         exts = self._create_asm_exts()
         chain = self._get_my_cert()
         _, cert_ver = chain.get_leaf_isd_as_ver()
+        raw_chain = self.trust_store.get_packed_cert(self.addr.isd_as, cert_ver)
         return ASMarking.from_values(
             self.addr.isd_as, self._get_my_trc().version, cert_ver, pcbms,
-            self._get_if_rev_token(out_if), self.topology.mtu, chain, **exts)
+            self._get_if_rev_token(out_if), self.topology.mtu, raw_chain,
+            **exts)
 
     def _create_pcbms(self, in_if, out_if, ts, prev_hof):
         pcbm = self._create_pcbm(in_if, out_if, ts, prev_hof)
         yield pcbm
+        peer_ifs = []
         for er in sorted(self.topology.peer_edge_routers):
             in_if = er.interface.if_id
             if (not self.ifid_state[in_if].is_active() and
                     not self._quiet_startup()):
                 logging.warning('Peer ifid:%d inactive (not added).', in_if)
                 continue
-            yield self._create_pcbm(in_if, out_if, ts, pcbm.hof(), xover=True)
+            peer_ifs.append(in_if)
+        # All peer HOFs chain to the same HOF, so MAC them in one batch.
+        hofs = [HopOpaqueField.from_values(self.HOF_EXP_TIME, in_if, out_if,
+                                           xover=True) for in_if in peer_ifs]
+        HopOpaqueField.set_macs(self.of_gen_key, ts, hofs, pcbm.hof())
+        for in_if, hof in zip(peer_ifs, hofs):
+            yield self._mk_pcbm(in_if, out_if, hof)
 
     def _create_pcbm(self, in_if, out_if, ts, prev_hof, xover=False):
         hof = HopOpaqueField.from_values(
             self.HOF_EXP_TIME, in_if, out_if, xover=xover)
         hof.set_mac(self.of_gen_key, ts, prev_hof)
+        return self._mk_pcbm(in_if, out_if, hof)
+
+    def _mk_pcbm(self, in_if, out_if, hof):
         in_info = self._mk_if_info(in_if)
         out_info = self._mk_if_info(out_if)
         return PCBMarking.from_values(
@@ -326,11 +364,9 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         to 0, i.e., there is no AS to forward a packet containing this path
         segment to.
         """
-        pcb = pcb.copy()
         asm = self._create_asm(pcb.p.ifID, 0, pcb.get_timestamp(),
                                pcb.last_hof())
-        pcb.add_asm(asm)
-        return pcb
+        return pcb.copy_with_asm(asm)
 
     def handle_ifid_packet(self, pkt):
         """
@@ -370,23 +406,35 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         """
         Run an instance of the Beacon Server.
         """
-        threading.Thread(
+        self._worker_thread = threading.Thread(
             target=thread_safety_net, args=(self.worker,),
-            name="BS.worker", daemon=True).start()
+            name="BS.worker", daemon=True)
+        self._worker_thread.start()
         # https://github.com/netsec-ethz/scion/issues/308:
         threading.Thread(
             target=thread_safety_net, args=(self._handle_if_timeouts,),
             name="BS._handle_if_timeouts", daemon=True).start()
         super().run()
 
+    def stop(self):
+        """
+        Stop the Beacon Server, and shut down the PCB verification pool once
+        the worker thread, which submits to it, has finished.
+        """
+        super().stop()
+        if self._worker_thread:
+            self._worker_thread.join(5)
+        self._verify_pool.shutdown()
+
     def worker(self):
         """
         Worker thread that takes care of reading shared PCBs from ZK, and
         propagating PCBS/registering paths when master.
         """
-        last_propagation = last_registration = 0
+        last_propagation = last_registration = last_snapshot = 0
         worker_cycle = 1.0
         was_master = False
+        restored_at = None
         start = time.time()
         while self.run_flag.is_set():
             sleep_interval(start, worker_cycle, "BS.worker cycle",
@@ -396,6 +444,14 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
                 self.process_pcb_queue()
                 self.handle_unverified_beacons()
                 self.zk.wait_connected()
+                if restored_at is None:
+                    self._restore_pcb_snapshot()
+                    restored_at = start
+                elif (self._snapshot_digests and start - restored_at >=
+                        self.config.propagation_time):
+                    # Restored PCBs still in the shared PCB cache have been
+                    # read by now, so the rest are never going to match.
+                    self._snapshot_digests.clear()
                 self.pcb_cache.process()
                 self.revobjs_cache.process()
                 if not self.zk.get_lock(lock_timeout=0, conn_timeout=0):
@@ -404,8 +460,14 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
                 if not was_master:
                     self._became_master()
                     was_master = True
+                    # Give the new master time to catch up before it
+                    # overwrites the previous master's snapshot.
+                    last_snapshot = start
                 self.pcb_cache.expire(self.config.propagation_time * 10)
                 self.revobjs_cache.expire(self.ZK_REV_OBJ_MAX_AGE * 24)
+                if start - last_snapshot >= self.PCB_SNAPSHOT_INTERVAL:
+                    self._store_pcb_snapshot()
+                    last_snapshot = start
             except ZkNoConnection:
                 continue
             now = time.time()
@@ -431,25 +493,96 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
             if not ifstate.is_active():
                 ifstate.reset()
 
-    def _try_to_verify_beacon(self, pcb, quiet=False):
+    def _store_pcb_snapshot(self):
         """
-        Try to verify a beacon.
+        Store a snapshot of the verified and unverified PCBs in ZK.
 
-        :param pcb: path segment to verify.
-        :type pcb: PathSegment
+        :raises:
+            ZkNoConnection: if there's no connection to ZK.
         """
-        assert isinstance(pcb, PathSegment)
-        asm = pcb.asm(-1)
-        if self._check_trc(asm.isd_as(), asm.p.trcVer):
-            if self._verify_beacon(pcb):
+        pcbs = {}
+        for ps in self._pcb_stores():
+            for candidate in ps.candidates:
+                pcbs[candidate.pcb.copy().pack()] = True
+        for pcb in list(self.unverified_beacons):
+            pcbs.setdefault(pcb.copy().pack(), False)
+        snapshot = PCBSnapshot.from_values(pcbs.items())
+        raw = snapshot.pack()
+        if len(raw) > self.PCB_SNAPSHOT_MAX_LEN:
+            logging.warning("Not storing PCB snapshot, too large: %dB",
+                            len(raw))
+            return
+        self.zk.set_data(self.ZK_PCB_SNAPSHOT_PATH, raw)
+        logging.debug("Stored %s (%dB)", snapshot, len(raw))
+
+    def _restore_pcb_snapshot(self):
+        """
+        Restore the PCBs from the snapshot stored by the master. Verified PCBs
+        aren't verified again, and neither are identical PCBs later read from
+        the shared PCB cache.
+
+        :raises:
+            ZkNoConnection: if there's no connection to ZK.
+        """
+        raw = self.zk.get_data(self.ZK_PCB_SNAPSHOT_PATH)
+        if not raw:
+            return
+        try:
+            snapshot = PCBSnapshot(raw)
+        except (SCIONIndexError, SCIONParseError) as e:
+            logging.error("Unable to parse PCB snapshot: %s", e)
+            return
+        for raw_pcb, verified in snapshot.pcbs:
+            pcb = PathSegment.from_raw(raw_pcb)
+            if verified:
+                self._snapshot_digests.add(SHA256.new(raw_pcb).digest())
                 self._handle_verified_beacon(pcb)
             else:
-                logging.warning("Invalid beacon. %s", pcb)
-        else:
+                self.unverified_beacons.append(pcb)
+        logging.info("Restored %s", snapshot)
+
+    def _try_to_verify_beacons(self, pcbs, quiet=False):
+        """
+        Try to verify a batch of beacons. The signatures are verified in
+        parallel by the verification pool, and the verified beacons are then
+        handled in the order they were given.
+
+        :param list pcbs: path segments to verify.
+        """
+        pending = []
+        for pcb in pcbs:
+            assert isinstance(pcb, PathSegment)
+            if self._in_snapshot(pcb):
+                # Verified by the master that stored the snapshot.
+                pending.append((pcb, None))
+                continue
+            asm = pcb.asm(-1)
+            if self._check_trc(asm.isd_as(), asm.p.trcVer):
+                pending.append(
+                    (pcb, self._verify_pool.submit(self._verify_beacon, pcb)))
+                continue
             if not quiet:
                 logging.warning("Certificate(s) or TRC missing for pcb: %s",
                                 pcb.short_desc())
             self.unverified_beacons.append(pcb)
+        for pcb, future in pending:
+            if future is None or future.result():
+                self._handle_verified_beacon(pcb)
+            else:
+                logging.warning("Invalid beacon. %s", pcb)
+
+    def _in_snapshot(self, pcb):
+        """
+        Check whether a PCB was restored as verified from a PCB snapshot, in
+        which case it doesn't need to be verified again.
+        """
+        if not self._snapshot_digests:
+            return False
+        digest = SHA256.new(pcb.copy().pack()).digest()
+        if digest not in self._snapshot_digests:
+            return False
+        self._snapshot_digests.discard(digest)
+        return True
 
     @abstractmethod
     def _check_trc(self, isd_as, trc_ver):
@@ -548,9 +681,10 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         """
         Handle beacons which are waiting to be verified.
         """
-        for _ in range(len(self.unverified_beacons)):
-            pcb = self.unverified_beacons.popleft()
-            self._try_to_verify_beacon(pcb, quiet=True)
+        pcbs = []
+        while self.unverified_beacons:
+            pcbs.append(self.unverified_beacons.popleft())
+        self._try_to_verify_beacons(pcbs, quiet=True)
 
     def process_rev_objects(self, rev_objs):
         """
@@ -662,42 +796,40 @@ class BeaconServer(SCIONElement, metaclass=ABCMeta):
         """
         raise NotImplementedError
 
-    def _pcb_list_to_remove(self, candidates, rev_info, if_id):
+    def _pcb_list_to_remove(self, path_stores, rev_info, if_id):
         """
         Calculates the list of PCBs to remove.
         Called by _remove_revoked_pcbs.
 
-        :param candidates: Candidate PCBs.
-        :type candidates: List
+        :param path_stores: Path stores holding the candidate PCBs.
+        :type path_stores: List
         :param rev_info: The RevocationInfo object.
         :type rev_info: RevocationInfo
         :param if_id: The if_id to be revoked
         :type if_id: int
         """
-        to_remove = []
-        processed = set()
-        for cand in candidates:
-            if cand.id in processed:
-                continue
-            processed.add(cand.id)
-            if if_id is not None:
-                # If the beacon was received on this interface, remove it from
-                # the store. We also check, if the interface didn't come up in
-                # the mean time. Caveat: There is a small chance that a valid
-                # beacon gets removed, in case a new beacon reaches the BS
-                # through the interface, which is getting revoked, before the
-                # keep-alive message updates the interface state to 'ACTIVE'.
-                # However, worst, the valid beacon would get added within the
-                # next propagation period.
-                if (self.ifid_state[if_id].is_expired() and
-                        cand.pcb.if_id == if_id):
-                    to_remove.append(cand.id)
-            else:  # if_id = None means that this is an AS in downstream
-                rtoken = rev_info.rev_token
-                for iftoken in cand.pcb.get_all_iftokens():
-                    if HashChain.verify(rtoken, iftoken, self.N_TOKENS_CHECK):
-                        to_remove.append(cand.id)
-        return to_remove
+        to_remove = set()
+        if if_id is None:
+            # if_id = None means that this is an AS in downstream
+            rev_tokens = HashChain.walk(rev_info.rev_token,
+                                        self.N_TOKENS_CHECK)
+            for ps in path_stores:
+                to_remove.update(ps.get_revoked_ids(rev_tokens))
+            return list(to_remove)
+        # If the beacon was received on this interface, remove it from the
+        # store. We also check, if the interface didn't come up in the mean
+        # time. Caveat: There is a small chance that a valid beacon gets
+        # removed, in case a new beacon reaches the BS through the interface,
+        # which is getting revoked, before the keep-alive message updates the
+        # interface state to 'ACTIVE'. However, worst, the valid beacon would
+        # get added within the next propagation period.
+        if not self.ifid_state[if_id].is_expired():
+            return []
+        for ps in path_stores:
+            for cand in ps.candidates:
+                if cand.pcb.if_id == if_id:
+                    to_remove.add(cand.id)
+        return list(to_remove)
 
     def _handle_if_timeouts(self):
         """
@@ -65,7 +65,7 @@ class CoreBeaconServer(BeaconServer):
             dst_ia = r.interface.isd_as
             if not self._filter_pcb(pcb, dst_ia=dst_ia):
                 continue
-            beacon = self._mk_prop_beacon(pcb.copy(), r.interface.isd_as,
+            beacon = self._mk_prop_beacon(pcb, r.interface.isd_as,
                                           r.interface.if_id)
             self.send(beacon, r.addr)
             count += 1
@@ -125,6 +125,7 @@ class CoreBeaconServer(BeaconServer):
         Process new beacons and appends them to beacon list.
         """
         count = 0
+        to_verify = []
         for pcb in pcbs:
             if raw:
                 try:
@@ -135,10 +136,12 @@ class CoreBeaconServer(BeaconServer):
             if not self._filter_pcb(pcb):
                 count += 1
                 continue
-            self._try_to_verify_beacon(pcb)
-            self.handle_ext(pcb)
+            to_verify.append(pcb)
         if count:
             logging.debug("Dropped %d looping Core Segment PCBs", count)
+        self._try_to_verify_beacons(to_verify)
+        for pcb in to_verify:
+            self.handle_ext(pcb)
 
     def _filter_pcb(self, pcb, dst_ia=None):
         """
@@ -187,6 +190,9 @@ class CoreBeaconServer(BeaconServer):
     def process_cert_chain_rep(self, cert_chain_rep):
         raise NotImplementedError
 
+    def _pcb_stores(self):
+        return list(self.core_beacons.values())
+
     def _handle_verified_beacon(self, pcb):
         """
         Once a beacon has been verified, place it into the right containers.
@@ -212,10 +218,8 @@ class CoreBeaconServer(BeaconServer):
         logging.info("Registered %d Core paths", count)
 
     def _remove_revoked_pcbs(self, rev_info, if_id):
-        candidates = []
-        for ps in self.core_beacons.values():
-            candidates += ps.candidates
-        to_remove = self._pcb_list_to_remove(candidates, rev_info, if_id)
+        to_remove = self._pcb_list_to_remove(
+            self.core_beacons.values(), rev_info, if_id)
         # Remove the affected segments from the path stores.
         for ps in self.core_beacons.values():
             ps.remove_segments(to_remove)
@@ -110,6 +110,7 @@ class LocalBeaconServer(BeaconServer):
         """
         Process new beacons and appends them to beacon list.
         """
+        to_verify = []
         for pcb in pcbs:
             if raw:
                 try:
@@ -118,8 +119,10 @@ class LocalBeaconServer(BeaconServer):
                     logging.error("Unable to parse raw pcb: %s", e)
                     continue
             if self.path_policy.check_filters(pcb):
-                self._try_to_verify_beacon(pcb)
-                self.handle_ext(pcb)
+                to_verify.append(pcb)
+        self._try_to_verify_beacons(to_verify)
+        for pcb in to_verify:
+            self.handle_ext(pcb)
 
     def process_cert_chain_rep(self, pkt):
         """
@@ -137,13 +140,15 @@ class LocalBeaconServer(BeaconServer):
             del self.cert_chain_requests[rep_key]
 
     def _remove_revoked_pcbs(self, rev_info, if_id):
-        candidates = (self.down_segments.candidates +
-                      self.up_segments.candidates)
-        to_remove = self._pcb_list_to_remove(candidates, rev_info, if_id)
+        to_remove = self._pcb_list_to_remove(
+            [self.down_segments, self.up_segments], rev_info, if_id)
         # Remove the affected segments from the path stores.
         self.up_segments.remove_segments(to_remove)
         self.down_segments.remove_segments(to_remove)
 
+    def _pcb_stores(self):
+        return [self.beacons, self.up_segments, self.down_segments]
+
     def _handle_verified_beacon(self, pcb):
         """
         Once a beacon has been verified, place it into the right containers.
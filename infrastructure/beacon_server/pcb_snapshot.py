@@ -0,0 +1,105 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`pcb_snapshot` --- Snapshot of a beacon server's PCBs
+==========================================================
+"""
+# Stdlib
+import struct
+
+# External packages
+import lz4
+
+# SCION
+from lib.errors import SCIONParseError
+from lib.packet.packet_base import Serializable
+from lib.util import Raw, SCIONTime, iso_timestamp
+
+
+class PCBSnapshot(Serializable):
+    """
+    Snapshot of the PCBs known to the master beacon server, along with whether
+    they have been verified. It gets stored to Zookeeper, so that a beacon
+    server starting up can restore them without fetching and re-verifying
+    every entry of the shared PCB cache.
+
+    Format:
+      | version (1B) | lz4(body) |
+    Body:
+      | timestamp (8B) | count (4B) | entries |
+    Entry:
+      | verified (1B) | PCB len (4B) | PCB |
+    """
+    NAME = "PCBSnapshot"
+    VERSION = 1
+    HDR_FMT = "!dI"
+    ENTRY_FMT = "!BI"
+
+    def __init__(self, raw=None):
+        self.timestamp = 0
+        # List of (packed PCB, verified) tuples.
+        self.pcbs = []
+        super().__init__(raw)
+
+    def _parse(self, raw):
+        """
+        Parses raw bytes and populates the fields.
+        """
+        data = Raw(raw, self.NAME, 1, min_=True)
+        version = data.pop(1)
+        if version != self.VERSION:
+            raise SCIONParseError("%s: unsupported version %d" %
+                                  (self.NAME, version))
+        try:
+            body = lz4.loads(data.pop())
+        except ValueError as e:
+            raise SCIONParseError("%s: unable to decompress: %s" %
+                                  (self.NAME, e)) from None
+        data = Raw(body, self.NAME, struct.calcsize(self.HDR_FMT), min_=True)
+        self.timestamp, count = struct.unpack(
+            self.HDR_FMT, data.pop(struct.calcsize(self.HDR_FMT)))
+        for _ in range(count):
+            verified, len_ = struct.unpack(
+                self.ENTRY_FMT, data.pop(struct.calcsize(self.ENTRY_FMT)))
+            self.pcbs.append((data.pop(len_), bool(verified)))
+
+    @classmethod
+    def from_values(cls, pcbs):
+        """
+        Returns a PCBSnapshot object with the specified values.
+
+        :param list pcbs: (packed PCB, verified) tuples.
+        """
+        inst = cls()
+        inst.timestamp = SCIONTime.get_time()
+        inst.pcbs = list(pcbs)
+        return inst
+
+    def pack(self):
+        """
+        Returns a bytes object from the fields.
+        """
+        body = [struct.pack(self.HDR_FMT, self.timestamp, len(self.pcbs))]
+        for raw, verified in self.pcbs:
+            body.append(struct.pack(self.ENTRY_FMT, verified, len(raw)))
+            body.append(raw)
+        return bytes([self.VERSION]) + lz4.dumps(b"".join(body))
+
+    def __len__(self):
+        return len(self.pack())
+
+    def __str__(self):
+        return "%s: Timestamp: %s PCBs: %d (%d verified)" % (
+            self.NAME, iso_timestamp(self.timestamp), len(self.pcbs),
+            sum(1 for _, verified in self.pcbs if verified))
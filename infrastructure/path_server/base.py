@@ -27,6 +27,7 @@ from external.expiring_dict import ExpiringDict
 
 # SCION
 from infrastructure.scion_elem import SCIONElement
+from lib.crypto.hash_chain import HashChain
 from lib.defines import PATH_SERVICE, SCION_UDP_PORT
 from lib.packet.path_mgmt.rev_info import RevocationInfo
 from lib.packet.path_mgmt.seg_recs import PathRecordsReply, PathSegmentRecords
@@ -65,7 +66,6 @@ class PathServer(SCIONElement, metaclass=ABCMeta):
         # Used when l/cPS doesn't have up/dw-path.
         self.waiting_targets = defaultdict(list)
         self.revocations = ExpiringDict(1000, 300)
-        self.iftoken2seg = defaultdict(set)
         self.CTRL_PLD_CLASS_MAP = {
             PayloadClass.PATH: {
                 PMT.REQUEST: self.path_resolution,
@@ -125,17 +125,6 @@ class PathServer(SCIONElement, metaclass=ABCMeta):
     def _update_master(self):
         pass
 
-    def _add_if_mappings(self, pcb):
-        """
-        Add if revocation token to segment ID mappings.
-        """
-        segment_id = pcb.get_hops_hash()
-        for asm in pcb.p.asms:
-            self.iftoken2seg[asm.pcbms[0].igRevToken].add(segment_id)
-            self.iftoken2seg[asm.egRevToken].add(segment_id)
-            for pm in asm.pcbms:
-                self.iftoken2seg[pm.igRevToken].add(segment_id)
-
     @abstractmethod
     def _handle_up_segment_record(self, pcb, **kwargs):
         raise NotImplementedError
@@ -151,7 +140,6 @@ class PathServer(SCIONElement, metaclass=ABCMeta):
     def _add_segment(self, pcb, seg_db, name, reverse=False):
         res = seg_db.update(pcb, reverse=reverse)
         if res == DBResult.ENTRY_ADDED:
-            self._add_if_mappings(pcb)
             logging.info("%s-Segment registered: %s", name, pcb.short_desc())
             return True
         elif res == DBResult.ENTRY_UPDATED:
@@ -185,17 +173,10 @@ class PathServer(SCIONElement, metaclass=ABCMeta):
         :param rev_info: The revocation info
         :type rev_info: RevocationInfo
         """
-        rev_token = rev_info.rev_token
-        for _ in range(self.N_TOKENS_CHECK):
-            rev_token = SHA256.new(rev_token).digest()
-            segments = self.iftoken2seg[rev_token]
-            while segments:
-                sid = segments.pop()
-                # Delete segment from DB.
-                self.down_segments.delete(sid)
-                self.core_segments.delete(sid)
-            if rev_token in self.iftoken2seg:
-                del self.iftoken2seg[rev_token]
+        rev_tokens = HashChain.walk(SHA256.new(rev_info.rev_token).digest(),
+                                    self.N_TOKENS_CHECK)
+        for db in self.down_segments, self.core_segments:
+            db.delete_revoked(rev_tokens)
 
     def _send_to_next_hop(self, pkt, if_id):
         """
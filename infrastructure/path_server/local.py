@@ -18,11 +18,9 @@
 # Stdlib
 import logging
 
-# External packages
-from Crypto.Hash import SHA256
-
 # SCION
 from infrastructure.path_server.base import PathServer
+from lib.crypto.hash_chain import HashChain
 from lib.packet.scion import SVCType
 from lib.path_db import PathSegmentDB
 from lib.types import PathSegmentType as PST
@@ -72,18 +70,9 @@ class LocalPathServer(PathServer):
         :param rev_info: The revocation info
         :type rev_info: RevocationInfo
         """
-        rev_token = rev_info.rev_token
-        for _ in range(self.N_TOKENS_CHECK):
-            segments = self.iftoken2seg[rev_token]
-            while segments:
-                sid = segments.pop()
-                # Delete segment from DB.
-                self.up_segments.delete(sid)
-                self.down_segments.delete(sid)
-                self.core_segments.delete(sid)
-            if rev_token in self.iftoken2seg:
-                del self.iftoken2seg[rev_token]
-            rev_token = SHA256.new(rev_token).digest()
+        rev_tokens = HashChain.walk(rev_info.rev_token, self.N_TOKENS_CHECK)
+        for db in self.up_segments, self.down_segments, self.core_segments:
+            db.delete_revoked(rev_tokens)
 
     def path_resolution(self, pkt, new_request=True):
         """
@@ -0,0 +1,79 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`hof_cache` --- Router HOF MAC verification cache
+======================================================
+"""
+# Stdlib
+from collections import OrderedDict
+
+# SCION
+from lib.defines import EXP_TIME_UNIT
+from lib.util import SCIONTime
+
+
+class HOFMacCache(object):
+    """
+    Bounded cache of successfully verified hop opaque field MACs.
+
+    All packets of a flow carry the same (timestamp, HOF, previous HOF) triple,
+    so the MAC only needs to be computed once per path segment. Entries are
+    dropped once the HOF expires, when the cache is full (least recently used
+    first), or when the OF generation key changes.
+
+    :ivar int hits: number of verifications served from the cache.
+    :ivar int misses: number of verifications that computed the MAC.
+    """
+    def __init__(self, max_len=10000):
+        self._max_len = max_len
+        self._entries = OrderedDict()
+        self._key = None
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, key, ts, hof, prev_hof=None):
+        """
+        Verify the MAC of a HOF, using the cache if possible.
+
+        :param bytes key: OF generation key.
+        :param int ts: timestamp of the corresponding IOF.
+        :param HopOpaqueField hof: HOF to verify.
+        :param HopOpaqueField prev_hof: previous HOF, if any.
+        :returns: `True` if the MAC is valid, `False` otherwise.
+        """
+        if key != self._key:
+            self._entries.clear()
+            self._key = key
+        entry = (ts, hof.pack(), prev_hof.pack() if prev_hof else b"")
+        exp = self._entries.get(entry)
+        if exp is not None:
+            if SCIONTime.get_time() <= exp:
+                self._entries.move_to_end(entry)
+                self.hits += 1
+                return True
+            del self._entries[entry]
+        self.misses += 1
+        if not hof.verify_mac(key, ts, prev_hof):
+            return False
+        self._entries[entry] = ts + hof.exp_time * EXP_TIME_UNIT
+        if len(self._entries) > self._max_len:
+            self._entries.popitem(last=False)
+        return True
+
+    def __len__(self):  # pragma: no cover
+        return len(self._entries)
+
+    def __str__(self):
+        return "HOFMacCache: %d entries, %d hits, %d misses" % (
+            len(self), self.hits, self.misses)
@@ -18,6 +18,7 @@
 # Stdlib
 import copy
 import logging
+import queue
 import threading
 import time
 import zlib
@@ -29,14 +30,21 @@ from hornet_scion.router import RouterPlugin as HORNETPlugin
 
 # SCION
 from external.expiring_dict import ExpiringDict
+from infrastructure.router.hof_cache import HOFMacCache
 from infrastructure.router.if_state import InterfaceState
+from infrastructure.router.shared_state import (
+    SharedExpiringDict,
+    SharedInterfaceStates,
+)
+from infrastructure.router.workers import PacketHandoff, WorkerPool
 from infrastructure.router.errors import (
     SCIONInterfaceDownException,
     SCIONOFExpiredError,
     SCIONOFVerificationError,
     SCIONPacketHeaderCorruptedError,
 )
-from infrastructure.scion_elem import SCIONElement
+from infrastructure.scion_elem import MAX_QUEUE, SCIONElement
+from lib.crypto.symcrypto import CBCMac
 from lib.defines import (
     BEACON_SERVICE,
     CERTIFICATE_SERVICE,
@@ -75,7 +83,7 @@ from lib.packet.scmp.errors import (
 )
 from lib.packet.scmp.types import SCMPClass, SCMPPathClass
 from lib.sibra.state.state import SibraState
-from lib.socket import UDPSocket
+from lib.socket import SocketMgr, UDPSocket
 from lib.thread import thread_safety_net
 from lib.types import (
     AddrType,
@@ -97,16 +105,32 @@ class Router(SCIONElement):
 
     :ivar interface: the router's inter-AS interface, if any.
     :type interface: :class:`lib.topology.InterfaceElement`
+    :ivar int workers: number of worker processes.
+    :ivar int worker_id: index of this worker process (0 is the parent).
+
+    With more than one worker, worker 0 (the original process) handles all
+    traffic on the inter-AS socket, and all SIBRA packets, so that it can admit
+    SIBRA reservations against the full link bandwidth. The other workers
+    share the intra-AS traffic with it, and hand any SIBRA packets over to it.
     """
     SERVICE_TYPE = ROUTER_SERVICE
     FWD_REVOCATION_TIMEOUT = 5
     IFSTATE_REQ_INTERVAL = 30
+    # Maximum number of packets to read from a socket per wakeup.
+    RECV_BATCH = 64
 
-    def __init__(self, server_id, conf_dir, ):
+    def __init__(self, server_id, conf_dir, workers=1):
         """
         :param str server_id: server identifier.
         :param str conf_dir: configuration directory.
-        """
+        :param int workers: number of worker processes to shard packet
+            processing across.
+        """
+        # Needed by _setup_socket(), which is called by the superclass init.
+        self.workers = workers
+        self.worker_id = 0
+        self._worker_pool = None
+        self._handoff = None
         super().__init__(server_id, conf_dir, )
         self.interface = None
         for edge_router in self.topology.get_all_edge_routers():
@@ -115,10 +139,18 @@ class Router(SCIONElement):
                 break
         assert self.interface is not None
         logging.info("Interface: %s", self.interface.__dict__)
-        self.of_gen_key = PBKDF2(self.config.master_as_key, b"Derive OF Key")
-        self.sibra_key = PBKDF2(self.config.master_as_key, b"Derive SIBRA Key")
-        self.if_states = defaultdict(InterfaceState)
-        self.revocations = ExpiringDict(1000, self.FWD_REVOCATION_TIMEOUT)
+        self.of_gen_key = CBCMac(
+            PBKDF2(self.config.master_as_key, b"Derive OF Key"))
+        self.sibra_key = CBCMac(
+            PBKDF2(self.config.master_as_key, b"Derive SIBRA Key"))
+        self.hof_mac_cache = HOFMacCache()
+        if self.workers > 1:
+            self.if_states = SharedInterfaceStates(self.ifid2er)
+            self.revocations = SharedExpiringDict(
+                1000, self.FWD_REVOCATION_TIMEOUT)
+        else:
+            self.if_states = defaultdict(InterfaceState)
+            self.revocations = ExpiringDict(1000, self.FWD_REVOCATION_TIMEOUT)
         self.pre_ext_handlers = {
             SibraExtBase.EXT_TYPE: self.handle_sibra,
             TracerouteExt.EXT_TYPE: self.handle_traceroute,
@@ -132,6 +164,7 @@ class Router(SCIONElement):
             SibraExtBase.EXT_TYPE: False, TracerouteExt.EXT_TYPE: False,
             ExtHopByHopType.SCMP: False, HORNETPlugin.EXT_TYPE: False
         }
+        # Only worker 0 processes SIBRA packets, so it manages the whole link.
         self.sibra_state = SibraState(
             self.interface.bandwidth,
             "%s#%s -> %s" % (self.addr.isd_as, self.interface.if_id,
@@ -149,12 +182,12 @@ class Router(SCIONElement):
         self.SCMP_PLD_CLASS_MAP = {
             SCMPClass.PATH: {SCMPPathClass.REVOKED_IF: self.process_revocation},
         }
-        self._remote_sock = UDPSocket(
-            bind=(str(self.interface.addr), self.interface.udp_port),
-            addr_type=AddrType.IPV4,
-        )
-        self._socks.add(self._remote_sock, self.handle_recv)
+        self._setup_remote_socket()
         logging.info("IP %s:%d", self.interface.addr, self.interface.udp_port)
+        if self.workers > 1:
+            self._handoff = PacketHandoff()
+            self._socks.add(self._handoff, self.handle_handoff)
+            self._worker_pool = WorkerPool(self.workers - 1, self._run_worker)
 
     def _setup_socket(self, init=True):
         """
@@ -165,14 +198,52 @@ class Router(SCIONElement):
         self._local_sock = UDPSocket(
             bind=(str(self.addr.host), SCION_UDP_EH_DATA_PORT, self.id),
             addr_type=self.addr.host.TYPE, reuse=True,
+            reuse_port=self.workers > 1,
         )
         self._port = self._local_sock.port
         self._socks.add(self._local_sock, self.handle_recv)
 
+    def _setup_remote_socket(self):
+        """
+        Setup the socket for the inter-AS interface. Only worker 0 reads from
+        it, the other workers just use their inherited copy for sending.
+        """
+        self._remote_sock = UDPSocket(
+            bind=(str(self.interface.addr), self.interface.udp_port),
+            addr_type=AddrType.IPV4,
+        )
+        self._socks.add(self._remote_sock, self.handle_recv)
+
+    def _run_worker(self, worker_id):
+        """
+        Main function of the additional worker processes, forked by
+        :class:`infrastructure.router.workers.WorkerPool`. Each worker binds
+        its own intra-AS socket with SO_REUSEPORT, so that the kernel spreads
+        incoming flows across the workers.
+        """
+        self.worker_id = worker_id
+        self._worker_pool = None
+        # The selector is shared with worker 0, so close (rather than
+        # unregister from) it, and start afresh.
+        self._socks._sel.close()
+        self._local_sock.close()
+        self._handoff.close_recv()
+        self._socks = SocketMgr()
+        self._in_buf = queue.Queue(MAX_QUEUE)
+        self.run_flag = threading.Event()
+        self.run_flag.set()
+        self.stopped_flag = threading.Event()
+        self._setup_socket(False)
+        logging.info("Started router worker %d", self.worker_id)
+        SCIONElement.run(self)
+
     def run(self):
         """
         Run the router threads.
         """
+        if self._worker_pool:
+            # Has to happen before any threads are started.
+            self._worker_pool.start()
         threading.Thread(
             target=thread_safety_net, args=(self.sync_interface,),
             name="ER.sync_interface", daemon=True).start()
@@ -184,6 +255,32 @@ class Router(SCIONElement):
             name="ER.sibra_worker", daemon=True).start()
         SCIONElement.run(self)
 
+    def stop(self):
+        """
+        Stop the router, including any worker processes.
+        """
+        if self._worker_pool:
+            self._worker_pool.stop()
+        super().stop()
+
+    def handle_recv(self, sock):
+        """
+        Callback to handle a ready recving socket. Drains up to RECV_BATCH
+        packets from the socket, and queues them as a single batch.
+        """
+        packets = sock.recv_many(self.RECV_BATCH)
+        if packets:
+            self.packet_put_batch(packets, sock)
+
+    def handle_handoff(self, sock):
+        """
+        Callback to handle packets handed over by the other workers. These were
+        all received on the intra-AS socket.
+        """
+        packets = sock.recv_many(self.RECV_BATCH)
+        if packets:
+            self.packet_put_batch(packets, self._local_sock)
+
     def send(self, spkt, addr=None, port=SCION_UDP_EH_DATA_PORT):
         """
         Send a spkt to addr (class of that object must implement
@@ -200,10 +297,13 @@ class Router(SCIONElement):
             addr = spkt.addrs.dst.host
         from_local_as = addr == self.interface.to_addr
         self.handle_extensions(spkt, False, from_local_as)
+        # For unmodified transit packets, this just patches the OF pointers in
+        # the received buffer (see LazySCIONL4Packet.pack).
+        raw = spkt.pack()
         if from_local_as:
-            self._remote_sock.send(spkt.pack(), (str(addr), port))
+            self._remote_sock.send(raw, (str(addr), port))
         else:
-            self._local_sock.send(spkt.pack(), (str(addr), port))
+            self._local_sock.send(raw, (str(addr), port))
 
     def handle_extensions(self, spkt, pre_routing_phase, from_local_as):
         """
@@ -241,6 +341,8 @@ class Router(SCIONElement):
                 raise SCMPBadHopByHop
             if handler:
                 flags.extend(handler(ext_hdr, spkt, from_local_as))
+                # Handlers may change the packet in place.
+                spkt.mark_modified()
         return flags
 
     def handle_traceroute(self, hdr, spkt, _):
@@ -290,7 +392,7 @@ class Router(SCIONElement):
     def sibra_worker(self):
         while self.run_flag.is_set():
             start_time = SCIONTime.get_time()
-            self.sibra_state.update_tick()
+            self.sibra_state.sweep()
             sleep_interval(start_time, 1.0, "sibra_worker")
 
     def process_ifid_request(self, pkt, from_local):
@@ -406,6 +508,10 @@ class Router(SCIONElement):
             logging.debug("Received IFState update:\n%s",
                           str(mgmt_pkt.get_payload()))
             for p in payload.p.infos:
+                if p.ifID not in self.ifid2er:
+                    logging.warning("IFState update for unknown IF: %s",
+                                    p.ifID)
+                    continue
                 self.if_states[p.ifID].update(IFStateInfo(p))
             return
         self.handle_data(mgmt_pkt, from_local_as)
@@ -505,7 +611,8 @@ class Router(SCIONElement):
         hof = path.get_hof()
         prev_hof = path.get_hof_ver(ingress=ingress)
         if int(SCIONTime.get_time()) <= ts + hof.exp_time * EXP_TIME_UNIT:
-            if not hof.verify_mac(self.of_gen_key, ts, prev_hof):
+            if not self.hof_mac_cache.verify(self.of_gen_key, ts, hof,
+                                             prev_hof):
                 raise SCIONOFVerificationError(hof, prev_hof)
         else:
             raise SCIONOFExpiredError(hof)
@@ -675,9 +782,14 @@ class Router(SCIONElement):
             True, if the packet was received on the local socket.
         """
         from_local_as = from_local_socket
-        pkt = self._parse_packet(packet)
+        pkt = self._parse_packet(packet, lazy=True)
         if not pkt:
             return
+        if self.worker_id and any(isinstance(hdr, SibraExtBase)
+                                  for hdr in pkt.ext_hdrs):
+            # Only worker 0 keeps SIBRA state.
+            self._handoff.send(packet)
+            return
         if pkt.ext_hdrs:
             logging.debug("Got packet (from_local_as? %s):\n%s",
                           from_local_as, pkt)
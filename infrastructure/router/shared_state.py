@@ -0,0 +1,147 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`shared_state` --- Router state shared between worker processes
+=====================================================================
+
+These must be created before the router forks its workers, so that the
+underlying memory is shared between them.
+"""
+# Stdlib
+import ctypes
+import multiprocessing
+import zlib
+from multiprocessing.sharedctypes import RawArray
+
+# SCION
+from lib.util import SCIONTime
+
+# Revocation tokens are SHA256 hash chain elements.
+MAX_TOKEN_LEN = 32
+
+
+class _IFStateEntry(ctypes.Structure):
+    _fields_ = [
+        ("is_active", ctypes.c_bool),
+        ("token_len", ctypes.c_ubyte),
+        ("token", ctypes.c_ubyte * MAX_TOKEN_LEN),
+    ]
+
+
+class _ExpiringEntry(ctypes.Structure):
+    _fields_ = [
+        ("expiry", ctypes.c_double),
+        ("key_len", ctypes.c_ubyte),
+        ("key", ctypes.c_ubyte * MAX_TOKEN_LEN),
+    ]
+
+
+def _get_bytes(arr, len_):
+    return bytes(arr)[:len_]
+
+
+def _set_bytes(arr, value):
+    assert len(value) <= MAX_TOKEN_LEN
+    ctypes.memmove(arr, value, len(value))
+    return len(value)
+
+
+class SharedInterfaceState(object):
+    """
+    View of a single entry of a :class:`SharedInterfaceStates` table. It has
+    the same interface as
+    :class:`infrastructure.router.if_state.InterfaceState`.
+    """
+    def __init__(self, entry, lock):  # pragma: no cover
+        self._entry = entry
+        self._lock = lock
+
+    @property
+    def is_active(self):  # pragma: no cover
+        return self._entry.is_active
+
+    @property
+    def rev_token(self):
+        with self._lock:
+            if not self._entry.token_len:
+                return None
+            return _get_bytes(self._entry.token, self._entry.token_len)
+
+    def update(self, info):
+        """
+        Updates the interface state.
+
+        :param info: IFStateInfo object sent by the BS.
+        """
+        with self._lock:
+            self._entry.is_active = info.p.active
+            self._entry.token_len = _set_bytes(
+                self._entry.token, info.rev_info.p.revToken)
+
+
+class SharedInterfaceStates(object):
+    """
+    Table of interface states in shared memory, so that an IFStateInfo update
+    received by any router worker is seen by all of them.
+    """
+    def __init__(self, if_ids):
+        """
+        :param if_ids: IDs of all the interfaces in the AS.
+        """
+        self._idxs = {}
+        for i, if_id in enumerate(sorted(if_ids)):
+            self._idxs[if_id] = i
+        self._entries = RawArray(_IFStateEntry, len(self._idxs))
+        for entry in self._entries:
+            entry.is_active = True
+        self._lock = multiprocessing.Lock()
+
+    def __contains__(self, if_id):  # pragma: no cover
+        return if_id in self._idxs
+
+    def __getitem__(self, if_id):
+        return SharedInterfaceState(
+            self._entries[self._idxs[if_id]], self._lock)
+
+
+class SharedExpiringDict(object):
+    """
+    Fixed-size, direct-mapped cache of recently seen keys in shared memory,
+    used in place of :class:`external.expiring_dict.ExpiringDict` by router
+    workers.
+
+    Only the presence of a key is stored, values are ignored. Keys that map to
+    the same slot replace each other, so a key can be forgotten before it
+    expires, but a key that wasn't added is never reported as present.
+    """
+    def __init__(self, max_len, max_age_seconds):
+        self._entries = RawArray(_ExpiringEntry, max_len)
+        self._max_age = max_age_seconds
+        self._lock = multiprocessing.Lock()
+
+    def _entry(self, key):  # pragma: no cover
+        return self._entries[zlib.crc32(key) % len(self._entries)]
+
+    def __contains__(self, key):
+        entry = self._entry(key)
+        with self._lock:
+            if entry.expiry <= SCIONTime.get_time():
+                return False
+            return _get_bytes(entry.key, entry.key_len) == key
+
+    def __setitem__(self, key, _):
+        entry = self._entry(key)
+        with self._lock:
+            entry.key_len = _set_bytes(entry.key, key)
+            entry.expiry = SCIONTime.get_time() + self._max_age
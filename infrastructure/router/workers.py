@@ -0,0 +1,214 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`workers` --- Router worker processes
+==========================================
+
+Worker 0 is the router's original process. It owns the inter-AS socket and the
+SIBRA state. Before starting any threads, it forks a supervisor process, which
+forks the additional workers. These only process packets received on the
+intra-AS socket.
+"""
+# Stdlib
+import logging
+import os
+import signal
+import time
+from socket import AF_UNIX, MSG_DONTWAIT, SOCK_DGRAM, socketpair
+
+# SCION
+from lib.defines import SCION_BUFLEN
+from lib.log import log_exception
+
+
+class WorkerPool(object):
+    """
+    Forks the additional router workers, and restarts any that exit while the
+    router is running.
+
+    The workers are forked, reaped and restarted by a dedicated supervisor
+    process, which never starts any threads. Forking from worker 0 once it runs
+    other threads could leave a lock (e.g. the logging module's) held forever
+    in the child.
+    """
+    # How often the supervisor checks for exited workers, in seconds.
+    CHECK_INTERVAL = 1
+
+    def __init__(self, count, worker_main):
+        """
+        :param int count: number of workers to fork.
+        :param worker_main:
+            called with the worker ID (1 to `count`) in each forked worker. The
+            worker process exits when it returns.
+        """
+        self._count = count
+        self._worker_main = worker_main
+        self._pids = {}
+        self._supervisor_pid = None
+        self._stopped = False
+
+    def start(self):
+        """
+        Fork the supervisor process, which forks all workers. Has to be called
+        before the calling process starts any threads.
+        """
+        pid = os.fork()
+        if pid:
+            logging.info("Started router worker supervisor (pid %d)", pid)
+            self._supervisor_pid = pid
+            return
+        status = 0
+        try:
+            self._supervise(os.getppid())
+        except Exception:
+            log_exception("Router worker supervisor crashed:")
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _supervise(self, parent_pid):
+        """
+        Main loop of the supervisor process. Runs until it's terminated, or its
+        parent (worker 0) exits, and then stops all workers.
+        """
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+        for worker_id in range(1, self._count + 1):
+            self._pids[worker_id] = self._fork(worker_id)
+        while not self._stopped and os.getppid() == parent_pid:
+            self.check()
+            time.sleep(self.CHECK_INTERVAL)
+        self._stop_workers()
+
+    def _handle_sigterm(self, signum, frame):  # pragma: no cover
+        self._stopped = True
+
+    def _fork(self, worker_id):
+        """
+        Fork a single worker, and return its pid. Never returns in the worker.
+        """
+        pid = os.fork()
+        if pid:
+            logging.info("Started router worker %d (pid %d)", worker_id, pid)
+            return pid
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        status = 0
+        try:
+            self._worker_main(worker_id)
+        except SystemExit as e:
+            if e.code:
+                status = 1
+        except Exception:
+            log_exception("Router worker %d crashed:" % worker_id)
+            status = 1
+        finally:
+            os._exit(status)
+
+    def check(self):
+        """
+        Reap any workers that have exited, and fork replacements.
+
+        :returns: list of IDs of the restarted workers.
+        """
+        restarted = []
+        for worker_id, pid in sorted(self._pids.items()):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if not done:
+                continue
+            logging.error("Router worker %d (pid %d) exited with status "
+                          "%d, restarting it.", worker_id, pid, status)
+            self._pids[worker_id] = self._fork(worker_id)
+            restarted.append(worker_id)
+        return restarted
+
+    def _stop_workers(self):
+        """
+        Terminate and reap all workers.
+        """
+        for pid in self._pids.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                continue
+        self._pids = {}
+
+    def stop(self):
+        """
+        Terminate the supervisor, which terminates all workers before exiting.
+        """
+        pid, self._supervisor_pid = self._supervisor_pid, None
+        if not pid:
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+
+class PacketHandoff(object):
+    """
+    Datagram socket pair, over which the additional workers hand packets that
+    only worker 0 can process (i.e. SIBRA packets) over to worker 0.
+
+    The receiving end is exposed as `sock`, so that it can be registered with
+    worker 0's :class:`lib.socket.SocketMgr`.
+    """
+    def __init__(self):  # pragma: no cover
+        self.sock, self._send_sock = socketpair(AF_UNIX, SOCK_DGRAM)
+        # Scratch buffer for recv_many().
+        self._recv_buf = bytearray(SCION_BUFLEN)
+
+    def send(self, packet):
+        """
+        Hand a raw packet over to worker 0. The packet is dropped if worker 0
+        is too far behind.
+        """
+        try:
+            self._send_sock.send(packet, MSG_DONTWAIT)
+        except BlockingIOError:
+            logging.warning("Handoff to worker 0 is full, dropping packet.")
+
+    def recv_many(self, count):
+        """
+        Read up to `count` handed-over packets, without blocking.
+
+        :returns:
+            List of tuples of (`bytearray`, ``None``), to match
+            :any:`lib.socket.UDPSocket.recv_many`.
+        """
+        ret = []
+        buf = self._recv_buf
+        while len(ret) < count:
+            try:
+                size = self.sock.recv_into(buf, 0, MSG_DONTWAIT)
+            except InterruptedError:
+                continue
+            except BlockingIOError:
+                break
+            ret.append((buf[:size], None))
+        return ret
+
+    def close_recv(self):  # pragma: no cover
+        """
+        Close the receiving end, in the additional workers.
+        """
+        self.sock.close()
+
+    def close(self):  # pragma: no cover
+        self.sock.close()
+        self._send_sock.close()
@@ -51,6 +51,7 @@ from lib.packet.packet_base import PayloadRaw
 from lib.packet.path import SCIONPath
 from lib.packet.scion import (
     build_base_hdrs,
+    LazySCIONL4Packet,
     SCIONBasePacket,
     SCIONL4Packet,
     SVCType
@@ -235,9 +236,15 @@ class SCIONElement(object):
                           scmp.type, scmp_type_name(scmp.type), pkt)
         return None
 
-    def _parse_packet(self, packet):
+    def _parse_packet(self, packet, lazy=False):
+        """
+        :param bool lazy:
+            If set, parse into a :any:`LazySCIONL4Packet`, which only decodes
+            the parts of the packet that are actually accessed.
+        """
+        pkt_cls = LazySCIONL4Packet if lazy else SCIONL4Packet
         try:
-            pkt = SCIONL4Packet(packet)
+            pkt = pkt_cls(packet)
         except SCMPError as e:
             self._scmp_parse_error(packet, e)
             return None
@@ -405,15 +412,29 @@ class SCIONElement(object):
         Try to put incoming packet in queue
         If queue is full, drop oldest packet in queue
         """
+        self.packet_put_batch([(packet, addr)], sock)
+
+    def packet_put_batch(self, packets, sock):
+        """
+        Put a batch of incoming packets in the queue, as a single entry.
+
+        If the queue is full, only as many of the oldest queued packets as are
+        being added are dropped, rather than the whole oldest batch (see
+        :any:`_drop_oldest`).
+
+        :param list packets: List of (packet, addr) tuples.
+        """
         from_local_as = sock == self._local_sock
+        batch = [(packet, addr, from_local_as, sock)
+                 for packet, addr in packets]
         dropped = 0
         while True:
             try:
-                self._in_buf.put((packet, addr, from_local_as, sock),
-                                 block=False)
+                self._in_buf.put(batch, block=False)
             except queue.Full:
-                self._in_buf.get_nowait()
-                dropped += 1
+                count, rest = self._drop_oldest(len(packets) - dropped)
+                dropped += count
+                batch = rest + batch
             else:
                 break
         if dropped > 0:
@@ -421,6 +442,28 @@ class SCIONElement(object):
             logging.debug("%d packet(s) dropped (%d total dropped so far)",
                           dropped, self.total_dropped)
 
+    def _drop_oldest(self, count):
+        """
+        Free up an entry in the queue by removing the oldest one, and drop its
+        first `count` packets (at least one). To keep the packets in order, the
+        rest of them are merged into the next entry, or returned if there is
+        none.
+
+        :returns: the number of dropped packets, and the list of packets to put
+            in front of the new batch.
+        """
+        with self._in_buf.mutex:
+            entries = self._in_buf.queue
+            if not entries:
+                return 0, []
+            oldest = entries.popleft()
+            count = min(max(count, 1), len(oldest))
+            rest = oldest[count:]
+            if rest and entries:
+                entries[0][:0] = rest
+                rest = []
+        return count, rest
+
     def handle_accept(self, sock):
         """
         Callback to handle a ready listening socket
@@ -458,13 +501,15 @@ class SCIONElement(object):
 
     def _packet_process(self):
         """
-        Read packets from a :class:`queue.Queue`, and process them.
+        Read batches of packets from a :class:`queue.Queue`, and process them.
         """
         while self.run_flag.is_set():
             try:
-                self.handle_request(*self._in_buf.get(timeout=1.0))
+                batch = self._in_buf.get(timeout=1.0)
             except queue.Empty:
                 continue
+            for entry in batch:
+                self.handle_request(*entry)
 
     def stop(self):
         """Shut down the daemon thread."""
@@ -131,6 +131,8 @@ class SibraServerBase(SCIONElement):
             sleep_interval(start, worker_cycle, "SB.worker cycle")
             start = SCIONTime.get_time()
             with self.lock:
+                for state in self.link_states.values():
+                    state.sweep()
                 self.manage_steady_paths()
 
     def sender(self):
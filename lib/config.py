@@ -32,7 +32,11 @@ class Config(object):
     :ivar int registration_time: the interval at which paths are registered.
     :ivar int registers_paths: whether or not the AS registers paths.
     :ivar int cert_ver: initial version of the certificate chain.
+    :ivar int pcb_verify_threads:
+        the number of threads a beacon server verifies PCBs with.
     """
+    # Default for `pcb_verify_threads`, if not set in the configuration file.
+    PCB_VERIFY_THREADS = 1
 
     def __init__(self):  # pragma: no cover
         self.master_as_key = 0
@@ -40,6 +44,7 @@ class Config(object):
         self.registration_time = 0
         self.registers_paths = 0
         self.cert_ver = 0
+        self.pcb_verify_threads = self.PCB_VERIFY_THREADS
 
     @classmethod
     def from_file(cls, config_file):  # pragma: no cover
@@ -76,3 +81,5 @@ class Config(object):
         self.registration_time = config['RegisterTime']
         self.registers_paths = config['RegisterPath']
         self.cert_ver = config['CertChainVersion']
+        self.pcb_verify_threads = config.get(
+            'PCBVerifyThreads', self.PCB_VERIFY_THREADS)
@@ -55,17 +55,31 @@ def sign(msg, signing_key):
     return SigningKey(signing_key).sign(msg)[:64]
 
 
+def load_verifying_key(verifying_key):
+    """
+    Parse a verifying key, for repeated use with verify().
+
+    :param bytes verifying_key: verifying key from generate_signature_keypair().
+    :rtype: VerifyKey
+    """
+    return VerifyKey(verifying_key)
+
+
 def verify(msg, sig, verifying_key):
     """
     Verify a signature.
 
     :param bytes msg: message that was signed.
     :param bytes sig: signature to verify.
-    :param bytes verifying_key: verifying key from generate_signature_keypair().
+    :param verifying_key:
+        verifying key from generate_signature_keypair(), or as returned by
+        load_verifying_key().
     :returns: True or False whether the verification succeeds or fails.
     :rtype: boolean
     """
+    if not isinstance(verifying_key, VerifyKey):
+        verifying_key = VerifyKey(verifying_key)
     try:
-        return msg == VerifyKey(verifying_key).verify(msg, sig)
+        return msg == verifying_key.verify(msg, sig)
     except BadSignatureError:
         return False
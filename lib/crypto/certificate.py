@@ -20,22 +20,74 @@ import base64
 import copy
 import json
 import logging
+import threading
 import time
+from collections import OrderedDict
 
 # External
 import lz4
+from Crypto.Hash import SHA256
 
 # SCION
-from lib.crypto.asymcrypto import sign, verify
+from lib.crypto.asymcrypto import load_verifying_key, sign, verify
 from lib.packet.scion_addr import ISD_AS
 from lib.util import load_json_file
 
 
+class VerificationCache(object):
+    """
+    Cache of successful certificate chain verifications.
+
+    Maps a (TRC, TRC version, certificate chain, subject) tuple, where the TRC
+    and chain are identified by the digests of their contents, to the parsed
+    verifying key of the subject. As entries are keyed by content, a new TRC
+    or chain never matches an old entry; entries are kept until the first
+    certificate of the chain expires, or until evicted to make room.
+    """
+    def __init__(self, max_len=1000):  # pragma: no cover
+        self._max_len = max_len
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :returns: the verifying key, or None if there's no (valid) entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        verifying_key, exp_time = entry
+        if int(time.time()) >= exp_time:
+            return None
+        return verifying_key
+
+    def add(self, key, verifying_key, exp_time):
+        """
+        :param verifying_key: as returned by load_verifying_key().
+        :param int exp_time: the time at which the entry expires.
+        """
+        with self._lock:
+            self._entries[key] = (verifying_key, exp_time)
+            if len(self._entries) > self._max_len:
+                self._entries.popitem(last=False)
+
+    def clear(self):  # pragma: no cover
+        with self._lock:
+            self._entries.clear()
+
+
+_VERIFICATION_CACHE = VerificationCache()
+
+
 def verify_sig_chain_trc(msg, sig, subject, chain, trc, trc_version):
     """
     Verify whether the packed message with attached signature is validly
     signed by a particular subject belonging to a valid certificate chain.
 
+    The TRC and chain are only verified the first time they are used for a
+    subject (see :class:`VerificationCache`).
+
     :param str msg: message corresponding to the given signature.
     :param bytes sig: signature computed on msg.
     :param str subject: signer identity.
@@ -50,12 +102,28 @@ def verify_sig_chain_trc(msg, sig, subject, chain, trc, trc_version):
     """
     assert isinstance(chain, CertificateChain)
     assert isinstance(trc, TRC)
+    key = (trc.digest(), trc_version, chain.digest(), subject)
+    verifying_key = _VERIFICATION_CACHE.get(key)
+    if verifying_key is None:
+        verifying_key = _verify_chain_trc(subject, chain, trc, trc_version)
+        if verifying_key is None:
+            return False
+        _VERIFICATION_CACHE.add(key, verifying_key, chain.expiration_time())
+    return verify(msg, sig, verifying_key)
+
+
+def _verify_chain_trc(subject, chain, trc, trc_version):
+    """
+    Verify the TRC and the certificate chain.
+
+    :returns: the subject's verifying key, or None if the verification fails.
+    """
     if not trc.verify():
         logging.warning('The TRC verification failed.')
-        return False
+        return None
     if not chain.verify(subject, trc, trc_version):
         logging.warning('The certificate chain verification failed.')
-        return False
+        return None
     verifying_key = None
     for signer_cert in chain.certs:
         if signer_cert.subject == subject:
@@ -64,9 +132,9 @@ def verify_sig_chain_trc(msg, sig, subject, chain, trc, trc_version):
     if verifying_key is None:
         if subject not in trc.core_ases:
             logging.warning('Signer\'s public key has not been found.')
-            return False
+            return None
         verifying_key = trc.core_ases[subject].subject_sig_key
-    return verify(msg, sig, verifying_key)
+    return load_verifying_key(verifying_key)
 
 
 class Certificate(object):
@@ -265,6 +333,7 @@ class CertificateChain(object):
         :param str chain_raw: certificate chain as json string.
         """
         self.certs = []
+        self._digest = None
         if chain_raw:
             self._parse(chain_raw, lz4_)
 
@@ -276,6 +345,10 @@ class CertificateChain(object):
         """
         if lz4_:
             chain_raw = lz4.loads(chain_raw).decode("utf-8")
+        if isinstance(chain_raw, str):
+            self._digest = SHA256.new(chain_raw.encode("utf-8")).digest()
+        else:
+            self._digest = SHA256.new(chain_raw).digest()
         chain = json.loads(chain_raw)
         for index in range(1, len(chain) + 1):
             cert_dict = chain[str(index)]
@@ -336,6 +409,20 @@ class CertificateChain(object):
             return False
         return True
 
+    def digest(self):
+        """
+        Return the SHA256 digest of the chain, as parsed (or first packed).
+        """
+        if self._digest is None:
+            self._digest = SHA256.new(self.pack()).digest()
+        return self._digest
+
+    def expiration_time(self):
+        """
+        Return the time at which the first certificate of the chain expires.
+        """
+        return min(cert.expiration_time for cert in self.certs)
+
     def get_leaf_isd_as_ver(self):
         if not self.certs:
             return None
@@ -424,12 +511,22 @@ class TRC(object):
         self.root_dns_server_cert = ''
         self.trc_server_addr = ''
         self.signatures = {}
+        self._digest = None
         if trc_raw:
             self._parse(trc_raw, lz4_)
 
     def get_isd_ver(self):
         return self.isd, self.version
 
+    def digest(self):
+        """
+        Return the SHA256 digest of the TRC. It's computed on first use, so the
+        TRC must not be changed afterwards.
+        """
+        if self._digest is None:
+            self._digest = SHA256.new(self.pack()).digest()
+        return self._digest
+
     def get_core_ases(self):
         res = []
         for key in self.core_ases:
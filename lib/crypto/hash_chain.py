@@ -144,3 +144,22 @@ class HashChain(object):
                 return True
             cur_ele = hash_func.new(cur_ele).digest()
         return False
+
+    @staticmethod
+    def walk(start_ele, n_tokens, hash_func=SHA256):
+        """
+        Return the first n_tokens elements of the hash chain starting at
+        start_ele, i.e. all the elements that :meth:`verify` would accept
+        start_ele for, with max_tries=n_tokens.
+
+        :param bytes start_ele: the starting element
+        :param int n_tokens: the number of elements to return
+        :param func hash_func:
+            the hash function to be used (must implement the hashlib interface)
+        """
+        elements = []
+        cur_ele = start_ele
+        for _ in range(n_tokens):
+            elements.append(cur_ele)
+            cur_ele = hash_func.new(cur_ele).digest()
+        return elements
@@ -19,12 +19,82 @@
 from Crypto.Cipher import AES
 
 
+BLOCK_LEN = 16
+
+
+class CBCMac(object):
+    """
+    CBC-MAC using AES-128, with the key schedule computed once, so that the
+    same object can be used to MAC many messages.
+
+    Warnings:
+        CBC-MAC is insecure for variable size messages.
+    """
+    def __init__(self, key):
+        """
+        Args:
+            key: key for MAC creation.
+
+        Raises:
+            ValueError: An error occurred when key is NULL.
+        """
+        if key is None:
+            raise ValueError('Key is NULL.')
+        # CBC objects carry the chaining state between calls, so use ECB and
+        # do the chaining here instead.
+        self._cipher = AES.new(key, AES.MODE_ECB)
+
+    def mac(self, msg):
+        """
+        Args:
+            msg: Plaintext to be MACed, as a bytes object.
+
+        Returns:
+            MAC output, as a bytes object.
+        """
+        return self.mac_many([msg])[0]
+
+    def mac_many(self, msgs):
+        """
+        MAC several messages of the same length, encrypting the blocks at the
+        same position in all messages in a single call.
+
+        Args:
+            msgs: List of plaintexts to be MACed, as bytes objects.
+
+        Returns:
+            List of MAC outputs, as bytes objects.
+
+        Raises:
+            ValueError: An error occurred when a message is NULL, or the
+            messages are not all the same multiple of the block length.
+        """
+        if not msgs:
+            return []
+        if None in msgs:
+            raise ValueError('Message is NULL.')
+        msg_len = len(msgs[0])
+        if msg_len % BLOCK_LEN or any(len(msg) != msg_len for msg in msgs):
+            raise ValueError('Messages must have the same length, which must '
+                             'be a multiple of %d.' % BLOCK_LEN)
+        state = [0] * len(msgs)
+        for offset in range(0, msg_len, BLOCK_LEN):
+            blocks = []
+            for msg, prev in zip(msgs, state):
+                block = int.from_bytes(msg[offset:offset + BLOCK_LEN], "big")
+                blocks.append((block ^ prev).to_bytes(BLOCK_LEN, "big"))
+            out = self._cipher.encrypt(b"".join(blocks))
+            state = [int.from_bytes(out[i:i + BLOCK_LEN], "big")
+                     for i in range(0, len(out), BLOCK_LEN)]
+        return [mac.to_bytes(BLOCK_LEN, "big") for mac in state]
+
+
 def cbcmac(key, msg):
     """
     CBC-MAC using AES-128.
 
     Args:
-        key: key for MAC creation.
+        key: key for MAC creation, or a :class:`CBCMac` object.
         msg: Plaintext to be MACed, as a bytes object.
 
     Returns:
@@ -40,7 +110,25 @@ def cbcmac(key, msg):
         raise ValueError('Key is NULL.')
     elif msg is None:
         raise ValueError('Message is NULL.')
+    elif isinstance(key, CBCMac):
+        return key.mac(msg)
     else:
         iv = b"\x00" * 16
         cipher = AES.new(key, AES.MODE_CBC, iv)
         return cipher.encrypt(msg)[-16:]  # Return the last block of ciphertext.
+
+
+def cbcmac_many(key, msgs):
+    """
+    CBC-MAC using AES-128, for several messages of the same length.
+
+    Args:
+        key: key for MAC creation, or a :class:`CBCMac` object.
+        msgs: List of plaintexts to be MACed, as bytes objects.
+
+    Returns:
+        List of MAC outputs, as bytes objects.
+    """
+    if not isinstance(key, CBCMac):
+        key = CBCMac(key)
+    return key.mac_many(msgs)
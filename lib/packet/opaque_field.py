@@ -19,7 +19,7 @@
 import struct
 
 # SCION
-from lib.crypto.symcrypto import cbcmac
+from lib.crypto.symcrypto import cbcmac, cbcmac_many
 from lib.defines import OPAQUE_FIELD_LEN
 from lib.errors import SCIONIndexError, SCIONKeyError
 from lib.flagtypes import HopOFFlags, InfoOFFlags
@@ -117,6 +117,19 @@ class HopOpaqueField(OpaqueField):
 
     def calc_mac(self, key, ts, prev_hof=None):
         """Generates MAC for newly created OF."""
+        return cbcmac(key, self._mac_input(ts, prev_hof))[:self.MAC_LEN]
+
+    @classmethod
+    def set_macs(cls, key, ts, hofs, prev_hof=None):
+        """
+        Set the MACs of several newly created OFs that share the same previous
+        OF, in a single batch.
+        """
+        msgs = [hof._mac_input(ts, prev_hof) for hof in hofs]
+        for hof, mac in zip(hofs, cbcmac_many(key, msgs)):
+            hof.mac = mac[:cls.MAC_LEN]
+
+    def _mac_input(self, ts, prev_hof):
         raw = []
         raw.append(self.pack(mac=True))
         if prev_hof:
@@ -128,7 +141,7 @@ class HopOpaqueField(OpaqueField):
         raw.append(bytes(self.MAC_BLOCK_PADDING))
         to_mac = b"".join(raw)
         assert len(to_mac) == self.MAC_BLOCK_LEN
-        return cbcmac(key, to_mac)[:self.MAC_LEN]
+        return to_mac
 
     def verify_mac(self, *args, **kwargs):  # pragma: no cover
         return self.mac == self.calc_mac(*args, **kwargs)
@@ -240,6 +253,7 @@ class OpaqueFieldList(object):
         """
         self._order = order
         self._labels = {}
+        self._parsers = {}
         for label in order:
             self._labels[label] = []
 
@@ -256,6 +270,31 @@ class OpaqueFieldList(object):
         if label not in self._labels:
             raise SCIONKeyError("Opaque field label (%s) unknown" % label)
         self._labels[label] = ofs
+        self._parsers.pop(label, None)
+
+    def set_lazy(self, label, raws, parser):
+        """
+        Sets an OF label to a list of raw opaque fields, which are only parsed
+        (using `parser`) when they are first accessed. Raw OFs which are never
+        accessed are packed as-is.
+
+        :param str label: OF label to change. E.g. ``UP_HOFS``.
+        :param list raws: List of raw opaque fields, as bytes.
+        :param parser: Callable that creates an OF from raw bytes.
+        :raises:
+            :any:`SCIONKeyError`: if the label is unknown.
+        """
+        self.set(label, raws)
+        self._parsers[label] = parser
+
+    def _decode(self, label, group, idx):
+        """
+        Return the OF at `idx` in `group`, parsing it first if needed.
+        """
+        of = group[idx]
+        if isinstance(of, bytes):
+            of = group[idx] = self._parsers[label](of)
+        return of
 
     def get_by_idx(self, idx):
         """
@@ -274,7 +313,7 @@ class OpaqueFieldList(object):
         for label in self._order:
             group = self._labels[label]
             if offset < len(group):
-                return group[offset]
+                return self._decode(label, group, offset)
             offset -= len(group)
         raise SCIONIndexError("Requested OF index (%d) is out of range (max %d)"
                               % (idx, len(self) - 1))
@@ -299,9 +338,11 @@ class OpaqueFieldList(object):
             raise SCIONKeyError("Opaque field label (%s) unknown"
                                 % label) from None
         if label_idx is None:
+            for i in range(len(group)):
+                self._decode(label, group, i)
             return group
         try:
-            return group[label_idx]
+            return self._decode(label, group, label_idx)
         except IndexError:
             raise SCIONIndexError(
                 "Opaque field label index (%d) for label %s out of range" %
@@ -364,6 +405,12 @@ class OpaqueFieldList(object):
         except KeyError as e:
             raise SCIONKeyError("Opaque field label (%s) unknown"
                                 % e.args[0]) from None
+        parser_a = self._parsers.pop(label_a, None)
+        parser_b = self._parsers.pop(label_b, None)
+        if parser_a:
+            self._parsers[label_b] = parser_a
+        if parser_b:
+            self._parsers[label_a] = parser_b
 
     def reverse_label(self, label):
         """
@@ -394,7 +441,7 @@ class OpaqueFieldList(object):
             raise SCIONKeyError("Opaque field label (%s) unknown"
                                 % label) from None
         if len(group) > 0:
-            group[0].up_flag ^= True
+            self._decode(label, group, 0).up_flag ^= True
 
     def pack(self):
         """
@@ -406,7 +453,11 @@ class OpaqueFieldList(object):
         ret = []
         for label in self._order:
             for of in self._labels[label]:
-                ret.append(of.pack())
+                if isinstance(of, bytes):
+                    # Never parsed, so it can't have been modified.
+                    ret.append(of)
+                else:
+                    ret.append(of.pack())
         return b"".join(ret)
 
     def count(self, label):
@@ -42,10 +42,17 @@ class SCIONPath(Serializable):
     IOF_LABELS = A_IOF, B_IOF, C_IOF
     HOF_LABELS = A_HOFS, B_HOFS, C_HOFS
 
-    def __init__(self, raw=None):  # pragma: no cover
+    def __init__(self, raw=None, lazy=False):  # pragma: no cover
+        """
+        :param bytes raw: Raw path to parse.
+        :param bool lazy:
+            If set, :any:`HopOpaqueField`\s are only parsed when they are first
+            accessed.
+        """
         self._ofs = OpaqueFieldList(self.OF_ORDER)
         self._iof_idx = None
         self._hof_idx = None
+        self._lazy = lazy
         self.interfaces = []
         self.mtu = None
         super().__init__(raw)
@@ -86,6 +93,10 @@ class SCIONPath(Serializable):
         :param str label: OF label.
         :param int count: Number of HOFs to parse.
         """
+        if self._lazy:
+            raws = [data.pop(HopOpaqueField.LEN) for _ in range(count)]
+            self._ofs.set_lazy(label, raws, HopOpaqueField)
+            return
         hofs = []
         for _ in range(count):
             hofs.append(HopOpaqueField(data.pop(HopOpaqueField.LEN)))
@@ -338,6 +349,41 @@ def min_mtu(*candidates):
     return min(filter(valid_mtu, candidates), default=0)
 
 
+class ShortcutIndex(object):
+    """
+    Positions of the ASes and peering links of a segment, so that the
+    crossover and peer points of two segments can be found with dict lookups
+    instead of comparing every pair of ASMarkings.
+
+    :ivar dict ases: maps ISD-AS to its position in the segment.
+    :ivar dict peers:
+        maps a peering link to the position of the AS it's attached to. Links
+        are keyed as `(up ISD-AS, down ISD-AS, up IF, down IF)`, where `up` is
+        the AS in the up-segment, so that the same link has the same key in
+        the up- and the down-segment.
+    """
+    def __init__(self, segment, up=True):
+        """
+        :param PathSegment segment: the segment to index.
+        :param bool up: ``True`` if `segment` is used as an up-segment.
+        """
+        self.ases = {}
+        self.peers = {}
+        # The first (core) AS can't be a crossover or peer point.
+        for i, asm in enumerate(segment.iter_asms(1), 1):
+            isd_as = asm.isd_as()
+            self.ases[isd_as] = i
+            for pcbm in asm.iter_pcbms(1):
+                peer_ia = pcbm.inIA()
+                if peer_ia == isd_as:
+                    # That would be a crossover point.
+                    continue
+                key = (isd_as, peer_ia, pcbm.hof().ingress_if, pcbm.p.inIF)
+                if not up:
+                    key = (key[1], key[0], key[3], key[2])
+                self.peers[key] = i
+
+
 class PathCombinator(object):
     """
     Class that contains functions required to build end-to-end SCION paths.
@@ -353,21 +399,41 @@ class PathCombinator(object):
         :returns: List of paths.
         """
         paths = []
-        for up in up_segments:
-            for down in down_segments:
-                path = cls._build_shortcut_path(up, down)
-                if path and path not in paths:
+        seen = set()
+        up_idxs = [cls._index_segment(up) for up in up_segments]
+        down_idxs = [cls._index_segment(down, False)
+                     for down in down_segments]
+        for up, up_idx in zip(up_segments, up_idxs):
+            for down, down_idx in zip(down_segments, down_idxs):
+                path = cls._build_shortcut_path(up, down, up_idx, down_idx)
+                if not path:
+                    continue
+                raw = path.pack()
+                if raw not in seen:
+                    seen.add(raw)
                     paths.append(path)
         return paths
 
     @classmethod
-    def _build_shortcut_path(cls, up_segment, down_segment):
+    def _index_segment(cls, segment, up=True):
+        """
+        Return the :any:`ShortcutIndex` of a segment, or ``None`` if it's
+        empty.
+        """
+        if not segment or not segment.p.asms:
+            return None
+        return ShortcutIndex(segment, up)
+
+    @classmethod
+    def _build_shortcut_path(cls, up_segment, down_segment, up_idx, down_idx):
         """
         Takes :any:`PathSegment`\s and tries to combine them into short path via
         any cross-over or peer links found.
 
         :param list up_segment: `up` :any:`PathSegment`.
         :param list down_segment: `down` :any:`PathSegment`.
+        :param ShortcutIndex up_idx: index of `up_segment`.
+        :param ShortcutIndex down_idx: index of `down_segment`.
         :returns: SCIONPath if a shortcut path is found, otherwise ``None``.
         """
         # TODO check if stub ASs are the same...
@@ -376,7 +442,7 @@ class PathCombinator(object):
             return None
 
         # looking for xovr and peer points
-        xovr, peer = cls._get_xovr_peer(up_segment, down_segment)
+        xovr, peer = cls._get_xovr_peer(up_idx, down_idx)
 
         if not xovr and not peer:
             return None
@@ -433,7 +499,7 @@ class PathCombinator(object):
         return info, hofs, mtu
 
     @classmethod
-    def _get_xovr_peer(cls, up_segment, down_segment):
+    def _get_xovr_peer(cls, up_idx, down_idx):
         """
         Find the shortest xovr (preferred) and peer points between the supplied
         segments.
@@ -441,28 +507,26 @@ class PathCombinator(object):
         *Note*: 'shortest' is calculated by looking for the point that's
         furthest from the core.
 
-        :param list up_segment: `up` :any:`PathSegment`.
-        :param list down_segment: `down` :any:`PathSegment`.
+        :param ShortcutIndex up_idx: index of the `up` :any:`PathSegment`.
+        :param ShortcutIndex down_idx: index of the `down` :any:`PathSegment`.
         :returns:
             Tuple of the shortest xovr and peer points.
         """
-        xovrs = []
-        peers = []
-        for up_i, up_asm in enumerate(up_segment.iter_asms(1), 1):
-            for down_i, down_asm in enumerate(down_segment.iter_asms(1), 1):
-                up_ia = up_asm.isd_as()
-                down_ia = down_asm.isd_as()
-                if up_ia == down_ia:
-                    xovrs.append((up_i, down_i))
-                    continue
-                if cls._join_shortcuts_peer(up_asm, down_asm):
-                    peers.append((up_i, down_i))
-        xovr = peer = None
-        if xovrs:
-            xovr = max(xovrs, key=lambda tup: sum(tup))
-        if peers:
-            peer = max(peers, key=lambda tup: sum(tup))
-        return xovr, peer
+        xovrs = [(up_idx.ases[ia], down_idx.ases[ia])
+                 for ia in up_idx.ases.keys() & down_idx.ases.keys()]
+        peers = [(up_idx.peers[key], down_idx.peers[key])
+                 for key in up_idx.peers.keys() & down_idx.peers.keys()]
+        return cls._best_point(xovrs), cls._best_point(peers)
+
+    @classmethod
+    def _best_point(cls, points):
+        """
+        Return the point furthest from the core, preferring the one closest to
+        the start of the up-segment on a tie, or ``None`` if there are none.
+        """
+        if not points:
+            return None
+        return max(points, key=lambda tup: (sum(tup), -tup[0]))
 
     @classmethod
     def _join_shortcuts(cls, up_segment, down_segment, point, peer=True):
@@ -666,5 +730,5 @@ class PathCombinator(object):
         return res
 
 
-def parse_path(raw):  # pragma: no cover
-    return SCIONPath(raw)
+def parse_path(raw, lazy=False):  # pragma: no cover
+    return SCIONPath(raw, lazy=lazy)
@@ -15,6 +15,9 @@
 :mod:`pcb` --- SCION Beacon
 ===========================
 """
+# Stdlib
+import itertools
+
 # External packages
 from Crypto.Hash import SHA256
 import capnp  # noqa
@@ -89,11 +92,16 @@ class ASMarking(Cerealizable):
 
     @classmethod
     def from_values(cls, isd_as, trc_ver, cert_ver, pcbms, eg_rev_token, mtu,
-                    cert_chain, ifid_size=12, rev_infos=()):
+                    raw_chain, ifid_size=12, rev_infos=()):
+        """
+        :param bytes raw_chain:
+            the AS's cert chain, packed with lz4 compression (see
+            :meth:`lib.trust_store.TrustStore.get_packed_cert`).
+        """
         p = cls.P_CLS.new_message(
             isdas=str(isd_as), trcVer=trc_ver, certVer=cert_ver,
             ifIDSize=ifid_size, egRevToken=eg_rev_token, mtu=mtu,
-            chain=cert_chain.pack(lz4_=True))
+            chain=raw_chain)
         p.init("pcbms", len(pcbms))
         for i, pm in enumerate(pcbms):
             p.pcbms[i] = pm.p
@@ -163,6 +171,8 @@ class PathSegment(SCIONPayloadBaseProto):
     def __init__(self, p):  # pragma: no cover
         super().__init__(p)
         self._min_exp = float("inf")
+        # Values derived from the ASMarkings, see _cached().
+        self._cache = {}
         self._setup()
 
     def _setup(self):
@@ -184,6 +194,22 @@ class PathSegment(SCIONPayloadBaseProto):
         for asm in self.iter_asms():
             self._min_exp = min(self._min_exp, asm.pcbm(0).hof().exp_time)
 
+    def _cached(self, key, func):
+        """
+        Return the cached value for key, calling func to compute it if
+        needed. The cache is cleared by :meth:`_invalidate` whenever the
+        segment is changed through its methods.
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        value = self._cache[key] = func()
+        return value
+
+    def _invalidate(self):  # pragma: no cover
+        self._cache.clear()
+
     def asm(self, idx):  # pragma: no cover
         return ASMarking(self.p.asms[idx])
 
@@ -216,12 +242,38 @@ class PathSegment(SCIONPayloadBaseProto):
         """
         Appends a new ASMarking block.
         """
-        d = self.p.to_dict()
-        d.setdefault('asms', []).append(asm.p)
-        self.p.from_dict(d)
+        self.p = self._copy_p([asm.p])
+        if self.sibra_ext:
+            self.sibra_ext = SibraPCBExt(self.p.exts.sibra)
+        self._invalidate()
         self._update_info()
         self._min_exp = min(self._min_exp, asm.pcbm(0).hof().exp_time)
 
+    def copy_with_asm(self, asm):  # pragma: no cover
+        """
+        Returns a copy of the segment with a new ASMarking block appended,
+        leaving this segment unchanged. This allows building the propagated
+        segments for several interfaces from the same prefix, with a single
+        copy each.
+        """
+        inst = type(self)(self._copy_p([asm.p]))
+        inst._update_info()
+        return inst
+
+    def _copy_p(self, new_asms):
+        """
+        Copies the capnp message, with extra ASMarkings appended. Capnp lists
+        can't be resized, so this allocates the new list at its final size,
+        and copies the existing ASMarkings into it.
+        """
+        p = self.P_CLS.new_message(info=self.p.info, ifID=self.p.ifID)
+        if self.p.exts._has("sibra"):
+            p.exts.sibra = self.p.exts.sibra
+        asms = p.init("asms", len(self.p.asms) + len(new_asms))
+        for i, asm_p in enumerate(itertools.chain(self.p.asms, new_asms)):
+            asms[i] = asm_p
+        return p
+
     def _update_info(self):  # pragma: no cover
         self.info.hops = len(self.p.asms)
         self.p.info = self.info.pack()
@@ -237,6 +289,7 @@ class PathSegment(SCIONPayloadBaseProto):
         for asm in self.iter_asms():
             asm.remove_sig()
             asm.remove_chain()
+        self._invalidate()
 
     def get_path(self, reverse_direction=False):
         """
@@ -253,10 +306,10 @@ class PathSegment(SCIONPayloadBaseProto):
         return SCIONPath.from_values(info, hofs)
 
     def first_ia(self):  # pragma: no cover
-        return self.asm(0).isd_as()
+        return self._cached("first_ia", lambda: self.asm(0).isd_as())
 
     def last_ia(self):  # pragma: no cover
-        return self.asm(-1).isd_as()
+        return self._cached("last_ia", lambda: self.asm(-1).isd_as())
 
     def last_hof(self):  # pragma: no cover
         if self.p.asms:
@@ -268,15 +321,22 @@ class PathSegment(SCIONPayloadBaseProto):
         Returns the hash over all the interface revocation tokens included in
         the path segment.
         """
+        digest, hexdigest = self._cached("hops_hash", self._calc_hops_hash)
+        if hex:
+            return hexdigest
+        return digest
+
+    def _calc_hops_hash(self):
         h = SHA256.new()
         for token in self.get_all_iftokens():
             h.update(token)
-        if hex:
-            return h.hexdigest()
-        return h.digest()
+        return h.digest(), h.hexdigest()
 
     def get_n_peer_links(self):  # pragma: no cover
         """Return the total number of peer links in the PathSegment."""
+        return self._cached("n_peer_links", self._calc_n_peer_links)
+
+    def _calc_n_peer_links(self):  # pragma: no cover
         n = 0
         for asm in self.p.asms:
             n += len(asm.pcbms) - 1
@@ -294,6 +354,7 @@ class PathSegment(SCIONPayloadBaseProto):
         """Updates the timestamp in the IOF."""
         assert timestamp < 2 ** 32 - 1
         self.info.timestamp = timestamp
+        self._invalidate()
         self._update_info()
 
     def get_expiration_time(self):  # pragma: no cover
@@ -309,7 +370,11 @@ class PathSegment(SCIONPayloadBaseProto):
     def get_all_iftokens(self):
         """
         Returns all interface revocation tokens included in the path segment.
+        The returned list is cached, and must not be modified.
         """
+        return self._cached("iftokens", self._calc_all_iftokens)
+
+    def _calc_all_iftokens(self):
         tokens = []
         for asm in self.p.asms:
             for pcbm in asm.pcbms:
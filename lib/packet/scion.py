@@ -46,6 +46,7 @@ from lib.packet.path_mgmt.parse import parse_pathmgmt_payload
 from lib.packet.pcb import parse_pcb_payload
 from lib.packet.scion_addr import SCIONAddr
 from lib.packet.scion_l4 import parse_l4_hdr
+from lib.packet.scion_udp import SCIONUDPHeader
 from lib.packet.scmp.errors import (
     SCMPBadDstType,
     SCMPBadEnd2End,
@@ -91,6 +92,8 @@ class SCIONCommonHdr(Serializable):
     """
     NAME = "SCIONCommonHdr"
     LEN = 8
+    # Offset of the current IOF/HOF pointers.
+    OF_PTRS_OFFSET = 4
 
     def __init__(self, raw=None):  # pragma: no cover
         self.version = 0  # Version of SCION packet.
@@ -152,12 +155,7 @@ class SCIONCommonHdr(Serializable):
         types = ((self.version << 12) | (self.src_addr_type << 6) |
                  self.dst_addr_type)
         packed.append(struct.pack("!HH", types, self.total_len))
-        curr_iof_p = curr_hof_p = self.LEN + self.addrs_len
-        if self._iof_idx:
-            curr_iof_p += self._iof_idx * OpaqueField.LEN
-        if self._hof_idx:
-            curr_hof_p += self._hof_idx * OpaqueField.LEN
-        packed.append(struct.pack("!BB", curr_iof_p, curr_hof_p))
+        packed.append(struct.pack("!BB", *self.get_of_ptrs()))
         packed.append(struct.pack("!BB", self.next_hdr, self.hdr_len))
         raw = b"".join(packed)
         assert len(raw) == self.LEN
@@ -182,6 +180,18 @@ class SCIONCommonHdr(Serializable):
     def get_of_idxs(self):  # pragma: no cover
         return self._iof_idx, self._hof_idx
 
+    def get_of_ptrs(self):
+        """
+        Get the current IOF and HOF pointers, i.e. the byte offsets of the
+        current OFs from the start of the packet.
+        """
+        curr_iof_p = curr_hof_p = self.LEN + self.addrs_len
+        if self._iof_idx:
+            curr_iof_p += self._iof_idx * OpaqueField.LEN
+        if self._hof_idx:
+            curr_hof_p += self._hof_idx * OpaqueField.LEN
+        return curr_iof_p, curr_hof_p
+
     def set_of_idxs(self, iof_idx, hof_idx):  # pragma: no cover
         self._iof_idx = iof_idx
         self._hof_idx = hof_idx
@@ -431,6 +441,13 @@ class SCIONBasePacket(PacketBase):
         self.addrs.reverse()
         self.path.reverse()
 
+    def mark_modified(self):  # pragma: no cover
+        """
+        Record that a header was changed in place. Only packets which track
+        modifications (i.e. :any:`LazySCIONL4Packet`) need to know about this.
+        """
+        pass
+
     def reversed_copy(self):  # pragma: no cover
         inst = copy.deepcopy(self)
         inst.reverse()
@@ -537,6 +554,9 @@ class SCIONExtPacket(SCIONBasePacket):
 
     def validate(self, pkt_len):
         super().validate(pkt_len)
+        return self._validate_exts()
+
+    def _validate_exts(self):
         if not self._unknown_exts:
             return True
         # Use the first unknown extension, and use that for the SCMP error
@@ -664,6 +684,267 @@ class SCIONL4Packet(SCIONExtPacket):
         return s
 
 
+class _LazyAttr(object):
+    """
+    Descriptor for :any:`LazySCIONL4Packet` attributes which are only decoded
+    from the raw packet when they're first accessed.
+    """
+    def __init__(self, name, decoder):  # pragma: no cover
+        self._name = name
+        self._decoder = decoder
+
+    def __get__(self, inst, owner):
+        if inst is None:
+            return self
+        if self._name not in inst.__dict__:
+            getattr(inst, self._decoder)()
+        return inst.__dict__[self._name]
+
+    def __set__(self, inst, value):  # pragma: no cover
+        inst.__dict__[self._name] = value
+        inst.mark_modified()
+
+
+class _ModifiedAttr(object):
+    """
+    Descriptor for :any:`LazySCIONL4Packet` headers which mark the packet as
+    modified when they're replaced.
+    """
+    def __init__(self, name):  # pragma: no cover
+        self._name = name
+
+    def __get__(self, inst, owner):  # pragma: no cover
+        if inst is None:
+            return self
+        try:
+            return inst.__dict__[self._name]
+        except KeyError:
+            raise AttributeError(self._name) from None
+
+    def __set__(self, inst, value):  # pragma: no cover
+        inst.__dict__[self._name] = value
+        inst.mark_modified()
+
+
+class LazySCIONL4Packet(SCIONL4Packet):
+    """
+    A :any:`SCIONL4Packet` which is parsed on demand, for use on the router
+    fast path.
+
+    Only the common header, the path skeleton (the IOFs) and the extension
+    headers are parsed up front, so that malformed packets are still rejected
+    at parse time. The address header, the :any:`HopOpaqueField`\s, the L4
+    header and the payload are only decoded when first accessed. When packing,
+    regions that were never decoded (or that decode back to the same bytes) are
+    copied from the original buffer, so a transit packet doesn't need its L4
+    checksum recalculated.
+
+    Replacing a header or the payload, or calling :any:`reverse`, marks the
+    packet as modified. In-place changes to a decoded address header are found
+    by comparing it to the original region. Code that changes another header
+    in place (e.g. an extension handler) has to call :any:`mark_modified`
+    itself; changes to the current OF indexes don't count as modifications.
+    """
+    NAME = "LazySCIONL4Packet"
+    L4_HDR_LENS = {L4Proto.UDP: SCIONUDPHeader.LEN,
+                   L4Proto.SCMP: SCMPHeader.LEN}
+    # Attributes which are only decoded when accessed.
+    LAZY_ATTRS = "addrs", "l4_hdr", "_payload"
+    addrs = _LazyAttr("addrs", "_decode_addrs")
+    l4_hdr = _LazyAttr("l4_hdr", "_decode_l4")
+    _payload = _LazyAttr("_payload", "_decode_l4")
+    path = _ModifiedAttr("path")
+    ext_hdrs = _ModifiedAttr("ext_hdrs")
+
+    def __init__(self, raw=None):  # pragma: no cover
+        self._modified = False
+        self._raw = None
+        self._l4_offset = None
+        super().__init__(raw)
+
+    def _parse(self, raw):
+        if len(raw) < self.MIN_LEN:
+            raise SCIONParseError(
+                "Error parsing raw %s: Expected len >= %s, got %s" %
+                (self.NAME, self.MIN_LEN, len(raw)))
+        self._raw = raw
+        view = memoryview(raw)
+        for name in self.LAZY_ATTRS:
+            self.__dict__.pop(name, None)
+        self.cmn_hdr = SCIONCommonHdr(bytes(view[:SCIONCommonHdr.LEN]))
+        if self.cmn_hdr.src_addr_type == AddrType.SVC:
+            raise SCMPBadSrcType("Invalid source type: SVC")
+        path_offset = SCIONCommonHdr.LEN + self.cmn_hdr.addrs_len
+        hdr_len = self.cmn_hdr.hdr_len
+        if hdr_len > len(raw):
+            raise SCIONParseError(
+                "Bad header len field (%sB), "
+                "implies path is longer than packet (%sB)" %
+                (hdr_len, len(raw)))
+        self.path = parse_path(bytes(view[path_offset:hdr_len]), lazy=True)
+        self.path.set_of_idxs(*self.cmn_hdr.get_of_idxs())
+        self._parse_exts(view)
+        self._modified = False
+
+    def _parse_exts(self, view):
+        """
+        Find the end of the extension headers by walking their subheaders, and
+        only copy that region for parsing.
+        """
+        offset = start = self.cmn_hdr.hdr_len
+        cur_hdr_type = self.cmn_hdr.next_hdr
+        while cur_hdr_type not in L4Proto.L4:
+            if offset + ExtensionHeader.SUBHDR_LEN > len(view):
+                raise SCIONParseError(
+                    "%s: extension header at offset %sB is truncated" %
+                    (self.NAME, offset))
+            cur_hdr_type = view[offset]
+            offset += (view[offset + 1] + 1) * ExtensionHeader.LINE_LEN
+        self.ext_hdrs, self._l4_proto, self._unknown_exts = parse_extensions(
+            Raw(bytes(view[start:offset]), self.NAME), self.cmn_hdr.next_hdr)
+        hdr_len = self.L4_HDR_LENS.get(self._l4_proto, 0)
+        if offset + hdr_len > len(view):
+            raise SCIONParseError(
+                "%s: L4 header at offset %sB is truncated" %
+                (self.NAME, offset))
+        self._l4_offset = offset
+
+    def _decode_addrs(self):
+        start = SCIONCommonHdr.LEN
+        raw = bytes(memoryview(self._raw)[start:start + self.cmn_hdr.addrs_len])
+        # Decoding isn't a modification, so bypass the descriptor.
+        self.__dict__["addrs"] = SCIONAddrHdr((
+            self.cmn_hdr.src_addr_type, self.cmn_hdr.dst_addr_type, raw))
+
+    def _decode_l4(self):
+        data = Raw(bytes(memoryview(self._raw)[self._l4_offset:]), self.NAME)
+        l4_hdr = parse_l4_hdr(
+            self._l4_proto, data, src=self.addrs.src, dst=self.addrs.dst)
+        # Don't overwrite a header or payload that has already been replaced.
+        if "l4_hdr" not in self.__dict__:
+            self.__dict__["l4_hdr"] = l4_hdr
+        if "_payload" not in self.__dict__:
+            self.__dict__["_payload"] = PayloadRaw(data.get())
+
+    def _decoded(self, name):  # pragma: no cover
+        return name in self.__dict__
+
+    def _raw_region(self, name):
+        """
+        Return a memoryview of one of the packet's original regions.
+        """
+        view = memoryview(self._raw)
+        addrs_end = SCIONCommonHdr.LEN + self.cmn_hdr.addrs_len
+        regions = {
+            "addrs": (SCIONCommonHdr.LEN, addrs_end),
+            "l4": (self._l4_offset, len(view)),
+        }
+        start, end = regions[name]
+        return view[start:end]
+
+    def mark_modified(self):  # pragma: no cover
+        self._modified = True
+
+    def reverse(self):  # pragma: no cover
+        self.mark_modified()
+        super().reverse()
+
+    def _unmodified(self):
+        """
+        Check if the packet is unchanged from when it was received, apart from
+        the current OF indexes.
+        """
+        # There's no cheap way to tell if the payload has been changed.
+        if self._modified or self._decoded("l4_hdr"):
+            return False
+        return not self._addrs_changed()
+
+    def _addrs_changed(self):
+        """
+        Check if the address header was decoded and then changed in place.
+        """
+        if not self._decoded("addrs"):
+            return False
+        return self.addrs.pack() != self._raw_region("addrs")
+
+    def _patch_of_ptrs(self):
+        """
+        Write the current OF pointers into the received buffer, and return it.
+        """
+        self.cmn_hdr.set_of_idxs(*self.path.get_of_idxs())
+        if not isinstance(self._raw, bytearray):
+            self._raw = bytearray(self._raw)
+        struct.pack_into("!BB", self._raw, SCIONCommonHdr.OF_PTRS_OFFSET,
+                         *self.cmn_hdr.get_of_ptrs())
+        return self._raw
+
+    def validate(self, pkt_len):
+        """
+        Same as :any:`SCIONL4Packet.validate`, except that the L4 header is only
+        validated if it has already been decoded.
+        """
+        path_len = len(self.path)
+        self.cmn_hdr.validate(pkt_len, path_len)
+        if self.cmn_hdr.dst_addr_type == AddrType.SVC:
+            self.addrs.validate()
+        if path_len:
+            self._validate_of_idxes()
+        self._validate_exts()
+        if self._decoded("l4_hdr") and self.l4_hdr:
+            self.l4_hdr.validate(self._payload.pack())
+
+    def update(self):
+        if self._raw is None or self._decoded("l4_hdr"):
+            super().update()
+            return
+        # The L4 header and payload are unchanged, so their length is simply
+        # that of the original region.
+        if self._decoded("addrs"):
+            self.addrs.update()
+        hdr = self.cmn_hdr
+        if self._decoded("addrs"):
+            hdr.src_addr_type = self.addrs.src_type()
+            hdr.dst_addr_type = self.addrs.dst_type()
+            hdr.addrs_len = len(self.addrs)
+        hdr.hdr_len = len(hdr) + hdr.addrs_len + len(self.path)
+        exts_len = sum(len(ext) for ext in self.ext_hdrs)
+        hdr.total_len = (hdr.hdr_len + exts_len +
+                         len(self._raw) - self._l4_offset)
+        hdr.set_of_idxs(*self.path.get_of_idxs())
+        hdr.next_hdr = self._get_next_hdr()
+
+    def pack(self):
+        """
+        Pack the packet. If nothing other than the current OF indexes has been
+        changed (which is the case for plain transit packets), then the OF
+        pointers are patched in the received buffer, and that is returned
+        instead of building a new one.
+        """
+        if self._raw is None:
+            return super().pack()
+        if self._unmodified():
+            return self._patch_of_ptrs()
+        if not self._decoded("l4_hdr") and (
+                self._decoded("_payload") or self._addrs_changed()):
+            # The payload was replaced, or the addresses (which the L4 checksum
+            # covers) were changed, so the L4 header needs to be re-encoded.
+            self._decode_l4()
+        if self._decoded("l4_hdr"):
+            return super().pack()
+        self.update()
+        packed = [self.cmn_hdr.pack()]
+        if self._decoded("addrs"):
+            packed.append(self.addrs.pack())
+        else:
+            packed.append(self._raw_region("addrs"))
+        packed.append(self.path.pack())
+        packed.append(self.pack_exts())
+        packed.append(self._raw_region("l4"))
+        raw = b"".join(packed)
+        assert len(raw) == self.cmn_hdr.total_len
+        return raw
+
+
 def build_base_hdrs(src, dst, l4=L4Proto.UDP):
     cmn_hdr = SCIONCommonHdr.from_values(src.host.TYPE, dst.host.TYPE, l4)
     addr_hdr = SCIONAddrHdr.from_values(src, dst)
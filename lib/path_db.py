@@ -16,14 +16,15 @@
 ================================
 """
 # Stdlib
+import bisect
+import heapq
+import itertools
 import logging
 import threading
 
-# External packages
-from pydblite.pydblite import Base
-
 # SCION
 from lib.packet.pcb import PathSegment
+from lib.rev_index import RevocationIndex
 from lib.util import SCIONTime
 
 
@@ -65,7 +66,28 @@ class PathSegmentDBRecord(object):
 
 
 class PathSegmentDB(object):
-    """Simple database for paths using PyDBLite"""
+    """
+    In-memory database for path segments.
+
+    Segments are indexed by first/last ISD-AS and first/last ISD, with each
+    index bucket kept sorted by fidelity. Buckets are only modified with the
+    lock held, while queries take a snapshot of a bucket with a single (atomic)
+    slice, so they don't need the lock and are never blocked by writers.
+
+    Expired segments are removed in order of expiration, using a heap, whenever
+    the earliest expiration time has passed.
+
+    The interface revocation tokens of all segments are kept in a
+    :class:`lib.rev_index.RevocationIndex`, so that revoked segments can be
+    found without checking every segment.
+
+    Every change to the stored segments increments the generation (see
+    :any:`get_generation`), so that results derived from the database can be
+    cached.
+    """
+    # Fields a query can select on, besides `sibra`.
+    INDEXED_FIELDS = ("first_ia", "last_ia", "first_isd", "last_isd")
+
     def __init__(self, segment_ttl=None, max_res_no=None):  # pragma: no cover
         """
         :param int segment_ttl:
@@ -73,28 +95,39 @@ class PathSegmentDB(object):
             the segment's expiration time.
         :param int max_res_no: Number of results returned for a query.
         """
-        self._db = Base("", save_to_file=False)
-        self._db.create('record', 'id', 'first_isd', 'first_as', 'last_isd',
-                        'last_as', 'sibra', mode='override')
-        self._db.create_index('id')
-        self._db.create_index('last_isd')
-        self._db.create_index('last_as')
+        # Maps (segment id, sibra) to (record, index keys, index item).
+        self._records = {}
+        # Maps (field, value, sibra) to a list of (fidelity, seq, record),
+        # sorted by fidelity. (None, None, sibra) covers all records.
+        self._indexes = {}
+        self._seq = itertools.count()
+        # Heap of (expiration time, seq, (segment id, sibra)). Entries aren't
+        # removed when a record is deleted or refreshed, so the record's
+        # current expiration time is checked when an entry is popped.
+        self._exp_heap = []
+        # Indexes (segment id, sibra) by interface revocation token.
+        self._rev_index = RevocationIndex()
+        self._generation = 0
         self._lock = threading.Lock()
         self._segment_ttl = segment_ttl
         self._max_res_no = max_res_no
 
+    def _get_record(self, seg_id):  # pragma: no cover
+        for sibra in (False, True):
+            entry = self._records.get((seg_id, sibra))
+            if entry:
+                return entry[0]
+        return None
+
     def __getitem__(self, seg_id):  # pragma: no cover
         """Return a path object by segment id."""
-        with self._lock:
-            recs = self._db(id=seg_id)
-        if recs:
-            return recs[0]['record'].pcb
+        record = self._get_record(seg_id)
+        if record:
+            return record.pcb
         return None
 
     def __contains__(self, seg_id):  # pragma: no cover
-        with self._lock:
-            recs = self._db(id=seg_id)
-        return len(recs) > 0
+        return self._get_record(seg_id) is not None
 
     def update(self, pcb, reverse=False):
         """
@@ -110,33 +143,71 @@ class PathSegmentDB(object):
             record = PathSegmentDBRecord(pcb, now + self._segment_ttl)
         else:
             record = PathSegmentDBRecord(pcb)
+        sibra = pcb.is_sibra()
+        self._expire_due()
         with self._lock:
-            recs = self._db(id=record.id, sibra=pcb.is_sibra())
-            assert len(recs) <= 1, "PathDB contains > 1 path with the same ID"
-            if not recs:
-                self._db.insert(
-                    record, record.id, first_ia[0], first_ia[1],
-                    last_ia[0], last_ia[1], pcb.is_sibra())
+            entry = self._records.get((record.id, sibra))
+            if not entry:
+                self._insert(record, sibra, first_ia, last_ia)
                 logging.debug("Added segment from %s to %s: %s",
                               first_ia, last_ia, pcb.short_desc())
                 return DBResult.ENTRY_ADDED
-            cur_rec = recs[0]['record']
+            cur_rec = entry[0]
             if pcb.get_expiration_time() < cur_rec.pcb.get_expiration_time():
                 return DBResult.NONE
             cur_rec.pcb = pcb
+            self._generation += 1
+            self._rev_index.add((record.id, sibra), pcb.get_all_iftokens())
             if self._segment_ttl:
-                cur_rec.exp_time = now + self._segment_ttl
+                exp_time = now + self._segment_ttl
             else:
-                cur_rec.exp_time = pcb.get_expiration_time()
+                exp_time = pcb.get_expiration_time()
+            if exp_time != cur_rec.exp_time:
+                cur_rec.exp_time = exp_time
+                self._push_expiry(cur_rec, sibra)
             return DBResult.ENTRY_UPDATED
 
+    def _insert(self, record, sibra, first_ia, last_ia):
+        idx_keys = [
+            (None, None, sibra),
+            ("first_ia", _ia_key(first_ia), sibra),
+            ("last_ia", _ia_key(last_ia), sibra),
+            ("first_isd", first_ia[0], sibra),
+            ("last_isd", last_ia[0], sibra),
+        ]
+        item = (record.fidelity, next(self._seq), record)
+        for key in idx_keys:
+            bisect.insort(self._indexes.setdefault(key, []), item)
+        self._records[(record.id, sibra)] = (record, idx_keys, item)
+        self._rev_index.add((record.id, sibra), record.pcb.get_all_iftokens())
+        self._push_expiry(record, sibra)
+        self._generation += 1
+
+    def _push_expiry(self, record, sibra):
+        heapq.heappush(self._exp_heap, (
+            record.exp_time, next(self._seq), (record.id, sibra)))
+
+    def _remove(self, key):
+        _, idx_keys, item = self._records.pop(key)
+        self._rev_index.remove(key)
+        self._generation += 1
+        for idx_key in idx_keys:
+            bucket = self._indexes[idx_key]
+            # Items are unique by (fidelity, seq), so the record itself is
+            # never compared.
+            del bucket[bisect.bisect_left(bucket, item)]
+            if not bucket:
+                del self._indexes[idx_key]
+
     def delete(self, segment_id):
         """Deletes a path segment with a given ID."""
         with self._lock:
-            recs = self._db(id=segment_id)
-            if not recs:
+            keys = [(segment_id, sibra) for sibra in (False, True)
+                    if (segment_id, sibra) in self._records]
+            if not keys:
                 return DBResult.NONE
-            self._db.delete(recs)
+            for key in keys:
+                self._remove(key)
         return DBResult.ENTRY_DELETED
 
     def delete_all(self, segment_ids):
@@ -153,7 +224,24 @@ class PathSegmentDB(object):
                 deletions += 1
         return deletions
 
-    def __call__(self, *args, full=False, **kwargs):
+    def delete_revoked(self, rev_tokens):
+        """
+        Deletes all paths that contain any of the given interface revocation
+        tokens, and returns the number of deletions.
+
+        :param list rev_tokens:
+            The revocation tokens, e.g. as returned by
+            :meth:`lib.crypto.hash_chain.HashChain.walk`.
+        :returns: The number of deletions.
+        :rtype: int
+        """
+        with self._lock:
+            keys = self._rev_index.lookup(rev_tokens)
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def __call__(self, full=False, sibra=False, **kwargs):
         """
         Selection by field values.
 
@@ -162,49 +250,88 @@ class PathSegmentDB(object):
 
         :param bool full:
             Return list of results not bounded by self._max_res_no.
+        :param bool sibra: Select SIBRA (or non-SIBRA) segments.
+        :param kwargs:
+            Values to select on, for any of the fields in
+            :attr:`INDEXED_FIELDS`.
         """
-        kwargs = self._parse_call_kwargs(kwargs)
-        with self._lock:
-            recs = self._db(*args, **kwargs)
-            valid_recs = self._exp_call_records(recs)
-        return self._sort_call_pcbs(full, valid_recs)
-
-    def _parse_call_kwargs(self, kwargs):  # pragma: no cover
-        first_ia = kwargs.pop("first_ia", None)
-        if first_ia:
-            kwargs["first_isd"] = first_ia[0]
-            kwargs["first_as"] = first_ia[1]
-        last_ia = kwargs.pop("last_ia", None)
-        if last_ia:
-            kwargs["last_isd"] = last_ia[0]
-            kwargs["last_as"] = last_ia[1]
-        if "sibra" not in kwargs:
-            kwargs["sibra"] = False
-        return kwargs
-
-    def _exp_call_records(self, recs):
-        """Remove expired segments from the db."""
-        now = int(SCIONTime.get_time())
+        self._expire_due()
+        conds = self._parse_call_kwargs(kwargs, sibra)
+        # Use the smallest matching bucket, and filter on the rest.
+        bucket = []
+        for i, key in enumerate(conds):
+            cand = self._indexes.get(key)
+            if not cand:
+                return []
+            if not i or len(cand) < len(bucket):
+                bucket = cand
+        bucket = bucket[:]
+        limit = None if full else self._max_res_no
         ret = []
-        expired = []
-        for r in recs:
-            if r['record'].exp_time < now:
-                expired.append(r)
-                logging.debug("Path-Segment expired: %s",
-                              r['record'].pcb.short_desc())
+        for _, _, record in bucket:
+            if len(conds) > 1 and not self._matches(record, sibra, conds):
                 continue
-            ret.append(r)
-        if expired:
-            self._db.delete(expired)
+            ret.append(record.pcb)
+            if limit and len(ret) >= limit:
+                break
         return ret
 
-    def _sort_call_pcbs(self, full, valid_recs):  # pragma: no cover
-        seg_recs = sorted([r['record'] for r in valid_recs],
-                          key=lambda x: x.fidelity)
-        if self._max_res_no and not full:
-            seg_recs = seg_recs[:self._max_res_no]
-        return [r.pcb for r in seg_recs]
+    def _parse_call_kwargs(self, kwargs, sibra):  # pragma: no cover
+        conds = [(None, None, sibra)]
+        for field, value in kwargs.items():
+            assert field in self.INDEXED_FIELDS, field
+            if field.endswith("_ia"):
+                value = _ia_key(value)
+            conds.append((field, value, sibra))
+        return conds
 
-    def __len__(self):  # pragma: no cover
+    def _matches(self, record, sibra, conds):  # pragma: no cover
+        entry = self._records.get((record.id, sibra))
+        return entry is not None and set(conds).issubset(entry[1])
+
+    def _expire_due(self):
+        """Remove expired segments, if any expiration time has passed."""
+        try:
+            next_exp = self._exp_heap[0][0]
+        except IndexError:
+            return
+        if next_exp < int(SCIONTime.get_time()):
+            self.expire()
+
+    def expire(self):
+        """
+        Remove expired segments from the db.
+
+        :returns: The expired segments.
+        :rtype: list
+        """
+        now = int(SCIONTime.get_time())
+        expired = []
         with self._lock:
-            return len(self._db)
+            while self._exp_heap and self._exp_heap[0][0] < now:
+                _, _, key = heapq.heappop(self._exp_heap)
+                entry = self._records.get(key)
+                # The record may have been removed or refreshed meanwhile.
+                if not entry or entry[0].exp_time >= now:
+                    continue
+                pcb = entry[0].pcb
+                logging.debug("Path-Segment expired: %s", pcb.short_desc())
+                self._remove(key)
+                expired.append(pcb)
+        return expired
+
+    def get_generation(self):
+        """
+        Counter that is incremented whenever a segment is added, updated or
+        removed. Due expirations are processed first, so a result derived from
+        the database is current as long as the generation is unchanged.
+        """
+        self._expire_due()
+        return self._generation
+
+    def __len__(self):  # pragma: no cover
+        return len(self._records)
+
+
+def _ia_key(isd_as):  # pragma: no cover
+    return isd_as[0], isd_as[1]
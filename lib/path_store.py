@@ -20,7 +20,7 @@ import copy
 import heapq
 import logging
 import math
-from collections import defaultdict, deque
+from collections import OrderedDict, deque
 
 # External
 import yaml
@@ -28,6 +28,7 @@ import yaml
 # SCION
 from lib.packet.pcb import PathSegment
 from lib.packet.scion_addr import ISD_AS
+from lib.rev_index import RevocationIndex
 from lib.util import SCIONTime, load_yaml_file
 
 
@@ -209,6 +210,7 @@ class PathStoreRecord(object):
         self.guaranteed_bandwidth = 0
         self.available_bandwidth = 0
         self.total_bandwidth = 0
+        self._dj_keys = None
         self.update(pcb)
 
     def update(self, pcb):
@@ -219,9 +221,24 @@ class PathStoreRecord(object):
         now = int(SCIONTime.get_time())
         self.pcb = copy.deepcopy(pcb)
         self.delay_time = now - pcb.get_timestamp()
+        # Un-normalized delay, see PathStore._update_all_delay_time
+        self.raw_delay_time = self.delay_time + 1
         self.last_seen_time = now
         self.expiration_time = pcb.get_expiration_time()
 
+    def get_dj_keys(self):
+        """
+        Return the ASes and egress interfaces of the path segment, which are
+        used as disjointness keys. As they only depend on the hops of the
+        segment, they are only computed once.
+        """
+        if self._dj_keys is None:
+            self._dj_keys = []
+            for asm in self.pcb.iter_asms():
+                self._dj_keys.append(asm.isd_as()[1])
+                self._dj_keys.append(asm.pcbm(0).hof().egress_if)
+        return self._dj_keys
+
     def sending(self):  # pragma: no cover
         """
         Update last_sent_time to now.
@@ -270,16 +287,37 @@ class PathStoreRecord(object):
 
 
 class PathStore(object):
-    """Path Store class."""
+    """
+    Path Store class.
+
+    Candidates are stored in a dict keyed by segment ID, along with a heap of
+    expiration times. The time-varying properties that the fidelity depends on
+    are only computed when the fidelity is needed.
+
+    Candidates aren't kept ordered by fidelity, as a candidate's fidelity
+    changes without the candidate itself changing: it depends on the current
+    time, and the delay and disjointness are normalized over the whole
+    candidate set. Selecting and trimming therefore recompute the fidelity of
+    all candidates, of which there are at most `candidates_set_size`.
+    """
     def __init__(self, path_policy):  # pragma: no cover
         """
         :param dict path_policy: path policy.
         """
         self.path_policy = path_policy
-        self.candidates = []
+        self._candidates = OrderedDict()
+        # Heap of (expiration time, record ID). Entries are left in place when
+        # a candidate is removed or updated, and checked when popped.
+        self._exp_heap = []
+        self._rev_index = RevocationIndex()
         self.best_paths_history = deque(maxlen=self.path_policy.history_limit)
-        self.disjointness = defaultdict(float)
-        self.last_dj_update = 0
+        # Maps a path/AS/interface to a (value, time) tuple, where the value
+        # decays exponentially from the given time onwards.
+        self.disjointness = {}
+
+    @property
+    def candidates(self):  # pragma: no cover
+        return list(self._candidates.values())
 
     def add_segment(self, pcb):
         """
@@ -311,38 +349,46 @@ class PathStore(object):
         pcb_hash = pcb.get_hops_hash(hex=True)
         if not self.path_policy.check_filters(pcb):
             return
-        for candidate in self.candidates:
-            if candidate.id == pcb_hash:
-                candidate.update(pcb)
-                return
+        candidate = self._candidates.get(pcb_hash)
+        if candidate:
+            exp_time = candidate.expiration_time
+            candidate.update(pcb)
+            if candidate.expiration_time != exp_time:
+                self._push_expiry(candidate)
+            self._rev_index.add(candidate.id, pcb.get_all_iftokens())
+            return
         record = PathStoreRecord(pcb)
-        self.candidates.append(record)
+        self._candidates[record.id] = record
+        self._rev_index.add(record.id, pcb.get_all_iftokens())
+        self._push_expiry(record)
         self._trim_candidates()
 
+    def _push_expiry(self, record):  # pragma: no cover
+        heapq.heappush(self._exp_heap, (record.expiration_time, record.id))
+
     def _trim_candidates(self):
         """
         Trims the set of candidate set if necessary.
         """
-        if len(self.candidates) > self.path_policy.candidates_set_size:
+        if len(self._candidates) > self.path_policy.candidates_set_size:
             self._remove_expired_segments()
-        if len(self.candidates) > self.path_policy.candidates_set_size:
+        if len(self._candidates) > self.path_policy.candidates_set_size:
             self._update_all_fidelity()
-            self.candidates = sorted(self.candidates, key=lambda x: x.fidelity,
-                                     reverse=True)[:-1]
+            worst = min(self._candidates.values(), key=lambda x: x.fidelity)
+            self._remove(worst.id)
 
-    def _update_disjointness_db(self):
+    def _get_disjointness(self, key, now):
         """
-        Update the disjointness database.
-
-        Based on the current time, update the disjointness database keeping
-        track of each path, AS, and interface previously sent.
+        Return the current (decayed) disjointness value of a path, AS, or
+        interface.
         """
-        now = SCIONTime.get_time()
-        for k, v in self.disjointness.items():
-            self.disjointness[k] = v * math.exp(self.last_dj_update - now)
-        self.last_dj_update = now
+        entry = self.disjointness.get(key)
+        if entry is None:
+            return 0.0
+        value, since = entry
+        return value * math.exp(since - now)
 
-    def _update_all_disjointness(self):
+    def _update_all_disjointness(self, now):
         """
         Update the disjointness of all path candidates.
 
@@ -360,41 +406,36 @@ class PathStore(object):
         The disjointness is normalized by the highest-scoring path's
         disjointness.
         """
-        self._update_disjointness_db()
+        if not self.disjointness:
+            for candidate in self._candidates.values():
+                candidate.disjointness = 0
+            return
         max_disjointness = 0.0
-        for candidate in self.candidates:
-            path_disjointness = self.disjointness[candidate.id]
-            as_disjointness = 0.0
-            if_disjointness = 0.0
-            for asm in candidate.pcb.iter_asms():
-                as_disjointness += self.disjointness[asm.isd_as()[1]]
-                if_disjointness += self.disjointness[
-                    asm.pcbm(0).hof().egress_if]
-            candidate.disjointness = (path_disjointness + as_disjointness +
-                                      if_disjointness)
-            if candidate.disjointness > max_disjointness:
-                max_disjointness = candidate.disjointness
+        for candidate in self._candidates.values():
+            disjointness = self._get_disjointness(candidate.id, now)
+            for key in candidate.get_dj_keys():
+                disjointness += self._get_disjointness(key, now)
+            candidate.disjointness = disjointness
+            if disjointness > max_disjointness:
+                max_disjointness = disjointness
         if max_disjointness > 0.0:
-            for candidate in self.candidates:
+            for candidate in self._candidates.values():
                 candidate.disjointness /= max_disjointness
 
     def _update_all_delay_time(self):
         """Update the delay time property of all path candidates."""
         max_delay_time = 0
-        for candidate in self.candidates:
-            candidate.delay_time = (candidate.last_seen_time -
-                                    candidate.pcb.get_timestamp() + 1)
-            if candidate.delay_time > max_delay_time:
-                max_delay_time = candidate.delay_time
-        for candidate in self.candidates:
-            candidate.delay_time /= max_delay_time
+        for candidate in self._candidates.values():
+            if candidate.raw_delay_time > max_delay_time:
+                max_delay_time = candidate.raw_delay_time
+        for candidate in self._candidates.values():
+            candidate.delay_time = candidate.raw_delay_time / max_delay_time
 
     def _update_all_fidelity(self):
         """Update the fidelity of all path candidates."""
-        self._update_disjointness_db()
-        self._update_all_disjointness()
+        self._update_all_disjointness(SCIONTime.get_time())
         self._update_all_delay_time()
-        for candidate in self.candidates:
+        for candidate in self._candidates.values():
             candidate.update_fidelity(self.path_policy)
 
     def get_best_segments(self, k=None, sending=True):
@@ -407,7 +448,9 @@ class PathStore(object):
 
         When computing the fidelity, only the path properties that vary in time
         need to be recomputed: the freshness, delay, and disjointness. The
-        length and number of peering links is constant.
+        length and number of peering links is constant. The time-varying
+        properties change the relative order of the candidates, so all of them
+        are compared on each call.
 
         :param int k: default best set size.
         """
@@ -415,7 +458,7 @@ class PathStore(object):
             k = self.path_policy.best_set_size
         self._remove_expired_segments()
         self._update_all_fidelity()
-        best_candidates = heapq.nlargest(k, self.candidates,
+        best_candidates = heapq.nlargest(k, self._candidates.values(),
                                          key=lambda y: y.fidelity)
         if sending:
             for candidate in best_candidates:
@@ -438,12 +481,13 @@ class PathStore(object):
 
     def _remove_expired_segments(self):
         """Remove candidates if their expiration_time is up."""
-        rec_ids = []
         now = SCIONTime.get_time()
-        for candidate in self.candidates:
-            if candidate.expiration_time <= now:
-                rec_ids.append(candidate.id)
-        self.remove_segments(rec_ids)
+        while self._exp_heap and self._exp_heap[0][0] <= now:
+            _, rec_id = heapq.heappop(self._exp_heap)
+            candidate = self._candidates.get(rec_id)
+            # The candidate may have been removed or updated meanwhile.
+            if candidate and candidate.expiration_time <= now:
+                self._remove(rec_id)
 
     def remove_segments(self, rec_ids):
         """
@@ -451,11 +495,24 @@ class PathStore(object):
 
         :param list rec_ids: list of record IDs to remove.
         """
-        self.candidates[:] = [c for c in self.candidates if c.id not in rec_ids]
-        if self.candidates:
-            self._update_all_fidelity()
-            self.candidates = sorted(self.candidates, key=lambda x: x.fidelity,
-                                     reverse=True)
+        for rec_id in rec_ids:
+            self._remove(rec_id)
+
+    def _remove(self, rec_id):  # pragma: no cover
+        self._candidates.pop(rec_id, None)
+        self._rev_index.remove(rec_id)
+
+    def get_revoked_ids(self, rev_tokens):
+        """
+        Return the IDs of the candidates that contain any of the given
+        interface revocation tokens.
+
+        :param list rev_tokens:
+            revocation tokens, e.g. as returned by
+            :meth:`lib.crypto.hash_chain.HashChain.walk`.
+        :rtype: set
+        """
+        return self._rev_index.lookup(rev_tokens)
 
     def get_segment(self, rec_id):
         """
@@ -463,9 +520,9 @@ class PathStore(object):
 
         :param str rec_id: ID of the segment to return.
         """
-        for record in self.candidates:
-            if record.id == rec_id:
-                return record.pcb
+        record = self._candidates.get(rec_id)
+        if record:
+            return record.pcb
         return None
 
     def __str__(self):
@@ -473,6 +530,6 @@ class PathStore(object):
         Return a string with the path store data.
         """
         ret = ["PathStore:"]
-        for candidate in self.candidates:
+        for candidate in self._candidates.values():
             ret.append("  %s" % candidate)
         return "\n".join(ret)
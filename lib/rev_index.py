@@ -0,0 +1,96 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`rev_index` --- Interface revocation token index
+=====================================================
+"""
+
+
+class RevocationIndex(object):
+    """
+    Maps interface revocation tokens to the IDs of the segments that contain
+    them.
+
+    A revocation token revokes every segment containing an element of the hash
+    chain that starts at it, up to some number of elements (see
+    :meth:`lib.crypto.hash_chain.HashChain.walk`). Instead of checking every
+    token of every segment against the chain, the chain is computed once and
+    each of its elements is looked up here.
+
+    The index isn't thread-safe, the owner is expected to serialize access.
+    """
+    def __init__(self):  # pragma: no cover
+        # Maps a revocation token to the set of IDs containing it.
+        self._tokens = {}
+        # Maps an ID to the revocation tokens it was added with.
+        self._ids = {}
+
+    def add(self, id_, tokens):
+        """
+        Add (or replace) the revocation tokens of a segment.
+
+        :param id_: the segment ID.
+        :param tokens: the revocation tokens contained in the segment.
+        """
+        tokens = frozenset(tokens)
+        old_tokens = self._ids.get(id_)
+        if old_tokens == tokens:
+            return
+        if old_tokens is not None:
+            self._discard(id_, old_tokens - tokens)
+            tokens_to_add = tokens - old_tokens
+        else:
+            tokens_to_add = tokens
+        self._ids[id_] = tokens
+        for token in tokens_to_add:
+            self._tokens.setdefault(token, set()).add(id_)
+
+    def remove(self, id_):
+        """
+        Remove a segment from the index, if present.
+
+        :param id_: the segment ID.
+        """
+        tokens = self._ids.pop(id_, None)
+        if tokens:
+            self._discard(id_, tokens)
+
+    def _discard(self, id_, tokens):
+        for token in tokens:
+            ids = self._tokens[token]
+            ids.discard(id_)
+            if not ids:
+                del self._tokens[token]
+
+    def lookup(self, rev_tokens):
+        """
+        Return the IDs of all segments that contain any of the given tokens.
+
+        :param list rev_tokens:
+            revocation tokens, usually the elements of a hash chain starting
+            at a received revocation token.
+        :rtype: set
+        """
+        ret = set()
+        for token in rev_tokens:
+            ids = self._tokens.get(token)
+            if ids:
+                ret.update(ids)
+        return ret
+
+    def __contains__(self, id_):  # pragma: no cover
+        return id_ in self._ids
+
+    def __len__(self):  # pragma: no cover
+        return len(self._ids)
@@ -26,6 +26,69 @@ from lib.sibra.util import BWSnapshot
 RESV_INDEXES = 16
 
 
+class BWTimeline(object):
+    """
+    Fixed-length timeline of bandwidth values, one per SIBRA tick, starting at
+    the current tick.
+
+    The forward and reverse values are kept in separate lists, used as a ring
+    buffer: rolling over to the next tick only moves the head, instead of
+    shifting every entry.
+    """
+    def __init__(self, size):
+        self._fwd = [0] * size
+        self._rev = [0] * size
+        self._head = 0
+
+    def _pos(self, i):
+        if not 0 <= i < len(self._fwd):
+            raise IndexError("BWTimeline index out of range: %s" % i)
+        return (self._head + i) % len(self._fwd)
+
+    def get(self, i):
+        """
+        Return the (fwd, rev) values of the i'th tick.
+        """
+        pos = self._pos(i)
+        return self._fwd[pos], self._rev[pos]
+
+    def set(self, i, fwd, rev):
+        pos = self._pos(i)
+        self._fwd[pos] = fwd
+        self._rev[pos] = rev
+
+    def add(self, i, fwd, rev):
+        pos = self._pos(i)
+        self._fwd[pos] += fwd
+        self._rev[pos] += rev
+
+    def rollover(self, ticks=1):
+        """
+        Move forward by `ticks` ticks. The values of the skipped ticks are
+        added to the new current tick, and the freed entries become the (zero)
+        last ticks.
+        """
+        # Past the end of the timeline, all ticks have been folded together.
+        ticks = min(ticks, len(self._fwd) - 1)
+        fwd = rev = 0
+        for i in range(ticks):
+            f, r = self.get(i)
+            fwd += f
+            rev += r
+            self.set(i, 0, 0)
+        self._head = (self._head + ticks) % len(self._fwd)
+        self.add(0, fwd, rev)
+
+    def __len__(self):  # pragma: no cover
+        return len(self._fwd)
+
+    def __getitem__(self, i):  # pragma: no cover
+        return BWSnapshot(*self.get(i))
+
+    def __setitem__(self, i, bwsnap):  # pragma: no cover
+        self.set(i, bwsnap.fwd, bwsnap.rev)
+
+
 class BandwidthBase(object):
     """
     Base class for tracking bandwidth usage and predictions.
@@ -39,16 +102,14 @@ class BandwidthBase(object):
         # indicates the bandwidth doesn't change for that tick.
         # Using MAX_TICKS+1 allows for bandwidth reduction after a max-length
         # reservation
-        self.resvs = [BWSnapshot() for i in range(self.MAX_TICKS+1)]
+        self.resvs = BWTimeline(self.MAX_TICKS+1)
 
-    def next(self):  # pragma: no cover
-        self._rollover(self.resvs)
+    def next(self, ticks=1):  # pragma: no cover
+        self._rollover(self.resvs, ticks)
         self.curr_used = BWSnapshot()
 
-    def _rollover(self, items):  # pragma: no cover
-        old = items.pop(0)
-        items[0] += old
-        items.append(BWSnapshot())
+    def _rollover(self, items, ticks):  # pragma: no cover
+        items.rollover(ticks)
 
 
 class LinkBandwidth(BandwidthBase):
@@ -67,7 +128,7 @@ class LinkBandwidth(BandwidthBase):
         tick the change happens in, and val is a relative bandwidth change.
         """
         for exp_tick_rel, val in updates:
-            self.resvs[exp_tick_rel] += val
+            self.resvs.add(exp_tick_rel, val.fwd, val.rev)
         assert self.resvs[0].slte(self.max_bw)
 
     def bw_avail(self):  # pragma: no cover
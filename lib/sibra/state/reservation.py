@@ -23,7 +23,7 @@ from lib.defines import (
     SIBRA_MAX_EPHEMERAL_TICKS,
     SIBRA_MAX_STEADY_TICKS,
 )
-from lib.sibra.state.bandwidth import BandwidthBase
+from lib.sibra.state.bandwidth import BandwidthBase, BWTimeline
 from lib.sibra.util import BWSnapshot, tick_to_time
 from lib.util import hex_str, iso_timestamp
 
@@ -42,10 +42,12 @@ class ReservationBase(BandwidthBase):
         self.pathid = pathid
         self.parent = parent
         self.children = []
-        self.child_resvs = [BWSnapshot() for i in range(self.MAX_TICKS+1)]
+        self.child_resvs = BWTimeline(self.MAX_TICKS+1)
         self.child_used = BWSnapshot()
         self.idxes = {}
         self.order = []
+        # The tick the reservation was last brought up to date to.
+        self.last_tick = None
 
     def add(self, idx, bwsnap, exp_tick, curr_tick):
         """
@@ -100,35 +102,57 @@ class ReservationBase(BandwidthBase):
         Update the predicted bandwidth reservations, and pass the differences to
         the parent.
         """
+        size = len(self.resvs)
+        # Relative tick of the last active index.
+        last = -1
+        for idx in self.order:
+            last = max(last, self.idxes[idx].exp_tick - curr_tick)
+        # The first tick without active indexes (if within the timeline) drops
+        # the bandwidth to 0, there are no changes after that.
+        end = min(last + 1, size - 1)
+        # Reserved bandwidth per tick, built from the largest reservation
+        # expiring in each tick, propagated back to the earlier ticks.
+        fwds = [0] * (end + 1)
+        revs = [0] * (end + 1)
+        for idx in self.order:
+            resv_idx = self.idxes[idx]
+            rel = resv_idx.exp_tick - curr_tick
+            if rel < 0:
+                continue
+            rel = min(rel, end)
+            fwds[rel] = max(fwds[rel], resv_idx.bwsnap.fwd)
+            revs[rel] = max(revs[rel], resv_idx.bwsnap.rev)
+        for i in range(end - 1, -1, -1):
+            fwds[i] = max(fwds[i], fwds[i + 1])
+            revs[i] = max(revs[i], revs[i + 1])
         updates = []
-        last_bw = BWSnapshot()
-        for i, old_resv in enumerate(self.resvs):
-            exp_tick = curr_tick + i
-            bwsnap = BWSnapshot()
-            active = False
-            for idx in self.order:
-                resv_idx = self.idxes[idx]
-                if resv_idx.exp_tick >= exp_tick:
-                    active = True
-                    bwsnap.max(resv_idx.bwsnap)
-            diff_bw = bwsnap - last_bw
-            if diff_bw != old_resv:
-                updates.append((i, diff_bw - old_resv))
-                self.resvs[i] = diff_bw
-            last_bw = bwsnap
-            if not active:
-                # Nothing more to look at
-                break
+        last_fwd = last_rev = 0
+        for i in range(end + 1):
+            diff_fwd = fwds[i] - last_fwd
+            diff_rev = revs[i] - last_rev
+            old_fwd, old_rev = self.resvs.get(i)
+            if diff_fwd != old_fwd or diff_rev != old_rev:
+                updates.append(
+                    (i, BWSnapshot(diff_fwd - old_fwd, diff_rev - old_rev)))
+                self.resvs.set(i, diff_fwd, diff_rev)
+            last_fwd, last_rev = fwds[i], revs[i]
         if updates:
             self.parent.update(updates)
 
     def next(self, curr_tick):
         """
-        Roll over to the next SIBRA tick, removing any indexes which have
-        expired.
+        Roll over to the current SIBRA tick, removing any indexes which have
+        expired. Reservations are only brought up to date when they're used,
+        so this can skip several ticks at once.
         """
-        super().next()
-        self._rollover(self.child_resvs)
+        if self.last_tick is None:
+            self.last_tick = curr_tick
+        ticks = curr_tick - self.last_tick
+        if ticks <= 0:
+            return len(self.idxes)
+        self.last_tick = curr_tick
+        super().next(ticks)
+        self._rollover(self.child_resvs, ticks)
         self.max_bw = self.resvs[0]
         self.child_used = BWSnapshot()
         expired = []
@@ -195,7 +219,7 @@ class SteadyReservation(ReservationBase):
         tick the change happens in, and val is a relative bandwidth change.
         """
         for exp_tick_rel, val in updates:
-            self.child_resvs[exp_tick_rel] += val
+            self.child_resvs.add(exp_tick_rel, val.fwd, val.rev)
         assert self.child_resvs[0].slte(self.max_bw)
 
     def bw_avail(self):  # pragma: no cover
@@ -207,8 +231,12 @@ class EphemeralReservation(ReservationBase):
     MAX_TICKS = SIBRA_MAX_EPHEMERAL_TICKS
 
     def next(self, curr_tick):  # pragma: no cover
+        # Updates are passed to the steady reservation, so it needs to be at
+        # the same tick.
+        self.parent.next(curr_tick)
         count = super().next(curr_tick)
-        if not count:
+        if not count and self.pathid in self.parent.children:
+            # Not already removed by remove_all()
             self.parent.remove_child(self.pathid)
         return count
 
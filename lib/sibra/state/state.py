@@ -44,27 +44,37 @@ class SibraState(object):
 
     def update_tick(self):
         """
-        Perform the tick update steps until the state is updated to the current
-        tick.
+        Bring the link up to date with the current tick. Reservations are
+        brought up to date when they're used (see `_advance`), or by `sweep`.
         """
         now = current_tick()
-        while self.curr_tick < now:
-            self.curr_tick += 1
-            self.link.next()
-            self._resv_tick(self.steady)
-            self._resv_tick(self.ephemeral)
-
-    def _resv_tick(self, resv_dict):
-        """
-        Update all reservations to the next tick, removing any that no longer
-        have active indexes.
-        """
-        remove = []
-        for path_id, resv in resv_dict.items():
-            if not resv.next(self.curr_tick):
-                remove.append(path_id)
-        for path_id in remove:
+        if self.curr_tick < now:
+            self.link.next(now - self.curr_tick)
+            self.curr_tick = now
+
+    def sweep(self):
+        """
+        Bring all reservations up to date, removing any that no longer have
+        active indexes. Meant to be called periodically, outside of packet
+        processing.
+        """
+        self.update_tick()
+        for resv_dict in self.steady, self.ephemeral:
+            for path_id in list(resv_dict):
+                self._advance(resv_dict, path_id)
+
+    def _advance(self, resv_dict, path_id):
+        """
+        Bring a reservation up to date with the current tick, removing it if
+        it no longer has active indexes.
+
+        :returns: the reservation, or None if it doesn't exist (anymore).
+        """
+        resv = resv_dict.get(path_id)
+        if resv and not resv.next(self.curr_tick):
             del resv_dict[path_id]
+            return None
+        return resv
 
     def add_steady(self, path_id, resv_idx, bwsnap, exp_tick, accepted,
                    setup=True):
@@ -76,6 +86,7 @@ class SibraState(object):
         if setup:
             resv = self._create_steady(path_id)
         else:
+            self._advance(self.steady, path_id)
             resv = self.steady[path_id]
         bwcls = self._add(resv, resv_idx, bwsnap, exp_tick, accepted)
         if bwcls:  # Request was not allowed, so return the hint
@@ -94,8 +105,10 @@ class SibraState(object):
         """
         self.update_tick()
         if setup:
+            self._advance(self.steady, steady_id)
             resv = self._create_ephemeral(path_id, steady_id)
         else:
+            self._advance(self.ephemeral, path_id)
             resv = self.ephemeral[path_id]
         bwcls = self._add(resv, resv_idx, bwsnap, exp_tick, accepted)
         if bwcls:  # Request was not allowed, so return the hint
@@ -108,6 +121,8 @@ class SibraState(object):
             self.pend_ephemeral[path_id] = True
 
     def _add(self, resv, resv_idx, bwsnap, exp_tick, accepted):
+        # Sets the starting tick of new reservations.
+        resv.next(self.curr_tick)
         bwhint = resv.add(resv_idx, bwsnap, exp_tick, self.curr_tick)
         if not accepted or bwhint != bwsnap:
             # Accepted will be false when an earlier hop has already rejected
@@ -134,8 +149,8 @@ class SibraState(object):
 
     def _get_resv(self, path_id, steady):  # pragma: no cover
         if steady:
-            return self.steady.get(path_id)
-        return self.ephemeral.get(path_id)
+            return self._advance(self.steady, path_id)
+        return self._advance(self.ephemeral, path_id)
 
     def use(self, path_id, resv_idx, bw_used, steady):  # pragma: no cover
         """
@@ -179,8 +194,10 @@ class SibraState(object):
             pend = self.pend_ephemeral
             paths = self.ephemeral
         if pend.pop(path_id, None):
-            paths[path_id].remove_all(self.curr_tick)
-            del paths[path_id]
+            resv = self._advance(paths, path_id)
+            if resv:
+                resv.remove_all(self.curr_tick)
+                del paths[path_id]
 
     def remove(self, path_id, steady):  # pragma: no cover
         """Remove an active path."""
@@ -32,6 +32,7 @@ from socket import (
     SOCK_STREAM,
     SOL_SOCKET,
     SO_REUSEADDR,
+    SO_REUSEPORT,
     socket,
 )
 
@@ -78,7 +79,8 @@ class UDPSocket(Socket):
     """
     Thin wrapper around BSD/POSIX UDP sockets.
     """
-    def __init__(self, bind=None, addr_type=AddrType.IPV6, reuse=False):
+    def __init__(self, bind=None, addr_type=AddrType.IPV6, reuse=False,
+                 reuse_port=False):
         """
         Initialize a UDP socket, then call superclass init for socket options
         and binding.
@@ -91,6 +93,8 @@ class UDPSocket(Socket):
             :const:`~lib.types.AddrType.IPV6` (default).
         :param reuse:
             Boolean value indicating whether SO_REUSEADDR option should be set.
+        :param reuse_port:
+            Boolean value indicating whether SO_REUSEPORT option should be set.
         """
         assert addr_type in (AddrType.IPV4, AddrType.IPV6)
         self._addr_type = addr_type
@@ -98,8 +102,12 @@ class UDPSocket(Socket):
         if self._addr_type == AddrType.IPV4:
             af_domain = AF_INET
         self.sock = socket(af_domain, SOCK_DGRAM)
+        # Scratch buffer for recv_many().
+        self._recv_buf = bytearray(SCION_BUFLEN)
         if reuse:
             self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        if reuse_port:
+            self.sock.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
         self.port = None
         if bind:
             self.bind(*bind)
@@ -165,6 +173,31 @@ class UDPSocket(Socket):
             except InterruptedError:
                 pass
 
+    def recv_many(self, count):
+        """
+        Read up to `count` datagrams from the socket, without blocking.
+
+        Datagrams are received into a buffer allocated once per socket, and
+        only the received bytes are copied out into a :class:`bytearray` per
+        datagram, so that it can later be modified in place.
+
+        :param int count: Maximum number of datagrams to read.
+        :returns:
+            List of tuples of (`bytearray`, (`str`, `int`)) containing the data,
+            and remote host/port respectively.
+        """
+        ret = []
+        buf = self._recv_buf
+        while len(ret) < count:
+            try:
+                size, addr = self.sock.recvfrom_into(buf, 0, MSG_DONTWAIT)
+            except InterruptedError:
+                continue
+            except BlockingIOError:
+                break
+            ret.append((buf[:size], addr))
+        return ret
+
 
 class ReliableSocket(Socket):
     """
@@ -26,11 +26,22 @@ from lib.util import CERT_DIR, read_file, write_file
 
 
 class TrustStore(object):
-    """Trust Store class."""
+    """
+    Trust Store class.
+
+    TRCs and certificate chains are kept in dicts mapping versions to objects,
+    per ISD and per ISD-AS respectively, along with a pointer to the most
+    recent version of each, so that lookups don't have to search.
+    """
     def __init__(self, conf_dir):  # pragma: no cover
         self._dir = "%s/%s" % (conf_dir, CERT_DIR)
-        self._certs = defaultdict(list)
-        self._trcs = defaultdict(list)
+        self._certs = defaultdict(dict)
+        self._trcs = defaultdict(dict)
+        # Map an ISD(-AS) to the (version, object) tuple of its latest TRC/cert.
+        self._latest_certs = {}
+        self._latest_trcs = {}
+        # Map an (ISD-AS, version) tuple to the packed (lz4) cert chain.
+        self._packed_certs = {}
         self._init_trcs()
         self._init_certs()
 
@@ -47,51 +58,59 @@ class TrustStore(object):
             logging.debug("Loaded: %s" % path)
 
     def get_trc(self, isd, version=None):
-        if not self._trcs[isd]:
-            return None
         if version is None:  # Return the most recent TRC.
-            _, trc = sorted(self._trcs[isd])[-1]
+            _, trc = self._latest_trcs.get(isd, (None, None))
             return trc
-        else:  # Try to find a TRC with given version.
-            for ver, trc in self._trcs[isd]:
-                if version == ver:
-                    return trc
-        return None
+        trcs = self._trcs.get(isd)
+        if not trcs:
+            return None
+        return trcs.get(version)
 
     def get_trcs(self):  # pragma: no cover
         # Return list of the most recent TRCs.
-        res = []
-        for isd in self._trcs:
-            res.append(self.get_trc(isd))
-        return res
+        return [trc for _, trc in self._latest_trcs.values()]
 
     def get_cert(self, isd_as, version=None):
-        if not self._certs[isd_as]:
-            return None
         if version is None:  # Return the most recent cert.
-            _, cert = sorted(self._certs[isd_as])[-1]
+            _, cert = self._latest_certs.get(isd_as, (None, None))
             return cert
-        else:  # Try to find a cert with given version.
-            for ver, cert in self._certs[isd_as]:
-                if version == ver:
-                    return cert
-        return None
+        certs = self._certs.get(isd_as)
+        if not certs:
+            return None
+        return certs.get(version)
+
+    def get_packed_cert(self, isd_as, version):
+        """
+        Return a cert chain packed (and compressed) as embedded in ASMarkings.
+        It's only packed the first time it's requested.
+        """
+        packed = self._packed_certs.get((isd_as, version))
+        if packed is None:
+            cert = self.get_cert(isd_as, version)
+            if not cert:
+                return None
+            packed = self._packed_certs[isd_as, version] = cert.pack(lz4_=True)
+        return packed
 
     def add_trc(self, trc, write=True):
         isd, version = trc.get_isd_ver()
-        for ver, _ in self._trcs[isd]:
-            if version == ver:
-                return
-        self._trcs[isd].append((version, trc))
+        if version in self._trcs[isd]:
+            return
+        self._trcs[isd][version] = trc
+        latest = self._latest_trcs.get(isd)
+        if latest is None or version > latest[0]:
+            self._latest_trcs[isd] = version, trc
         if write:
             write_file("%s/ISD%s-V%s.trc" % (self._dir, isd, version), str(trc))
 
     def add_cert(self, cert, write=True):
         isd_as, version = cert.get_leaf_isd_as_ver()
-        for ver, _ in self._certs[isd_as]:
-            if version == ver:
-                return
-        self._certs[isd_as].append((version, cert))
+        if version in self._certs[isd_as]:
+            return
+        self._certs[isd_as][version] = cert
+        latest = self._latest_certs.get(isd_as)
+        if latest is None or version > latest[0]:
+            self._latest_certs[isd_as] = version, cert
         if write:
             write_file("%s/ISD%s-AS%s-V%s.crt" %
                        (self._dir, isd_as[0], isd_as[1], version),
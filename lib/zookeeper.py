@@ -21,6 +21,7 @@ import os.path
 import queue
 import threading
 from collections import deque
+from functools import partial
 
 # External packages
 from kazoo.client import KazooClient, KazooRetry, KazooState
@@ -301,6 +302,47 @@ class Zookeeper(object):
         except (ConnectionLoss, SessionExpiredError):
             raise ZkNoConnection from None
 
+    def get_data(self, path):
+        """
+        Get the data of a node.
+
+        :param str path: Path of the node, relative to the prefix.
+        :returns: The data of the node, or None if it doesn't exist.
+        :rtype: :class:`bytes`
+        :raises:
+            ZkNoConnection: if there's no connection to ZK.
+        """
+        full_path = os.path.join(self.prefix, path)
+        try:
+            data, _ = self.kazoo.get(full_path)
+        except NoNodeError:
+            return None
+        except (ConnectionLoss, SessionExpiredError):
+            raise ZkNoConnection from None
+        return data
+
+    def set_data(self, path, value):
+        """
+        Set the data of a node, creating it if it doesn't exist.
+
+        :param str path: Path of the node, relative to the prefix.
+        :param bytes value: The data of the node.
+        :raises:
+            ZkNoConnection: if there's no connection to ZK.
+        """
+        full_path = os.path.join(self.prefix, path)
+        try:
+            try:
+                self.kazoo.set(full_path, value)
+            except NoNodeError:
+                self.kazoo.create(full_path, value, makepath=True)
+        except NodeExistsError:
+            # Node was created between our set and our create, so assume that
+            # the contents are recent.
+            pass
+        except (ConnectionLoss, SessionExpiredError):
+            raise ZkNoConnection from None
+
     def party_setup(self, prefix=None, autojoin=True):
         """
         Setup a `Kazoo Party
@@ -505,7 +547,21 @@ class ZkParty(object):
 
 
 class ZkSharedCache(object):
-    """Class for handling ZK shared caches."""
+    """
+    Class for handling ZK shared caches.
+
+    New entries are found with a `Kazoo ChildrenWatch
+    <https://kazoo.readthedocs.org/en/latest/api/recipe/watchers.html>`_, and
+    fetched asynchronously as soon as they're seen, so `process` only has to
+    hand the already-fetched data to the handler. `process` re-creates the
+    watch if the cache path has changed (e.g. it was deleted, which silently
+    stops a children watch), or if the ZK connection state has changed since
+    it was set up.
+    """
+    # Maximum number of entries queued by `store`. When full, the oldest ones
+    # are dropped.
+    MAX_PENDING = 1000
+
     def __init__(self, zk, path, handler):  # pragma: no cover
         """
         :param Zookeeper zk: A Zookeeper instance.
@@ -519,13 +575,37 @@ class ZkSharedCache(object):
         # A mapping from entry name to the timestamp it was first encountered
         # at.
         self._entries = {}
-        # A queue for the store() thread to inform the process()/expire() thread
-        # about newly created entries.
-        self._incoming_entries = deque()
+        # Entries (name, value, timestamp) queued by store(), to be written by
+        # flush().
+        self._pending = deque(maxlen=self.MAX_PENDING)
+        self._pending_lock = threading.Lock()
+        # A mapping (entry name -> timestamp) for flush() to inform the
+        # process()/expire() thread about newly created entries.
+        self._incoming_entries = {}
+        # The children watch, set up by process(), the ZK connection epoch it
+        # was set up in, and its ID. Callbacks from older watches are ignored.
+        self._watch = None
+        self._watch_epoch = None
+        self._watch_id = 0
+        # Set (in a kazoo thread) when the cache path has changed since the
+        # watch was set up.
+        self._watch_stopped = False
+        # The entry names last reported by the watch. Only used by the watch
+        # callback, and reset when the watch is re-created.
+        self._watched = set()
+        self._watch_lock = threading.Lock()
+        # Queues for the kazoo callbacks to inform the process()/expire()
+        # thread about fetched entries (name, data), removed entries, and
+        # entries that couldn't be fetched due to connection problems.
+        self._fetched = deque()
+        self._removed = deque()
+        self._retry = deque()
 
     def store(self, name, value):
         """
-        Store an entry in the cache.
+        Queue an entry to be stored in the cache. Queued entries are written by
+        `flush`, so this never waits for ZK. If `MAX_PENDING` entries are
+        already queued, the oldest one is dropped.
 
         :param str name: Name of the entry. E.g. ``"item01"``.
         :param bytes value: The value of the entry.
@@ -534,139 +614,248 @@ class ZkSharedCache(object):
         """
         if not self._zk.is_connected():
             raise ZkNoConnection
-        full_path = os.path.join(self._path, name)
-        # First, assume the entry already exists (the normal case)
-        try:
-            self._kazoo.set(full_path, value)
-            self._incoming_entries.append((name, SCIONTime.get_time()))
-            return
-        except NoNodeError:
-            pass
-        except (ConnectionLoss, SessionExpiredError):
-            raise ZkNoConnection from None
-        # Entry doesn't exist, so create it instead.
-        try:
-            self._kazoo.create(full_path, value, makepath=True)
-            self._incoming_entries.append((name, SCIONTime.get_time()))
+        with self._pending_lock:
+            self._pending.append((name, value, SCIONTime.get_time()))
+
+    def flush(self):
+        """
+        Write all queued entries to the cache. The writes are pipelined, i.e.
+        all of them are sent before waiting for any of the replies.
+
+        :raises:
+            ZkNoConnection:
+                if the connection to ZK was lost. Entries that couldn't be
+                written are put back at the front of the queue, in order, so
+                that the next call retries them. The oldest of them are
+                dropped if the queue would exceed `MAX_PENDING` entries.
+        """
+        creates = []
+        while self._pending:
+            name, value, ts = self._pending.popleft()
+            full_path = os.path.join(self._path, name)
+            creates.append((name, value, ts, self._kazoo.create_async(
+                full_path, value, makepath=True)))
+        if not creates:
             return
-        except NodeExistsError:
-            # Entry was created between our check and our create, so assume that
-            # the contents are recent, and return without error.
-            pass
-        except (ConnectionLoss, SessionExpiredError):
-            raise ZkNoConnection from None
+        # Indexes (into creates) of the entries that couldn't be written.
+        failed = []
+        sets = []
+        for i, (name, value, ts, result) in enumerate(creates):
+            try:
+                result.get()
+            except NodeExistsError:
+                # Entry already exists, so update it instead.
+                full_path = os.path.join(self._path, name)
+                sets.append((i, self._kazoo.set_async(full_path, value)))
+                continue
+            except (ConnectionLoss, SessionExpiredError):
+                failed.append(i)
+                continue
+            self._incoming_entries[name] = ts
+        for i, result in sets:
+            try:
+                result.get()
+            except NoNodeError:
+                # Entry was expired between our create and our set, so assume
+                # that there's no need for it anymore.
+                continue
+            except (ConnectionLoss, SessionExpiredError):
+                failed.append(i)
+                continue
+            name, _, ts, _ = creates[i]
+            self._incoming_entries[name] = ts
+        if failed:
+            requeue = [creates[i][:3] for i in sorted(failed)]
+            with self._pending_lock:
+                dropped = max(0, len(requeue) + len(self._pending) -
+                              self.MAX_PENDING)
+                # Keep the original order, ahead of anything stored since.
+                self._pending.extendleft(reversed(requeue[dropped:]))
+            logging.warning("Unable to store %d/%d entries in shared path %s "
+                            "(%d dropped): no connection to ZK", len(failed),
+                            len(creates), self._path, dropped)
+            raise ZkNoConnection
 
     def process(self):
         """
-        Look for new/updated entries, and pass them to the registered handler.
+        Write queued entries, pass new entries to the registered handler, and
+        forget removed entries.
 
         :raises:
             ZkNoConnection: if there's no connection to ZK.
         """
         if not self._zk.is_connected():
             raise ZkNoConnection
+        self.flush()
+        if self._watch_ended():
+            self._setup_watch()
         # Update self._entries with any new entries we have created via store()
         while self._incoming_entries:
-            name, ts = self._incoming_entries.popleft()
+            name, ts = self._incoming_entries.popitem()
             # If the entry already exists, don't change it.
             self._entries.setdefault(name, ts)
-        previous = set(self._entries)
-        current = set(self._list_entries())
-        for entry in previous - current:
+        while self._removed:
             # Remove stale entry names
-            del self._entries[entry]
-        count = self._handle_entries(current - previous)
-        if count:
-            logging.debug("Processed %d new entries from %s", count,
+            self._entries.pop(self._removed.popleft(), None)
+        while self._retry:
+            self._get_async(self._retry.popleft())
+        now = SCIONTime.get_time()
+        data = []
+        while self._fetched:
+            name, value = self._fetched.popleft()
+            if name in self._entries:
+                # Either created via store(), or already handled.
+                continue
+            self._entries[name] = now
+            data.append(value)
+        self._handler(data)
+        if data:
+            logging.debug("Processed %d new entries from %s", len(data),
                           self._path)
 
-    def _get(self, name):
+    def _watch_ended(self):
         """
-        Get an entry from the cache.
-
-        :param str name: Name of the entry. E.g. ``"pcb0000002046"``.
-        :return: The value of the entry.
-        :rtype: :class:`bytes`
-        :raises:
-            ZkNoConnection: if there's no connection to ZK.
-            ZkNoNodeError: if the entry does not exist.
+        Check if the children watch needs to be (re-)created, i.e. it was never
+        set up, the ZK connection state has changed since (e.g. the session
+        expired), or the cache path has changed (e.g. it was deleted).
         """
-        full_path = os.path.join(self._path, name)
-        try:
-            data, _ = self._kazoo.get(full_path)
-        except (ConnectionLoss, SessionExpiredError):
-            raise ZkNoConnection from None
-        except NoNodeError:
-            self._entries.pop(name, None)
-            raise ZkNoNodeError from None
-        self._entries.setdefault(name, SCIONTime.get_time())
-        return data
+        if not self._watch:
+            return True
+        if self._watch_epoch != self._zk.conn_epoch:
+            return True
+        return self._watch_stopped
 
-    def _list_entries(self):
+    def _setup_watch(self):
         """
-        List all entries.
+        Start watching the cache for new and removed entries. Any previous
+        watch is superseded.
 
-        :return: A set of entry names.
-        :rtype: set(:class:`str`, ..)
         :raises:
             ZkNoConnection: if there's no connection to ZK.
         """
+        self._watch = None
+        self._watch_epoch = self._zk.conn_epoch
+        # The watch stops if the path doesn't exist.
+        self._zk.ensure_path(self._path, abs=True)
+        with self._watch_lock:
+            self._watch_id += 1
+            self._watch_stopped = False
+            # Entries that were removed while there was no watch are reported
+            # by the first callback of the new one.
+            self._watched = set(self._entries)
+        # Kazoo's own session handling is disabled, as the watch is re-created
+        # by process() instead.
         try:
-            return set(self._kazoo.get_children(self._path))
+            # Kazoo stops a children watch without telling us if the path is
+            # deleted, so watch the path itself too.
+            if not self._kazoo.exists(
+                    self._path,
+                    watch=partial(self._path_changed, self._watch_id)):
+                self._watch_stopped = True
+            self._watch = self._kazoo.ChildrenWatch(
+                self._path, partial(self._children_changed, self._watch_id),
+                allow_session_lost=False)
         except (ConnectionLoss, SessionExpiredError):
             raise ZkNoConnection from None
-        except NoNodeError:
-            # This means the cache dir hasn't been created yet by store(),
-            # so just return an empty set.
-            return set()
 
-    def _handle_entries(self, entry_names):
+    def _path_changed(self, watch_id, event):
         """
-        Retrieve the data for a set of entries, and pass it to the registered
-        handler.
+        Called (in a kazoo thread) when the cache path has been deleted or
+        changed, or the session has ended. In all cases, the children watch is
+        re-created by the next call to process().
+        """
+        with self._watch_lock:
+            if watch_id == self._watch_id:
+                self._watch_stopped = True
 
-        :param set entry_names: Entry names.
-        :returns: Number of entries passed to handler.
+    def _children_changed(self, watch_id, children):
         """
-        data = []
-        for name in entry_names:
-            try:
-                data.append(self._get(name))
-            except ZkNoConnection:
-                logging.warning("Unable to retrieve entry from shared "
-                                "path %s: no connection to ZK" % self._path)
-                break
-            except ZkNoNodeError:
-                logging.debug("Unable to retrieve entry from shared cache: "
-                              "no such entry (%s/%s)" % (self._path, name))
+        Called by the children watch (in a kazoo thread) with the current
+        entry names. Must not block.
+        """
+        with self._watch_lock:
+            if watch_id != self._watch_id:
+                # Superseded, so tell kazoo to stop this watch.
+                return False
+            current = set(children)
+            new = current - self._watched
+            self._removed.extend(self._watched - current)
+            self._watched = current
+        for name in new:
+            if name in self._entries or name in self._incoming_entries:
+                # Already known, e.g. because this instance wrote it.
                 continue
-        self._handler(data)
-        return len(data)
+            self._get_async(name)
+
+    def _get_async(self, name):
+        """
+        Start fetching an entry, queuing its data for process().
+
+        :param str name: Name of the entry. E.g. ``"pcb0000002046"``.
+        """
+        full_path = os.path.join(self._path, name)
+        self._kazoo.get_async(full_path).rawlink(
+            lambda result: self._got(name, result))
+
+    def _got(self, name, result):
+        """
+        Called (in a kazoo thread) when fetching an entry has completed.
+        """
+        try:
+            data, _ = result.get()
+        except NoNodeError:
+            logging.debug("Unable to retrieve entry from shared cache: "
+                          "no such entry (%s/%s)", self._path, name)
+            return
+        except (ConnectionLoss, SessionExpiredError):
+            logging.warning("Unable to retrieve entry from shared path %s: "
+                            "no connection to ZK", self._path)
+            self._retry.append(name)
+            return
+        self._fetched.append((name, data))
 
     def expire(self, ttl):
         """
-        Delete entries first seen more than `ttl` seconds ago.
+        Delete entries first seen more than `ttl` seconds ago. The deletes are
+        pipelined, i.e. all of them are sent before waiting for any of the
+        replies. Entries that have already been deleted (e.g. by another
+        instance) are ignored.
 
         :param float ttl:
             Age (in seconds) after which cache entries should be removed.
+        :returns: The number of entries deleted.
+        :rtype: int
         :raises:
             ZkNoConnection: if there's no connection to ZK.
-            ZkNoNodeError: if a node disappears unexpectedly.
         """
         if not self._zk.is_connected():
             raise ZkNoConnection
-        now = SCIONTime.get_time()
-        count = 0
+        start = SCIONTime.get_time()
+        deletes = []
         for entry, ts in self._entries.items():
-            if now - ts > ttl:
+            if start - ts > ttl:
                 full_path = os.path.join(self._path, entry)
+                deletes.append((entry, self._kazoo.delete_async(full_path)))
+        count = 0
+        failed = 0
+        for entry, result in deletes:
+            try:
+                result.get()
+            except NoNodeError:
+                pass
+            except (ConnectionLoss, SessionExpiredError):
+                failed += 1
+                continue
+            else:
                 count += 1
-                try:
-                    self._kazoo.delete(full_path)
-                except NoNodeError:
-                    # This shouldn't happen, so raise an exception if it does.
-                    raise ZkNoNodeError
-                except (ConnectionLoss, SessionExpiredError):
-                    raise ZkNoConnection from None
-        if count:
-            logging.debug("Expired %d old entries from %s", count, self._path)
+            del self._entries[entry]
+        if deletes:
+            logging.debug("Expired %d old entries from %s in %.3fs "
+                          "(%d already deleted)", count, self._path,
+                          SCIONTime.get_time() - start,
+                          len(deletes) - count - failed)
+        if failed:
+            logging.warning("Unable to expire %d entries from %s: "
+                            "no connection to ZK", failed, self._path)
+            raise ZkNoConnection
+        return count
@@ -0,0 +1,299 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`sciond_api_test` --- endhost.sciond_api unit tests
+========================================================
+"""
+# Stdlib
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+from unittest.mock import call, patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from endhost.sciond_api import (
+    APIProtocol,
+    AsyncAPIServer,
+    API_ADDR_REQ,
+    API_PATH_REQ,
+    _frame,
+    pack_batch_path_reply,
+    parse_batch_path_request,
+    parse_path_request,
+)
+from lib.errors import SCIONParseError
+from lib.packet.scion_addr import ISD_AS
+from test.testcommon import assert_these_calls, create_mock
+
+
+class TestParsePathRequest(object):
+    """
+    Unit tests for endhost.sciond_api.parse_path_request
+    """
+    def test(self):
+        dst_ia = ISD_AS("1-11")
+        # Call
+        ntools.eq_(parse_path_request(b"\x00" + dst_ia.pack()), dst_ia)
+
+    def test_truncated(self):
+        for data in (b"\x00", b"\x00" + ISD_AS("1-11").pack()[:-1]):
+            yield ntools.assert_raises, SCIONParseError, \
+                parse_path_request, data
+
+
+class TestParseBatchPathRequest(object):
+    """
+    Unit tests for endhost.sciond_api.parse_batch_path_request
+    """
+    def test(self):
+        dst_ias = [ISD_AS("1-11"), ISD_AS("2-25")]
+        data = b"\x02" + struct.pack("!H", 2) + b"".join(
+            ia.pack() for ia in dst_ias)
+        # Call
+        ntools.eq_(parse_batch_path_request(data), dst_ias)
+
+    def test_truncated(self):
+        for data in (b"\x02\x00", b"\x02\x00\x02" + ISD_AS("1-11").pack()):
+            yield ntools.assert_raises, SCIONParseError, \
+                parse_batch_path_request, data
+
+
+class TestPackBatchPathReply(object):
+    """
+    Unit tests for endhost.sciond_api.pack_batch_path_reply
+    """
+    def test(self):
+        ntools.eq_(pack_batch_path_reply([b"abc", b""]),
+                   b"\x00\x02" b"\x00\x00\x00\x03abc" b"\x00\x00\x00\x00")
+
+
+class TestAPIProtocolDataReceived(object):
+    """
+    Unit tests for endhost.sciond_api.APIProtocol.data_received
+    """
+    def _setup(self):
+        server = create_mock(["handle_request"])
+        inst = APIProtocol(server)
+        inst._transport = create_mock(["close", "write"])
+        return inst, server
+
+    def test_pipelined(self):
+        inst, server = self._setup()
+        reply_cbs = []
+        server.handle_request.side_effect = (
+            lambda req, reply_cb: reply_cbs.append(reply_cb))
+        data = _frame(b"req1") + _frame(b"req2") + _frame(b"req3")
+        # Call
+        inst.data_received(data[:5])
+        inst.data_received(data[5:-2])
+        inst.data_received(data[-2:])
+        # Tests
+        assert_these_calls(server.handle_request, [
+            call(b"req1", reply_cbs[0]), call(b"req2", reply_cbs[1]),
+            call(b"req3", reply_cbs[2])])
+        # Replies are sent in request order.
+        reply_cbs[1](b"rep2")
+        ntools.assert_false(inst._transport.write.called)
+        reply_cbs[0](b"rep1")
+        reply_cbs[2](None)
+        assert_these_calls(inst._transport.write, [
+            call(_frame(b"rep1")), call(_frame(b"rep2"))])
+        ntools.eq_(len(inst._slots), 0)
+
+    def test_bad_cookie(self):
+        inst, server = self._setup()
+        # Call
+        inst.data_received(b"\x00" * 20)
+        # Tests
+        inst._transport.close.assert_called_once_with()
+        ntools.assert_false(server.handle_request.called)
+
+
+def _daemon():
+    daemon = create_mock(["addr"])
+    daemon.addr = create_mock(["isd_as"])
+    daemon.addr.isd_as = create_mock(["pack"])
+    daemon.addr.isd_as.pack.return_value = b"isd-as"
+    return daemon
+
+
+class TestAsyncAPIServerHandleRequest(object):
+    """
+    Unit tests for endhost.sciond_api.AsyncAPIServer.handle_request
+    """
+    def _setup(self):
+        inst = AsyncAPIServer(_daemon(), "addr")
+        inst._handle_path_request = create_mock()
+        return inst
+
+    def test_path(self):
+        inst = self._setup()
+        reply_cb = create_mock()
+        dst_ia = ISD_AS("1-11")
+        # Call
+        inst.handle_request(bytes([API_PATH_REQ]) + dst_ia.pack(), reply_cb)
+        # Tests
+        inst._handle_path_request.assert_called_once_with(dst_ia, reply_cb)
+        ntools.assert_false(reply_cb.called)
+
+    def _check_invalid(self, request):
+        inst = self._setup()
+        reply_cb = create_mock()
+        # Call
+        inst.handle_request(request, reply_cb)
+        # Tests
+        reply_cb.assert_called_once_with(None)
+        ntools.assert_false(inst._handle_path_request.called)
+
+    def test_invalid(self):
+        for request in (b"", bytes([API_PATH_REQ]), bytes([API_PATH_REQ, 1]),
+                        b"\xff"):
+            yield self._check_invalid, request
+
+    def test_addr(self):
+        inst = self._setup()
+        reply_cb = create_mock()
+        # Call
+        inst.handle_request(bytes([API_ADDR_REQ]), reply_cb)
+        # Tests
+        reply_cb.assert_called_once_with(b"isd-as")
+
+
+class TestAsyncAPIServerRunStop(object):
+    """
+    Tests for endhost.sciond_api.AsyncAPIServer.run and
+    endhost.sciond_api.AsyncAPIServer.stop
+    """
+    def test(self):
+        tmp_dir = tempfile.mkdtemp()
+        api_addr = os.path.join(tmp_dir, "sciond.sock")
+        inst = AsyncAPIServer(_daemon(), api_addr)
+        thread = threading.Thread(target=inst.run, daemon=True)
+        thread.start()
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(5)
+            for _ in range(500):
+                try:
+                    sock.connect(api_addr)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    thread.join(0.01)
+            sock.sendall(_frame(bytes([API_ADDR_REQ])))
+            ntools.eq_(sock.recv(100), _frame(b"isd-as"))
+            sock.close()
+            # Call
+            inst.stop()
+            thread.join(5)
+            # Tests
+            ntools.assert_false(thread.is_alive())
+            ntools.ok_(inst._loop.is_closed())
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                ntools.assert_raises(ConnectionRefusedError, sock.connect,
+                                     api_addr)
+            # Stopping again is a no-op.
+            inst.stop()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TestAsyncAPIServerHandlePathRequest(object):
+    """
+    Unit tests for endhost.sciond_api.AsyncAPIServer._handle_path_request
+    """
+    def _setup(self):
+        daemon = create_mock(["_lookup_paths_entry", "_api_path_reply",
+                              "_cached_paths_entry", "requests", "TIMEOUT"])
+        daemon.requests = create_mock(["put"])
+        inst = AsyncAPIServer(daemon, "addr")
+        inst._loop = create_mock(["call_later"])
+        return inst, daemon
+
+    def test_cached(self):
+        inst, daemon = self._setup()
+        reply_cb = create_mock()
+        # Call
+        inst._handle_path_request("dst", reply_cb)
+        # Tests
+        daemon._lookup_paths_entry.assert_called_once_with(
+            "dst", resolve=False)
+        daemon._api_path_reply.assert_called_once_with(
+            "dst", daemon._lookup_paths_entry.return_value)
+        reply_cb.assert_called_once_with(daemon._api_path_reply.return_value)
+
+    @patch("endhost.sciond_api._LoopEvent", autospec=True)
+    def test_coalesce(self, loop_event):
+        inst, daemon = self._setup()
+        daemon._lookup_paths_entry.return_value = None
+        reply_cbs = [create_mock() for _ in range(2)]
+        # Call
+        for reply_cb in reply_cbs:
+            inst._handle_path_request("dst", reply_cb)
+        # Tests
+        key = ("dst", ())
+        ntools.eq_(inst._waiting, {key: reply_cbs})
+        daemon.requests.put.assert_called_once_with(
+            (key, loop_event.return_value))
+        # Answer the requests.
+        waiting = inst._waiting[key]
+        inst._answer(key, waiting)
+        daemon._cached_paths_entry.assert_called_once_with(
+            "dst", (), current=False)
+        for reply_cb in reply_cbs:
+            reply_cb.assert_called_once_with(
+                daemon._api_path_reply.return_value)
+        ntools.eq_(inst._waiting, {})
+        # The timeout for the same requests is ignored.
+        inst._answer(key, waiting, True)
+        ntools.eq_(daemon._api_path_reply.call_count, 1)
+
+
+class TestAsyncAPIServerHandleBatchPathRequest(object):
+    """
+    Unit tests for endhost.sciond_api.AsyncAPIServer._handle_batch_path_request
+    """
+    def test(self):
+        inst = AsyncAPIServer(create_mock(), "addr")
+        path_cbs = {}
+        inst._handle_path_request = create_mock()
+        inst._handle_path_request.side_effect = (
+            lambda dst, cb: path_cbs.__setitem__(dst, cb))
+        reply_cb = create_mock()
+        # Call
+        inst._handle_batch_path_request(["dst0", "dst1"], reply_cb)
+        # Tests
+        path_cbs["dst1"](b"rep1")
+        ntools.assert_false(reply_cb.called)
+        path_cbs["dst0"](b"rep0")
+        reply_cb.assert_called_once_with(
+            pack_batch_path_reply([b"rep0", b"rep1"]))
+
+    def test_empty(self):
+        inst = AsyncAPIServer(create_mock(), "addr")
+        reply_cb = create_mock()
+        # Call
+        inst._handle_batch_path_request([], reply_cb)
+        # Tests
+        reply_cb.assert_called_once_with(pack_batch_path_reply([]))
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,116 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`sciond_test` --- endhost.sciond unit tests
+================================================
+"""
+# Stdlib
+from unittest.mock import patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from endhost.sciond import SCIONDaemon
+from test.testcommon import create_mock
+
+
+class TestSCIONDaemonResolveCached(object):
+    """
+    Unit tests for endhost.sciond.SCIONDaemon._resolve_cached
+    """
+    @patch("endhost.sciond.SCIONDaemon.__init__", autospec=True,
+           return_value=None)
+    def _setup(self, init):
+        inst = SCIONDaemon("conf_dir", "addr", "api_addr")
+        inst._path_cache = {}
+        inst._db_generations = create_mock()
+        inst._db_generations.return_value = (1, 2, 3)
+        inst.path_resolution = create_mock()
+        return inst
+
+    def test_cached(self):
+        inst = self._setup()
+        inst.path_resolution.return_value = ["path"]
+        # Call
+        entry = inst._resolve_cached("dst", ("flag",))
+        # Tests
+        ntools.eq_(entry.paths, ["path"])
+        ntools.assert_is(inst._resolve_cached("dst", ("flag",)), entry)
+        inst.path_resolution.assert_called_once_with("dst", flags=("flag",))
+
+    def test_miss(self):
+        inst = self._setup()
+        inst.path_resolution.return_value = []
+        # Call
+        ntools.assert_is_none(inst._resolve_cached("dst"))
+        # Tests
+        # The miss is cached, so it isn't resolved again (e.g. by the
+        # request handler's check).
+        ntools.assert_is_none(inst._resolve_cached("dst"))
+        inst.path_resolution.assert_called_once_with("dst", flags=())
+        ntools.assert_is_none(inst._cached_paths_entry("dst"))
+
+    def test_outdated(self):
+        inst = self._setup()
+        inst.path_resolution.side_effect = [[], ["path"]]
+        inst._resolve_cached("dst")
+        inst._db_generations.return_value = (1, 3, 3)
+        # Call
+        entry = inst._resolve_cached("dst")
+        # Tests
+        ntools.eq_(entry.paths, ["path"])
+        ntools.eq_(entry.generations, (1, 3, 3))
+        ntools.eq_(inst.path_resolution.call_count, 2)
+
+
+class TestSCIONDaemonCachedPathsEntry(object):
+    """
+    Unit tests for endhost.sciond.SCIONDaemon._cached_paths_entry
+    """
+    @patch("endhost.sciond.SCIONDaemon.__init__", autospec=True,
+           return_value=None)
+    def _setup(self, init):
+        inst = SCIONDaemon("conf_dir", "addr", "api_addr")
+        inst._path_cache = {}
+        inst._db_generations = create_mock()
+        inst._db_generations.return_value = (1, 2, 3)
+        inst.path_resolution = create_mock()
+        inst.path_resolution.return_value = ["path"]
+        return inst
+
+    def test_current(self):
+        inst = self._setup()
+        entry = inst._resolve_cached("dst")
+        # Call
+        ntools.assert_is(inst._cached_paths_entry("dst"), entry)
+
+    def test_outdated(self):
+        inst = self._setup()
+        entry = inst._resolve_cached("dst")
+        inst._db_generations.return_value = (2, 2, 3)
+        # Call
+        ntools.assert_is_none(inst._cached_paths_entry("dst"))
+        ntools.assert_is(
+            inst._cached_paths_entry("dst", current=False), entry)
+
+    def test_missing(self):
+        inst = self._setup()
+        # Call
+        ntools.assert_is_none(inst._cached_paths_entry("dst"))
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,139 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`base_test` --- infrastructure.beacon_server.base unit tests
+=================================================================
+"""
+# Stdlib
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import call, patch
+
+# External packages
+import nose
+import nose.tools as ntools
+from Crypto.Hash import SHA256
+
+# SCION
+from infrastructure.beacon_server.local import LocalBeaconServer
+from lib.packet.pcb import PathSegment
+from test.testcommon import assert_these_calls, create_mock
+
+
+def _pcb(raw):
+    pcb = create_mock(["asm", "copy", "short_desc"], class_=PathSegment)
+    pcb.copy.return_value = create_mock(["pack"])
+    pcb.copy.return_value.pack.return_value = raw
+    return pcb
+
+
+class TestBeaconServerTryToVerifyBeacons(object):
+    """
+    Unit tests for
+    infrastructure.beacon_server.base.BeaconServer._try_to_verify_beacons
+    """
+    @patch("infrastructure.beacon_server.local.LocalBeaconServer.__init__",
+           autospec=True, return_value=None)
+    def _setup(self, init):
+        inst = LocalBeaconServer("id", "conf_dir")
+        inst.unverified_beacons = deque()
+        inst._snapshot_digests = set()
+        inst._verify_pool = ThreadPoolExecutor(max_workers=4)
+        inst._check_trc = create_mock()
+        inst._check_trc.return_value = True
+        inst._verify_beacon = create_mock()
+        inst._verify_beacon.return_value = True
+        inst._handle_verified_beacon = create_mock()
+        return inst
+
+    def test_in_order(self):
+        inst = self._setup()
+        pcbs = [_pcb(b"pcb%d" % i) for i in range(4)]
+        delays = {pcbs[0]: 0.03, pcbs[1]: 0.02, pcbs[2]: 0, pcbs[3]: 0.01}
+
+        def verify(pcb):
+            time.sleep(delays[pcb])
+            return True
+        inst._verify_beacon.side_effect = verify
+        # Call
+        inst._try_to_verify_beacons(pcbs)
+        # Tests
+        assert_these_calls(inst._handle_verified_beacon,
+                           [call(pcb) for pcb in pcbs])
+        inst._verify_pool.shutdown()
+
+    def test_snapshot(self):
+        inst = self._setup()
+        pcbs = [_pcb(b"pcb0"), _pcb(b"pcb1")]
+        inst._snapshot_digests.add(SHA256.new(b"pcb0").digest())
+        # Call
+        inst._try_to_verify_beacons(pcbs)
+        # Tests
+        inst._check_trc.assert_called_once_with(
+            pcbs[1].asm.return_value.isd_as.return_value,
+            pcbs[1].asm.return_value.p.trcVer)
+        inst._verify_beacon.assert_called_once_with(pcbs[1])
+        assert_these_calls(inst._handle_verified_beacon,
+                           [call(pcbs[0]), call(pcbs[1])])
+        # Each digest is only used once.
+        ntools.eq_(inst._snapshot_digests, set())
+        inst._verify_pool.shutdown()
+
+    def test_trc_missing(self):
+        inst = self._setup()
+        pcbs = [_pcb(b"pcb0"), _pcb(b"pcb1")]
+        inst._check_trc.side_effect = [False, True]
+        # Call
+        inst._try_to_verify_beacons(pcbs, quiet=True)
+        # Tests
+        ntools.eq_(list(inst.unverified_beacons), [pcbs[0]])
+        inst._verify_beacon.assert_called_once_with(pcbs[1])
+        inst._handle_verified_beacon.assert_called_once_with(pcbs[1])
+        inst._verify_pool.shutdown()
+
+    def test_invalid_sig(self):
+        inst = self._setup()
+        pcbs = [_pcb(b"pcb0"), _pcb(b"pcb1")]
+        inst._verify_beacon.side_effect = lambda pcb: pcb is pcbs[1]
+        # Call
+        inst._try_to_verify_beacons(pcbs)
+        # Tests
+        inst._handle_verified_beacon.assert_called_once_with(pcbs[1])
+        ntools.eq_(len(inst.unverified_beacons), 0)
+        inst._verify_pool.shutdown()
+
+
+class TestBeaconServerStop(object):
+    """
+    Unit tests for infrastructure.beacon_server.base.BeaconServer.stop
+    """
+    @patch("infrastructure.beacon_server.base.SCIONElement.stop",
+           autospec=True)
+    @patch("infrastructure.beacon_server.local.LocalBeaconServer.__init__",
+           autospec=True, return_value=None)
+    def test(self, init, super_stop):
+        inst = LocalBeaconServer("id", "conf_dir")
+        inst._worker_thread = create_mock(["join"])
+        inst._verify_pool = create_mock(["shutdown"])
+        # Call
+        inst.stop()
+        # Tests
+        super_stop.assert_called_once_with(inst)
+        inst._worker_thread.join.assert_called_once_with(5)
+        inst._verify_pool.shutdown.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
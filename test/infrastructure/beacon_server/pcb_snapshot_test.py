@@ -0,0 +1,118 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`pcb_snapshot_test` --- infrastructure.beacon_server.pcb_snapshot tests
+============================================================================
+"""
+# Stdlib
+import struct
+from unittest.mock import patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from infrastructure.beacon_server.pcb_snapshot import PCBSnapshot
+from lib.errors import SCIONIndexError, SCIONParseError
+
+
+def _loads(raw):
+    if not raw.startswith(b"lz4:"):
+        raise ValueError("corrupt input")
+    return raw[4:]
+
+
+def _setup_lz4(lz4):
+    lz4.dumps.side_effect = lambda raw: b"lz4:" + raw
+    lz4.loads.side_effect = _loads
+
+
+class TestPCBSnapshotRoundTrip(object):
+    """
+    Unit tests for infrastructure.beacon_server.pcb_snapshot.PCBSnapshot
+    packing and parsing.
+    """
+    @patch("infrastructure.beacon_server.pcb_snapshot.SCIONTime.get_time",
+           autospec=True)
+    @patch("infrastructure.beacon_server.pcb_snapshot.lz4", autospec=False)
+    def test(self, lz4, get_time):
+        _setup_lz4(lz4)
+        get_time.return_value = 1234.5
+        pcbs = [(b"pcb0", True), (b"pcb 1", False), (b"", True)]
+        inst = PCBSnapshot.from_values(pcbs)
+        # Call
+        raw = inst.pack()
+        # Tests
+        ntools.eq_(len(inst), len(raw))
+        parsed = PCBSnapshot(raw)
+        ntools.eq_(parsed.timestamp, 1234.5)
+        ntools.eq_(parsed.pcbs, pcbs)
+
+    @patch("infrastructure.beacon_server.pcb_snapshot.lz4", autospec=False)
+    def test_empty(self, lz4):
+        _setup_lz4(lz4)
+        # Call
+        parsed = PCBSnapshot(PCBSnapshot.from_values([]).pack())
+        # Tests
+        ntools.eq_(parsed.pcbs, [])
+
+
+class TestPCBSnapshotParse(object):
+    """
+    Unit tests for infrastructure.beacon_server.pcb_snapshot.PCBSnapshot._parse
+    """
+    def _body(self, *entries, count=None):
+        if count is None:
+            count = len(entries)
+        body = [struct.pack(PCBSnapshot.HDR_FMT, 1.0, count)]
+        for raw, verified in entries:
+            body.append(struct.pack(PCBSnapshot.ENTRY_FMT, verified, len(raw)))
+            body.append(raw)
+        return b"".join(body)
+
+    def _check_raises(self, raw, excp):
+        with patch("infrastructure.beacon_server.pcb_snapshot.lz4",
+                   autospec=False) as lz4:
+            _setup_lz4(lz4)
+            ntools.assert_raises(excp, PCBSnapshot, raw)
+
+    def test_bad_version(self):
+        raw = bytes([PCBSnapshot.VERSION + 1]) + b"lz4:" + self._body()
+        self._check_raises(raw, SCIONParseError)
+
+    def test_bad_compression(self):
+        raw = bytes([PCBSnapshot.VERSION]) + b"junk"
+        self._check_raises(raw, SCIONParseError)
+
+    def test_truncated_hdr(self):
+        raw = bytes([PCBSnapshot.VERSION]) + b"lz4:" + self._body()[:4]
+        self._check_raises(raw, SCIONParseError)
+
+    def test_truncated(self):
+        ver = bytes([PCBSnapshot.VERSION])
+        full = self._body((b"pcb0", True))
+        for raw in (
+            # Truncated entry header.
+            ver + b"lz4:" + full[:-6],
+            # Truncated PCB.
+            ver + b"lz4:" + full[:-1],
+            # More entries than present.
+            ver + b"lz4:" + self._body((b"pcb0", True), count=2),
+        ):
+            yield self._check_raises, raw, SCIONIndexError
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
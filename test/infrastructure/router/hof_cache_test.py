@@ -0,0 +1,104 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`hof_cache_test` --- infrastructure.router.hof_cache unit tests
+====================================================================
+"""
+# Stdlib
+from unittest.mock import patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from infrastructure.router.hof_cache import HOFMacCache
+from test.testcommon import create_mock
+
+
+def _hof(raw, verified=True):
+    hof = create_mock(["pack", "verify_mac", "exp_time"])
+    hof.pack.return_value = raw
+    hof.verify_mac.return_value = verified
+    hof.exp_time = 0
+    return hof
+
+
+class TestHOFMacCacheVerify(object):
+    """
+    Unit tests for infrastructure.router.hof_cache.HOFMacCache.verify
+    """
+    @patch("infrastructure.router.hof_cache.SCIONTime.get_time",
+           new_callable=create_mock)
+    def test_miss(self, get_time):
+        inst = HOFMacCache()
+        hof = _hof(b"hof")
+        prev_hof = _hof(b"prev")
+        # Call
+        ntools.ok_(inst.verify("key", 10, hof, prev_hof))
+        # Tests
+        hof.verify_mac.assert_called_once_with("key", 10, prev_hof)
+        ntools.eq_(inst._entries, {(10, b"hof", b"prev"): 10})
+        ntools.eq_((inst.hits, inst.misses), (0, 1))
+
+    @patch("infrastructure.router.hof_cache.SCIONTime.get_time",
+           new_callable=create_mock)
+    def test_hit(self, get_time):
+        inst = HOFMacCache()
+        inst._key = "key"
+        inst._entries[(10, b"hof", b"")] = 20
+        get_time.return_value = 15
+        hof = _hof(b"hof")
+        # Call
+        ntools.ok_(inst.verify("key", 10, hof))
+        # Tests
+        ntools.assert_false(hof.verify_mac.called)
+        ntools.eq_((inst.hits, inst.misses), (1, 0))
+
+    @patch("infrastructure.router.hof_cache.SCIONTime.get_time",
+           new_callable=create_mock)
+    def test_expired(self, get_time):
+        inst = HOFMacCache()
+        inst._key = "key"
+        inst._entries[(10, b"hof", b"")] = 20
+        get_time.return_value = 21
+        hof = _hof(b"hof", verified=False)
+        # Call
+        ntools.assert_false(inst.verify("key", 10, hof))
+        # Tests
+        ntools.eq_(inst._entries, {})
+        ntools.eq_((inst.hits, inst.misses), (0, 1))
+
+    def test_key_change(self):
+        inst = HOFMacCache()
+        inst._key = "old key"
+        inst._entries[(10, b"hof", b"")] = 20
+        hof = _hof(b"hof")
+        # Call
+        inst.verify("key", 10, hof)
+        # Tests
+        hof.verify_mac.assert_called_once_with("key", 10, None)
+        ntools.eq_(inst._key, "key")
+
+    def test_evict(self):
+        inst = HOFMacCache(max_len=2)
+        # Call
+        for raw in (b"a", b"b", b"c"):
+            inst.verify("key", 10, _hof(raw))
+        # Tests
+        ntools.eq_(list(inst._entries), [(10, b"b", b""), (10, b"c", b"")])
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
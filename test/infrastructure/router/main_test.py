@@ -0,0 +1,82 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`main_test` --- infrastructure.router.main unit tests
+==========================================================
+"""
+# Stdlib
+from unittest.mock import patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from infrastructure.router.main import Router
+from test.testcommon import create_mock
+
+
+class TestRouterHandleRecv(object):
+    """
+    Unit tests for infrastructure.router.main.Router.handle_recv
+    """
+    @patch("infrastructure.router.main.Router.__init__", autospec=True,
+           return_value=None)
+    def _setup(self, init):
+        inst = Router("id", "conf_dir")
+        inst.packet_put_batch = create_mock()
+        return inst
+
+    def test(self):
+        inst = self._setup()
+        sock = create_mock(["recv_many"])
+        # Call
+        inst.handle_recv(sock)
+        # Tests
+        sock.recv_many.assert_called_once_with(Router.RECV_BATCH)
+        inst.packet_put_batch.assert_called_once_with(
+            sock.recv_many.return_value, sock)
+
+    def test_empty(self):
+        inst = self._setup()
+        sock = create_mock(["recv_many"])
+        sock.recv_many.return_value = []
+        # Call
+        inst.handle_recv(sock)
+        # Tests
+        ntools.assert_false(inst.packet_put_batch.called)
+
+
+class TestRouterHandleHandoff(object):
+    """
+    Unit tests for infrastructure.router.main.Router.handle_handoff
+    """
+    @patch("infrastructure.router.main.Router.__init__", autospec=True,
+           return_value=None)
+    def test(self, init):
+        inst = Router("id", "conf_dir")
+        inst._local_sock = "local sock"
+        inst.packet_put_batch = create_mock()
+        sock = create_mock(["recv_many"])
+        # Call
+        inst.handle_handoff(sock)
+        # Tests
+        sock.recv_many.assert_called_once_with(Router.RECV_BATCH)
+        # Handed-over packets were received on the intra-AS socket.
+        inst.packet_put_batch.assert_called_once_with(
+            sock.recv_many.return_value, "local sock")
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,138 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`shared_state_test` --- infrastructure.router.shared_state unit tests
+==========================================================================
+"""
+# Stdlib
+import multiprocessing
+from unittest.mock import patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from infrastructure.router.shared_state import (
+    SharedExpiringDict,
+    SharedInterfaceStates,
+)
+from test.testcommon import create_mock
+
+
+def _if_state_info(active, token):
+    info = create_mock(["p", "rev_info"])
+    info.p = create_mock(["active"])
+    info.p.active = active
+    info.rev_info = create_mock(["p"])
+    info.rev_info.p = create_mock(["revToken"])
+    info.rev_info.p.revToken = token
+    return info
+
+
+class TestSharedInterfaceStates(object):
+    """
+    Unit tests for infrastructure.router.shared_state.SharedInterfaceStates
+    """
+    def test_init(self):
+        inst = SharedInterfaceStates([3, 1])
+        # Tests
+        ntools.ok_(1 in inst)
+        ntools.assert_false(2 in inst)
+        ntools.ok_(inst[3].is_active)
+        ntools.assert_is_none(inst[3].rev_token)
+
+    def test_update(self):
+        inst = SharedInterfaceStates([1, 2])
+        # Call
+        inst[2].update(_if_state_info(False, b"token"))
+        # Tests
+        ntools.assert_false(inst[2].is_active)
+        ntools.eq_(inst[2].rev_token, b"token")
+        ntools.ok_(inst[1].is_active)
+        ntools.assert_is_none(inst[1].rev_token)
+
+    def test_update_shorter_token(self):
+        inst = SharedInterfaceStates([1])
+        inst[1].update(_if_state_info(True, b"long token"))
+        # Call
+        inst[1].update(_if_state_info(True, b"tok"))
+        # Tests
+        ntools.eq_(inst[1].rev_token, b"tok")
+
+    def test_shared(self):
+        inst = SharedInterfaceStates([1])
+        ctx = multiprocessing.get_context("fork")
+        proc = ctx.Process(target=lambda: inst[1].update(
+            _if_state_info(False, b"token")))
+        # Call
+        proc.start()
+        proc.join()
+        # Tests
+        ntools.eq_(proc.exitcode, 0)
+        ntools.assert_false(inst[1].is_active)
+        ntools.eq_(inst[1].rev_token, b"token")
+
+
+class TestSharedExpiringDict(object):
+    """
+    Unit tests for infrastructure.router.shared_state.SharedExpiringDict
+    """
+    @patch("infrastructure.router.shared_state.SCIONTime.get_time",
+           new_callable=create_mock)
+    def test_set(self, get_time):
+        inst = SharedExpiringDict(10, 5)
+        get_time.return_value = 100
+        # Call
+        inst[b"token"] = True
+        # Tests
+        ntools.ok_(b"token" in inst)
+        ntools.assert_false(b"other" in inst)
+
+    @patch("infrastructure.router.shared_state.SCIONTime.get_time",
+           new_callable=create_mock)
+    def test_expired(self, get_time):
+        inst = SharedExpiringDict(10, 5)
+        get_time.return_value = 100
+        inst[b"token"] = True
+        get_time.return_value = 105
+        # Call
+        ntools.assert_false(b"token" in inst)
+
+    @patch("infrastructure.router.shared_state.SCIONTime.get_time",
+           new_callable=create_mock)
+    def test_collision(self, get_time):
+        inst = SharedExpiringDict(1, 5)
+        get_time.return_value = 100
+        inst[b"token1"] = True
+        # Call
+        inst[b"token2"] = True
+        # Tests
+        ntools.assert_false(b"token1" in inst)
+        ntools.ok_(b"token2" in inst)
+
+    def test_shared(self):
+        inst = SharedExpiringDict(10, 5)
+        ctx = multiprocessing.get_context("fork")
+        proc = ctx.Process(target=inst.__setitem__, args=(b"token", True))
+        # Call
+        proc.start()
+        proc.join()
+        # Tests
+        ntools.eq_(proc.exitcode, 0)
+        ntools.ok_(b"token" in inst)
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,320 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`workers_test` --- infrastructure.router.workers unit tests
+================================================================
+"""
+# Stdlib
+import os
+import select
+import shutil
+import signal
+import tempfile
+import time
+from unittest.mock import call, patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from infrastructure.router.workers import PacketHandoff, WorkerPool
+from test.testcommon import create_mock
+
+
+class TestWorkerPoolStart(object):
+    """
+    Unit tests for infrastructure.router.workers.WorkerPool.start
+    """
+    @patch("infrastructure.router.workers.os", autospec=True)
+    def test_parent(self, os_):
+        inst = WorkerPool(2, "main")
+        inst._supervise = create_mock()
+        os_.fork.return_value = 42
+        # Call
+        inst.start()
+        # Tests
+        ntools.eq_(inst._supervisor_pid, 42)
+        ntools.assert_false(inst._supervise.called)
+
+    def _check_child(self, side_effect, status):
+        inst = WorkerPool(2, "main")
+        inst._supervise = create_mock()
+        inst._supervise.side_effect = side_effect
+        with patch("infrastructure.router.workers.os",
+                   autospec=True) as os_:
+            os_.fork.return_value = 0
+            # Call
+            inst.start()
+        # Tests
+        inst._supervise.assert_called_once_with(os_.getppid.return_value)
+        os_._exit.assert_called_once_with(status)
+
+    @patch("infrastructure.router.workers.log_exception", autospec=True)
+    def test_child(self, _):
+        for side_effect, status in ((None, 0), (ValueError, 1)):
+            yield self._check_child, side_effect, status
+
+
+class TestWorkerPoolSupervise(object):
+    """
+    Unit tests for infrastructure.router.workers.WorkerPool._supervise
+    """
+    def _setup(self):
+        inst = WorkerPool(2, "main")
+        inst._fork = create_mock()
+        inst._fork.side_effect = [11, 12]
+        inst.check = create_mock()
+        inst._stop_workers = create_mock()
+        return inst
+
+    @patch("infrastructure.router.workers.time.sleep", autospec=True)
+    @patch("infrastructure.router.workers.os.getppid", autospec=True)
+    @patch("infrastructure.router.workers.signal.signal", autospec=True)
+    def test_stopped(self, signal_, getppid, sleep):
+        inst = self._setup()
+        getppid.return_value = 7
+
+        def check():
+            if inst.check.call_count == 2:
+                inst._stopped = True
+        inst.check.side_effect = check
+        # Call
+        inst._supervise(7)
+        # Tests
+        signal_.assert_called_once_with(signal.SIGTERM, inst._handle_sigterm)
+        inst._fork.assert_has_calls([call(1), call(2)])
+        ntools.eq_(inst._pids, {1: 11, 2: 12})
+        ntools.eq_(inst.check.call_count, 2)
+        inst._stop_workers.assert_called_once_with()
+
+    @patch("infrastructure.router.workers.time.sleep", autospec=True)
+    @patch("infrastructure.router.workers.os.getppid", autospec=True)
+    @patch("infrastructure.router.workers.signal.signal", autospec=True)
+    def test_parent_exited(self, signal_, getppid, sleep):
+        inst = self._setup()
+        getppid.side_effect = [7, 1]
+        # Call
+        inst._supervise(7)
+        # Tests
+        inst.check.assert_called_once_with()
+        inst._stop_workers.assert_called_once_with()
+
+
+class TestWorkerPoolFork(object):
+    """
+    Unit tests for infrastructure.router.workers.WorkerPool._fork
+    """
+    @patch("infrastructure.router.workers.os", autospec=True)
+    def test_parent(self, os_):
+        main = create_mock()
+        inst = WorkerPool(1, main)
+        os_.fork.return_value = 42
+        # Call
+        ntools.eq_(inst._fork(1), 42)
+        # Tests
+        ntools.assert_false(main.called)
+        ntools.assert_false(os_._exit.called)
+
+    def _check_child(self, side_effect, status):
+        main = create_mock()
+        main.side_effect = side_effect
+        inst = WorkerPool(1, main)
+        with patch("infrastructure.router.workers.os",
+                   autospec=True) as os_, \
+                patch("infrastructure.router.workers.signal.signal",
+                      autospec=True) as signal_:
+            os_.fork.return_value = 0
+            # Call
+            inst._fork(3)
+        # Tests
+        signal_.assert_called_once_with(signal.SIGTERM, signal.SIG_DFL)
+        main.assert_called_once_with(3)
+        os_._exit.assert_called_once_with(status)
+
+    @patch("infrastructure.router.workers.log_exception", autospec=True)
+    def test_child(self, _):
+        for side_effect, status in (
+            (None, 0), (SystemExit(0), 0), (SystemExit(1), 1),
+            (ValueError, 1),
+        ):
+            yield self._check_child, side_effect, status
+
+
+class TestWorkerPoolCheck(object):
+    """
+    Unit tests for infrastructure.router.workers.WorkerPool.check
+    """
+    def _setup(self):
+        inst = WorkerPool(3, "main")
+        inst._pids = {1: 11, 2: 12, 3: 13}
+        inst._fork = create_mock()
+        inst._fork.return_value = 22
+        return inst
+
+    @patch("infrastructure.router.workers.os.waitpid", autospec=True)
+    def test_running(self, waitpid):
+        inst = self._setup()
+        waitpid.return_value = 0, 0
+        # Call
+        ntools.eq_(inst.check(), [])
+        # Tests
+        waitpid.assert_has_calls([call(11, os.WNOHANG), call(12, os.WNOHANG),
+                                  call(13, os.WNOHANG)])
+        ntools.assert_false(inst._fork.called)
+
+    @patch("infrastructure.router.workers.os.waitpid", autospec=True)
+    def test_exited(self, waitpid):
+        inst = self._setup()
+        waitpid.side_effect = [(0, 0), (12, 256), ChildProcessError]
+        inst._fork.side_effect = [22, 23]
+        # Call
+        ntools.eq_(inst.check(), [2, 3])
+        # Tests
+        inst._fork.assert_has_calls([call(2), call(3)])
+        ntools.eq_(inst._pids, {1: 11, 2: 22, 3: 23})
+
+
+class TestWorkerPoolStopWorkers(object):
+    """
+    Unit tests for infrastructure.router.workers.WorkerPool._stop_workers
+    """
+    @patch("infrastructure.router.workers.os", autospec=True)
+    def test(self, os_):
+        inst = WorkerPool(2, "main")
+        inst._pids = {1: 11, 2: 12}
+        os_.kill.side_effect = [ProcessLookupError, None]
+        # Call
+        inst._stop_workers()
+        # Tests
+        os_.kill.assert_has_calls([call(11, signal.SIGTERM),
+                                   call(12, signal.SIGTERM)])
+        os_.waitpid.assert_called_once_with(12, 0)
+        ntools.eq_(inst._pids, {})
+
+
+class TestWorkerPoolStop(object):
+    """
+    Unit tests for infrastructure.router.workers.WorkerPool.stop
+    """
+    @patch("infrastructure.router.workers.os", autospec=True)
+    def test(self, os_):
+        inst = WorkerPool(2, "main")
+        inst._supervisor_pid = 42
+        # Call
+        inst.stop()
+        inst.stop()
+        # Tests
+        os_.kill.assert_called_once_with(42, signal.SIGTERM)
+        os_.waitpid.assert_called_once_with(42, 0)
+
+    @patch("infrastructure.router.workers.os", autospec=True)
+    def test_not_started(self, os_):
+        inst = WorkerPool(2, "main")
+        # Call
+        inst.stop()
+        # Tests
+        ntools.assert_false(os_.kill.called)
+
+
+class TestWorkerPoolRestart(object):
+    """
+    Tests that infrastructure.router.workers.WorkerPool restarts real workers
+    that crash, and stops them along with the supervisor.
+    """
+    def _read_pids(self, rfd, count):
+        pids = []
+        deadline = time.time() + 10
+        buf = b""
+        while len(pids) < count and time.time() < deadline:
+            ready, _, _ = select.select([rfd], [], [], 0.1)
+            if not ready:
+                continue
+            buf += os.read(rfd, 64)
+            *lines, buf = buf.split(b"\n")
+            pids.extend(int(line) for line in lines)
+        return pids
+
+    def _alive(self, pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+    def test(self):
+        rfd, wfd = os.pipe()
+        tmp_dir = tempfile.mkdtemp()
+        marker = os.path.join(tmp_dir, "crashed")
+
+        def worker_main(worker_id):
+            os.write(wfd, b"%d\n" % os.getpid())
+            if not os.path.exists(marker):
+                # The first worker crashes, its replacement keeps running.
+                open(marker, "w").close()
+                raise ValueError("crash")
+            time.sleep(30)
+        inst = WorkerPool(1, worker_main)
+        inst.CHECK_INTERVAL = 0.01
+        try:
+            with patch("infrastructure.router.workers.log_exception"):
+                # Call
+                inst.start()
+                pids = self._read_pids(rfd, 2)
+            # Tests
+            ntools.eq_(len(pids), 2)
+            ntools.ok_(self._alive(pids[1]))
+        finally:
+            inst.stop()
+            os.close(rfd)
+            os.close(wfd)
+            shutil.rmtree(tmp_dir)
+        # The replacement worker was stopped (and reaped) by the supervisor.
+        ntools.assert_false(self._alive(pids[1]))
+
+
+class TestPacketHandoff(object):
+    """
+    Unit tests for infrastructure.router.workers.PacketHandoff
+    """
+    def test(self):
+        inst = PacketHandoff()
+        try:
+            # Call
+            inst.send(b"packet 1")
+            inst.send(bytearray(b"packet 2"))
+            inst.send(b"packet 3")
+            # Tests
+            ntools.eq_(inst.recv_many(2), [(b"packet 1", None),
+                                           (b"packet 2", None)])
+            ntools.eq_(inst.recv_many(5), [(b"packet 3", None)])
+            ntools.eq_(inst.recv_many(5), [])
+        finally:
+            inst.close()
+
+    @patch("infrastructure.router.workers.logging.warning", autospec=True)
+    def test_full(self, warning):
+        inst = PacketHandoff()
+        try:
+            # Call
+            for _ in range(10000):
+                inst.send(bytes(1000))
+        finally:
+            inst.close()
+        # Tests
+        ntools.ok_(warning.called)
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,138 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`scion_elem_test` --- infrastructure.scion_elem unit tests
+===============================================================
+"""
+# Stdlib
+import queue
+from unittest.mock import call, patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from infrastructure.scion_elem import SCIONElement
+from test.testcommon import assert_these_calls, create_mock
+
+
+def _pkts(*names):
+    return [(name, "addr") for name in names]
+
+
+def _entries(sock, from_local_as, *names):
+    return [(name, "addr", from_local_as, sock) for name in names]
+
+
+class TestSCIONElementPacketPutBatch(object):
+    """
+    Unit tests for infrastructure.scion_elem.SCIONElement.packet_put_batch
+    """
+    @patch("infrastructure.scion_elem.SCIONElement.__init__", autospec=True,
+           return_value=None)
+    def _setup(self, init, maxsize=2):
+        inst = SCIONElement("id", "conf_dir")
+        inst._local_sock = "local sock"
+        inst._in_buf = queue.Queue(maxsize)
+        inst.total_dropped = 0
+        return inst
+
+    def _queued(self, inst):
+        ret = []
+        while not inst._in_buf.empty():
+            ret.append(inst._in_buf.get_nowait())
+        return ret
+
+    def test_basic(self):
+        inst = self._setup()
+        # Call
+        inst.packet_put_batch(_pkts("p0", "p1"), "local sock")
+        inst.packet_put_batch(_pkts("p2"), "remote sock")
+        # Tests
+        ntools.eq_(self._queued(inst), [
+            _entries("local sock", True, "p0", "p1"),
+            _entries("remote sock", False, "p2"),
+        ])
+        ntools.eq_(inst.total_dropped, 0)
+
+    def test_full(self):
+        inst = self._setup()
+        inst.packet_put_batch(_pkts("p0", "p1", "p2"), "sock")
+        inst.packet_put_batch(_pkts("p3"), "sock")
+        # Call
+        inst.packet_put_batch(_pkts("p4", "p5"), "sock")
+        # Tests
+        # Only the 2 oldest packets are dropped, the rest of the oldest batch
+        # is merged into the next one.
+        ntools.eq_(self._queued(inst), [
+            _entries("sock", False, "p2", "p3"),
+            _entries("sock", False, "p4", "p5"),
+        ])
+        ntools.eq_(inst.total_dropped, 2)
+
+    def test_full_single_entry(self):
+        inst = self._setup(maxsize=1)
+        inst.packet_put_batch(_pkts("p0", "p1", "p2"), "sock")
+        # Call
+        inst.packet_put_batch(_pkts("p3"), "sock")
+        # Tests
+        ntools.eq_(self._queued(inst), [
+            _entries("sock", False, "p1", "p2", "p3"),
+        ])
+        ntools.eq_(inst.total_dropped, 1)
+
+    def test_full_small_oldest(self):
+        inst = self._setup()
+        inst.packet_put_batch(_pkts("p0"), "sock")
+        inst.packet_put_batch(_pkts("p1"), "sock")
+        # Call
+        inst.packet_put_batch(_pkts("p2", "p3", "p4"), "sock")
+        # Tests
+        ntools.eq_(self._queued(inst), [
+            _entries("sock", False, "p1"),
+            _entries("sock", False, "p2", "p3", "p4"),
+        ])
+        ntools.eq_(inst.total_dropped, 1)
+
+
+class TestSCIONElementPacketProcess(object):
+    """
+    Unit tests for infrastructure.scion_elem.SCIONElement._packet_process
+    """
+    @patch("infrastructure.scion_elem.SCIONElement.__init__", autospec=True,
+           return_value=None)
+    def test(self, init):
+        inst = SCIONElement("id", "conf_dir")
+        inst.run_flag = create_mock(["is_set"])
+        inst.run_flag.is_set.side_effect = [True, True, True, False]
+        inst._in_buf = create_mock(["get"])
+        inst._in_buf.get.side_effect = [
+            _entries("sock", True, "p0", "p1"), queue.Empty,
+            _entries("sock", False, "p2"),
+        ]
+        inst.handle_request = create_mock()
+        # Call
+        inst._packet_process()
+        # Tests
+        assert_these_calls(inst._in_buf.get, [call(timeout=1.0)] * 3)
+        assert_these_calls(inst.handle_request, [
+            call("p0", "addr", True, "sock"),
+            call("p1", "addr", True, "sock"),
+            call("p2", "addr", False, "sock"),
+        ])
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
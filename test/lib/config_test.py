@@ -36,6 +36,7 @@ class BaseLibConfig(object):
         'registration_time': 'RegisterTime',
         'registers_paths': 'RegisterPath',
         'cert_ver': 'CertChainVersion',
+        'pcb_verify_threads': 'PCBVerifyThreads',
     }
 
 
@@ -46,6 +47,7 @@ class TestConfigParseDict(BaseLibConfig):
     config_dict = {
         "CertChainVersion": 0,
         "MasterASKey": "Xf93o3Wz/4Gb0m6CXEaxag==",
+        "PCBVerifyThreads": 4,
         "PropagateTime": 5,
         "RegisterPath": 1,
         "RegisterTime": 5,
@@ -56,6 +58,13 @@ class TestConfigParseDict(BaseLibConfig):
         cfg.parse_dict(self.config_dict)
         self._compare_attributes(cfg, self.config_dict)
 
+    def test_default_verify_threads(self):
+        config_dict = dict(self.config_dict)
+        del config_dict["PCBVerifyThreads"]
+        cfg = Config()
+        cfg.parse_dict(config_dict)
+        ntools.eq_(cfg.pcb_verify_threads, Config.PCB_VERIFY_THREADS)
+
     def _compare_attributes(self, config, config_dict):
         ntools.eq_(len(config.__dict__),
                    len(self.ATTRS_TO_KEYS),
@@ -0,0 +1,135 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`lib_crypto_certificate_test` --- lib.crypto.certificate unit tests
+========================================================================
+"""
+# Stdlib
+from unittest.mock import patch
+
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from lib.crypto.certificate import (
+    CertificateChain,
+    TRC,
+    VerificationCache,
+    verify_sig_chain_trc,
+)
+from test.testcommon import create_mock
+
+
+class TestVerificationCacheGet(object):
+    """
+    Unit tests for lib.crypto.certificate.VerificationCache.get
+    """
+    @patch("lib.crypto.certificate.time.time", autospec=True)
+    def test(self, time_):
+        inst = VerificationCache()
+        inst.add("key", "vkey", 10)
+        time_.return_value = 9
+        # Call
+        ntools.eq_(inst.get("key"), "vkey")
+
+    def test_missing(self):
+        ntools.assert_is_none(VerificationCache().get("key"))
+
+    @patch("lib.crypto.certificate.time.time", autospec=True)
+    def test_expired(self, time_):
+        inst = VerificationCache()
+        inst.add("key", "vkey", 10)
+        time_.return_value = 10
+        # Call
+        ntools.assert_is_none(inst.get("key"))
+
+
+class TestVerificationCacheAdd(object):
+    """
+    Unit tests for lib.crypto.certificate.VerificationCache.add
+    """
+    @patch("lib.crypto.certificate.time.time", autospec=True)
+    def test_evict(self, time_):
+        time_.return_value = 0
+        inst = VerificationCache(max_len=2)
+        for i in range(3):
+            inst.add(i, "vkey%d" % i, 10)
+        # Tests
+        ntools.assert_is_none(inst.get(0))
+        ntools.eq_(inst.get(1), "vkey1")
+        ntools.eq_(inst.get(2), "vkey2")
+
+
+class TestVerifySigChainTrc(object):
+    """
+    Unit tests for lib.crypto.certificate.verify_sig_chain_trc
+    """
+    def _setup(self):
+        chain = create_mock(["digest", "expiration_time"],
+                            class_=CertificateChain)
+        chain.digest.return_value = "chain digest"
+        chain.expiration_time.return_value = 2 ** 32
+        trc = create_mock(["digest"], class_=TRC)
+        trc.digest.return_value = "trc digest"
+        return chain, trc
+
+    @patch("lib.crypto.certificate.verify", autospec=True)
+    @patch("lib.crypto.certificate._verify_chain_trc", autospec=True)
+    @patch("lib.crypto.certificate._VERIFICATION_CACHE",
+           new_callable=VerificationCache)
+    def test_miss(self, cache, verify_chain_trc, verify):
+        chain, trc = self._setup()
+        verify_chain_trc.return_value = "vkey"
+        # Call
+        ntools.eq_(verify_sig_chain_trc("msg", "sig", "subject", chain, trc, 2),
+                   verify.return_value)
+        # Tests
+        verify_chain_trc.assert_called_once_with("subject", chain, trc, 2)
+        verify.assert_called_once_with("msg", "sig", "vkey")
+        ntools.eq_(cache.get(("trc digest", 2, "chain digest", "subject")),
+                   "vkey")
+
+    @patch("lib.crypto.certificate.verify", autospec=True)
+    @patch("lib.crypto.certificate._verify_chain_trc", autospec=True)
+    @patch("lib.crypto.certificate._VERIFICATION_CACHE",
+           new_callable=VerificationCache)
+    def test_hit(self, cache, verify_chain_trc, verify):
+        chain, trc = self._setup()
+        cache.add(("trc digest", 2, "chain digest", "subject"), "vkey",
+                  float("inf"))
+        # Call
+        verify_sig_chain_trc("msg", "sig", "subject", chain, trc, 2)
+        # Tests
+        ntools.assert_false(verify_chain_trc.called)
+        verify.assert_called_once_with("msg", "sig", "vkey")
+
+    @patch("lib.crypto.certificate.verify", autospec=True)
+    @patch("lib.crypto.certificate._verify_chain_trc", autospec=True)
+    @patch("lib.crypto.certificate._VERIFICATION_CACHE",
+           new_callable=VerificationCache)
+    def test_invalid(self, cache, verify_chain_trc, verify):
+        chain, trc = self._setup()
+        verify_chain_trc.return_value = None
+        # Call
+        ntools.assert_false(
+            verify_sig_chain_trc("msg", "sig", "subject", chain, trc, 2))
+        # Tests
+        ntools.assert_false(verify.called)
+        ntools.assert_is_none(
+            cache.get(("trc digest", 2, "chain digest", "subject")))
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
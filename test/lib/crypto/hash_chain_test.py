@@ -46,6 +46,19 @@ class TestHashChain(SCIONCommonTest):
         ntools.assert_raises(HashChainExhausted, hc.move_to_next_element)
         self.assertFalse(HashChain.verify(Random.new().read(32), target))
 
+    def test_walk(self):
+        """
+        Test that walk returns the elements verify accepts.
+        """
+        start = Random.new().read(32)
+        elements = HashChain.walk(start, 5)
+        ntools.eq_(len(elements), 5)
+        ntools.eq_(elements[0], start)
+        for ele in elements:
+            self.assertTrue(HashChain.verify(start, ele, 5))
+        self.assertFalse(HashChain.verify(start, HashChain.walk(start, 6)[5],
+                                          5))
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     unittest.main()
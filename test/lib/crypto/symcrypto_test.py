@@ -0,0 +1,82 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`lib_crypto_symcrypto_test` --- lib.crypto.symcrypto unit tests
+====================================================================
+"""
+# External packages
+import nose
+import nose.tools as ntools
+from Crypto.Cipher import AES
+
+# SCION
+from lib.crypto.symcrypto import CBCMac, cbcmac, cbcmac_many
+
+KEY = bytes(range(16))
+
+
+def _ref_mac(msg):
+    return AES.new(KEY, AES.MODE_CBC, bytes(16)).encrypt(msg)[-16:]
+
+
+class TestCBCMacMacMany(object):
+    """
+    Unit tests for lib.crypto.symcrypto.CBCMac.mac_many
+    """
+    def test(self):
+        msgs = [bytes([i]) * 32 for i in range(5)]
+        # Call
+        ntools.eq_(CBCMac(KEY).mac_many(msgs), [_ref_mac(m) for m in msgs])
+
+    def test_reuse(self):
+        inst = CBCMac(KEY)
+        msg = bytes(range(48))
+        # Call
+        ntools.eq_(inst.mac(msg), inst.mac(msg))
+
+    def test_empty(self):
+        ntools.eq_(CBCMac(KEY).mac_many([]), [])
+
+    def test_null(self):
+        ntools.assert_raises(ValueError, CBCMac(KEY).mac_many, [None])
+
+    def test_bad_len(self):
+        ntools.assert_raises(ValueError, CBCMac(KEY).mac_many,
+                             [bytes(16), bytes(32)])
+
+
+class TestCbcmac(object):
+    """
+    Unit tests for lib.crypto.symcrypto.cbcmac
+    """
+    def test_key(self):
+        msg = bytes(range(32))
+        ntools.eq_(cbcmac(KEY, msg), _ref_mac(msg))
+
+    def test_cbcmac_obj(self):
+        msg = bytes(range(32))
+        ntools.eq_(cbcmac(CBCMac(KEY), msg), _ref_mac(msg))
+
+
+class TestCbcmacMany(object):
+    """
+    Unit tests for lib.crypto.symcrypto.cbcmac_many
+    """
+    def test(self):
+        msgs = [bytes([i]) * 16 for i in range(3)]
+        ntools.eq_(cbcmac_many(KEY, msgs), [_ref_mac(m) for m in msgs])
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
@@ -124,6 +124,27 @@ class TestHopOpaqueFieldCalcMac(object):
         cbcmac.assert_called_once_with("key", expected)
 
 
+class TestHopOpaqueFieldSetMacs(object):
+    """
+    Unit tests for lib.packet.opaque_field.HopOpaqueField.set_macs
+    """
+    @patch("lib.packet.opaque_field.cbcmac_many", autospec=True)
+    def test(self, cbcmac_many):
+        hofs = []
+        for i in range(2):
+            hof = create_mock(["_mac_input", "mac"])
+            hof._mac_input.return_value = "input%d" % i
+            hofs.append(hof)
+        cbcmac_many.return_value = [b"mac0data", b"mac1data"]
+        # Call
+        HopOpaqueField.set_macs("key", "ts", hofs, "prev")
+        # Tests
+        cbcmac_many.assert_called_once_with("key", ["input0", "input1"])
+        for hof in hofs:
+            hof._mac_input.assert_called_once_with("ts", "prev")
+        ntools.eq_([hof.mac for hof in hofs], [b"mac", b"mac"])
+
+
 def _of_list_setup():
     order = ["up", "down", "core"]
     inst = OpaqueFieldList(order)
@@ -152,6 +173,31 @@ class TestOpaqueFieldListSet(object):
         ntools.assert_raises(SCIONKeyError, inst.set, "oops", ["there"])
 
 
+class TestOpaqueFieldListSetLazy(object):
+    """
+    Unit tests for lib.packet.opaque_field.OpaqueFieldList.set_lazy
+    """
+    def test_decode_once(self):
+        inst = _of_list_setup()
+        parser = create_mock()
+        # Call
+        inst.set_lazy("down", [b"raw0", b"raw1"], parser)
+        # Tests
+        ntools.eq_(inst._labels["down"], [b"raw0", b"raw1"])
+        ntools.eq_(inst.get_by_idx(4), parser.return_value)
+        ntools.eq_(inst.get_by_label("down", 1), parser.return_value)
+        parser.assert_called_once_with(b"raw1")
+        ntools.eq_(inst._labels["down"], [b"raw0", parser.return_value])
+
+    def test_set_clears_parser(self):
+        inst = _of_list_setup()
+        inst.set_lazy("down", [b"raw0"], create_mock())
+        # Call
+        inst.set("down", ["there"])
+        # Tests
+        ntools.assert_not_in("down", inst._parsers)
+
+
 class TestOpaqueFieldListGetByIdx(object):
     """
     Unit tests for lib.packet.opaque_field.OpaqueFieldList.get_by_idx
@@ -355,6 +401,14 @@ class TestOpaqueFieldListPack(object):
         for of in ofs:
             of.pack.assert_called_once_with()
 
+    def test_lazy(self):
+        inst = OpaqueFieldList(["a", "b"])
+        of = create_mock(["pack"])
+        of.pack.return_value = b"packed"
+        inst._labels = {"a": [of], "b": [b"raw0", b"raw1"]}
+        # Call
+        ntools.eq_(inst.pack(), b"packedraw0raw1")
+
 
 class TestOpaqueFieldListCount(object):
     """
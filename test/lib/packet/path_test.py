@@ -27,8 +27,9 @@ import nose.tools as ntools
 from lib.packet.path import (
     PathCombinator,
     SCIONPath,
+    ShortcutIndex,
 )
-from test.testcommon import assert_these_calls, create_mock
+from test.testcommon import assert_these_calls, create_mock, create_mock_full
 
 
 class TestSCIONPathParse(object):
@@ -99,6 +100,19 @@ class TestSCIONPathParseHofs(object):
         assert_these_calls(data.pop, [call(hof.LEN)] * 3)
         inst._ofs.set.assert_called_once_with("label", ["hof0", "hof1", "hof2"])
 
+    @patch("lib.packet.path.HopOpaqueField", autospec=True)
+    def test_lazy(self, hof):
+        inst = SCIONPath(lazy=True)
+        data = create_mock(["pop"])
+        data.pop.side_effect = [b"raw0", b"raw1"]
+        inst._ofs = create_mock(["set_lazy"])
+        # Call
+        inst._parse_hofs(data, "label", 2)
+        # Tests
+        inst._ofs.set_lazy.assert_called_once_with(
+            "label", [b"raw0", b"raw1"], hof)
+        ntools.assert_false(hof.called)
+
 
 class TestSCIONPathSetOfs(object):
     """
@@ -461,17 +475,29 @@ class TestPathCombinatorBuildShortcutPaths(object):
     """
     Unit tests for lib.packet.path.PathCombinator.build_shortcut_paths
     """
+    @patch("lib.packet.path.PathCombinator._index_segment",
+           new_callable=create_mock)
     @patch("lib.packet.path.PathCombinator._build_shortcut_path",
            new_callable=create_mock)
-    def test(self, build_path):
+    def test(self, build_path, index_seg):
         up_segments = ['up0', 'up1']
         down_segments = ['down0', 'down1']
-        build_path.side_effect = ['path0', 'path1', None, 'path1']
+        index_seg.side_effect = lambda seg, up=True: "idx " + seg
+        paths = []
+        for raw in (b"path0", b"path1", b"path1"):
+            path = create_mock(["pack"])
+            path.pack.return_value = raw
+            paths.append(path)
+        build_path.side_effect = [paths[0], paths[1], None, paths[2]]
         ntools.eq_(
             PathCombinator.build_shortcut_paths(up_segments, down_segments),
-            ["path0", "path1"])
-        calls = [call(*x) for x in product(up_segments, down_segments)]
+            paths[:2])
+        calls = [call(up, down, "idx " + up, "idx " + down)
+                 for up, down in product(up_segments, down_segments)]
         assert_these_calls(build_path, calls)
+        assert_these_calls(index_seg, [
+            call("up0"), call("up1"), call("down0", False),
+            call("down1", False)])
 
 
 class TestPathCombinatorBuildShortcutPath(PathCombinatorBase):
@@ -479,8 +505,8 @@ class TestPathCombinatorBuildShortcutPath(PathCombinatorBase):
     Unit tests for lib.packet.path.PathCombinator._build_shortcut_path
     """
     def _check_none(self, up_seg, down_seg):
-        ntools.assert_is_none(
-            PathCombinator._build_shortcut_path(up_seg, down_seg))
+        ntools.assert_is_none(PathCombinator._build_shortcut_path(
+            up_seg, down_seg, "up idx", "down idx"))
 
     def test_none(self):
         for up, down in self._generate_none():
@@ -493,9 +519,10 @@ class TestPathCombinatorBuildShortcutPath(PathCombinatorBase):
         down = self._mk_seg(True)
         get_xovr_peer.return_value = None, None
         # Call
-        ntools.assert_is_none(PathCombinator._build_shortcut_path(up, down))
+        ntools.assert_is_none(PathCombinator._build_shortcut_path(
+            up, down, "up idx", "down idx"))
         # Tests
-        get_xovr_peer.assert_called_once_with(up, down)
+        get_xovr_peer.assert_called_once_with("up idx", "down idx")
 
     @patch("lib.packet.path.PathCombinator._join_shortcuts",
            new_callable=create_mock)
@@ -507,8 +534,8 @@ class TestPathCombinatorBuildShortcutPath(PathCombinatorBase):
         down = self._mk_seg(True)
         get_xovr_peer.return_value = xovr, peer
         # Call
-        ntools.eq_(PathCombinator._build_shortcut_path(up, down),
-                   join_shortcuts.return_value)
+        ntools.eq_(PathCombinator._build_shortcut_path(
+            up, down, "up idx", "down idx"), join_shortcuts.return_value)
         # Tests
         expected = xovr
         if is_peer:
@@ -530,6 +557,69 @@ class TestPathCombinatorBuildShortcutPath(PathCombinatorBase):
         yield self._check_xovrs_peers, None, (1, 2), True
 
 
+class TestShortcutIndexInit(object):
+    """
+    Unit tests for lib.packet.path.ShortcutIndex.__init__
+    """
+    def _mk_pcbm(self, in_ia, hof_in_if, in_if):
+        pcbm = create_mock(["inIA", "hof", "p"])
+        pcbm.inIA.return_value = in_ia
+        pcbm.hof.return_value = create_mock_full({"ingress_if": hof_in_if})
+        pcbm.p = create_mock_full({"inIF": in_if})
+        return pcbm
+
+    def _mk_seg(self):
+        asms = []
+        for isd_as, peers in (("core", []), ("a", [("x", 1, 2), ("a", 3, 4)]),
+                              ("b", [])):
+            asm = create_mock(["isd_as", "iter_pcbms"])
+            asm.isd_as.return_value = isd_as
+            asm.iter_pcbms.return_value = [self._mk_pcbm(*p) for p in peers]
+            asms.append(asm)
+        seg = create_mock(["iter_asms"])
+        seg.iter_asms.return_value = asms[1:]
+        return seg
+
+    def test_up(self):
+        seg = self._mk_seg()
+        # Call
+        inst = ShortcutIndex(seg)
+        # Tests
+        seg.iter_asms.assert_called_once_with(1)
+        ntools.eq_(inst.ases, {"a": 1, "b": 2})
+        ntools.eq_(inst.peers, {("a", "x", 1, 2): 1})
+
+    def test_down(self):
+        # Call
+        inst = ShortcutIndex(self._mk_seg(), up=False)
+        # Tests
+        ntools.eq_(inst.peers, {("x", "a", 2, 1): 1})
+
+
+class TestPathCombinatorGetXovrPeer(object):
+    """
+    Unit tests for lib.packet.path.PathCombinator._get_xovr_peer
+    """
+    def _mk_idx(self, ases, peers):
+        return create_mock_full({"ases": ases, "peers": peers})
+
+    def test(self):
+        up_idx = self._mk_idx({"a": 1, "b": 2, "c": 3},
+                              {"p1": 1, "p2": 2, "p3": 3})
+        down_idx = self._mk_idx({"b": 3, "c": 2, "d": 1},
+                                {"p1": 4, "p2": 3, "p4": 5})
+        # Call
+        ntools.eq_(PathCombinator._get_xovr_peer(up_idx, down_idx),
+                   ((2, 3), (1, 4)))
+
+    def test_none(self):
+        up_idx = self._mk_idx({"a": 1}, {"p1": 1})
+        down_idx = self._mk_idx({"b": 1}, {"p2": 1})
+        # Call
+        ntools.eq_(PathCombinator._get_xovr_peer(up_idx, down_idx),
+                   (None, None))
+
+
 class TestPathCombinatorCopySegment(object):
     """
     Unit tests for lib.packet.path.PathCombinator._copy_segment
@@ -24,7 +24,7 @@ import nose.tools as ntools
 
 # SCION
 from lib.packet.pcb import ASMarking, PCBMarking, PathSegment
-from test.testcommon import assert_these_calls, create_mock_full
+from test.testcommon import assert_these_calls, create_mock, create_mock_full
 
 
 def mk_pcbm_p(inIF=22):
@@ -57,13 +57,12 @@ class TestASMarkingFromValues(object):
         pcbms = []
         for i in range(3):
             pcbms.append(create_mock_full({"p": "pcbm %d" % i}))
-        cchain = create_mock_full({"pack()": "cchain"})
         revs = []
         for i in range(2):
             revs.append(create_mock_full({"pack()": "rev %d" % i}))
         # Call
         ASMarking.from_values("isdas", 2, 3, pcbms, "eg rev token", "mtu",
-                              cchain, ifid_size=14, rev_infos=revs)
+                              "cchain", ifid_size=14, rev_infos=revs)
         # Tests
         p_cls.new_message.assert_called_once_with(
             isdas="isdas", trcVer=2, certVer=3, ifIDSize=14,
@@ -190,6 +189,32 @@ class TestPathSegmentGetHopsHash(object):
         # Call
         ntools.eq_(inst.get_hops_hash(hex=True), 'hexdigest')
 
+    @patch("lib.packet.pcb.SHA256", autospec=True)
+    @patch("lib.packet.pcb.PathSegment._setup", autospec=True)
+    def test_cached(self, _, sha):
+        inst, h = self._setup()
+        sha.new.return_value = h
+        # Call
+        ntools.eq_(inst.get_hops_hash(), 'digest')
+        ntools.eq_(inst.get_hops_hash(hex=True), 'hexdigest')
+        # Tests
+        sha.new.assert_called_once_with()
+        assert_these_calls(h.update, [call("t0"), call("t1")])
+
+    @patch("lib.packet.pcb.SHA256", autospec=True)
+    @patch("lib.packet.pcb.PathSegment._setup", autospec=True)
+    def test_invalidated(self, _, sha):
+        inst, h = self._setup()
+        inst.info = create_mock(["timestamp"])
+        inst._update_info = create_mock()
+        sha.new.return_value = h
+        inst.get_hops_hash()
+        # Call
+        inst.set_timestamp(5)
+        inst.get_hops_hash()
+        # Tests
+        ntools.eq_(sha.new.call_count, 2)
+
 
 class TestPathSegmentGetAllIftokens(object):
     """
@@ -212,5 +237,40 @@ class TestPathSegmentGetAllIftokens(object):
         ntools.eq_(inst.get_all_iftokens(), expected)
 
 
+class TestPathSegmentCopyP(object):
+    """
+    Unit test for lib.packet.pcb.PathSegment._copy_p
+    """
+    def _mk_p(self, n_asms, sibra=False):
+        p = PathSegment.P_CLS.new_message(info=b"info", ifID=3)
+        asms = p.init("asms", n_asms)
+        for i in range(n_asms):
+            asms[i].isdas = "1-%d" % i
+        if sibra:
+            p.exts.init("sibra").id = b"sibra id"
+        return p
+
+    @patch("lib.packet.pcb.PathSegment._setup", autospec=True)
+    def test(self, _):
+        inst = PathSegment(self._mk_p(2))
+        new_asm = ASMarking.P_CLS.new_message(isdas="2-0")
+        # Call
+        p = inst._copy_p([new_asm])
+        # Tests
+        ntools.eq_(p.info, b"info")
+        ntools.eq_(p.ifID, 3)
+        ntools.eq_([asm.isdas for asm in p.asms], ["1-0", "1-1", "2-0"])
+        ntools.assert_false(p.exts._has("sibra"))
+        ntools.eq_(len(inst.p.asms), 2)
+
+    @patch("lib.packet.pcb.PathSegment._setup", autospec=True)
+    def test_sibra(self, _):
+        inst = PathSegment(self._mk_p(1, sibra=True))
+        # Call
+        p = inst._copy_p([])
+        # Tests
+        ntools.eq_(p.exts.sibra.id, b"sibra id")
+
+
 if __name__ == "__main__":
     nose.run(defaultTest=__name__)
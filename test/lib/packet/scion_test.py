@@ -25,10 +25,11 @@ import nose.tools as ntools
 # SCION
 from lib.errors import SCIONIndexError, SCIONParseError
 from lib.packet.ext_hdr import ExtensionHeader
-from lib.packet.host_addr import HostAddrInvalidType
+from lib.packet.host_addr import HostAddrIPv4, HostAddrInvalidType
 from lib.packet.packet_base import L4HeaderBase, PayloadRaw
 from lib.packet.path import SCIONPath
 from lib.packet.scion import (
+    LazySCIONL4Packet,
     SCIONAddrHdr,
     SCIONBasePacket,
     SCIONCommonHdr,
@@ -36,6 +37,8 @@ from lib.packet.scion import (
     SCIONL4Packet,
     build_base_hdrs,
 )
+from lib.packet.scion_addr import ISD_AS, SCIONAddr
+from lib.packet.scion_udp import SCIONUDPHeader
 from lib.packet.scmp.errors import (
     SCMPBadDstType,
     SCMPBadEnd2End,
@@ -152,6 +155,19 @@ class TestSCIONCommonHdrPack(object):
         ntools.eq_(inst.pack(), expected)
 
 
+class TestSCIONCommonHdrGetOFPtrs(object):
+    """
+    Unit tests for lib.packet.scion.SCIONCommonHdr.get_of_ptrs
+    """
+    def test(self):
+        inst = SCIONCommonHdr()
+        inst.addrs_len = 16
+        inst._iof_idx = 1
+        inst._hof_idx = 3
+        # Call
+        ntools.eq_(inst.get_of_ptrs(), (32, 48))
+
+
 class TestSCIONCommonHdrValidate(object):
     """
     Unit tests for lib.packet.scion.SCIONCommonHdr.validate
@@ -975,6 +991,395 @@ class TestSCIONL4PacketGetOffsetLen(object):
         ntools.eq_(inst._get_offset_len(), 54)
 
 
+class TestLazySCIONL4PacketParse(object):
+    """
+    Unit tests for lib.packet.scion.LazySCIONL4Packet._parse
+    """
+    def _setup(self, cmn_hdr, src_type=AddrType.IPV4, hdr_len=24):
+        inst = LazySCIONL4Packet()
+        inst._parse_exts = create_mock()
+        cmn_hdr.LEN = 8
+        cmn_hdr.return_value = create_mock([
+            "src_addr_type", "addrs_len", "hdr_len", "get_of_idxs"])
+        cmn_hdr.return_value.src_addr_type = src_type
+        cmn_hdr.return_value.addrs_len = 8
+        cmn_hdr.return_value.hdr_len = hdr_len
+        cmn_hdr.return_value.get_of_idxs.return_value = "iof", "hof"
+        return inst
+
+    @patch("lib.packet.scion.parse_path", autospec=True)
+    @patch("lib.packet.scion.SCIONCommonHdr", autospec=True)
+    def test_success(self, cmn_hdr, parse_path):
+        inst = self._setup(cmn_hdr)
+        raw = bytes(range(32))
+        # Call
+        inst._parse(raw)
+        # Tests
+        cmn_hdr.assert_called_once_with(raw[:8])
+        parse_path.assert_called_once_with(raw[16:24], lazy=True)
+        parse_path.return_value.set_of_idxs.assert_called_once_with(
+            "iof", "hof")
+        inst._parse_exts.assert_called_once_with(memoryview(raw))
+        for name in inst.LAZY_ATTRS:
+            ntools.assert_not_in(name, inst.__dict__)
+        ntools.assert_false(inst._modified)
+
+    @patch("lib.packet.scion.SCIONCommonHdr", autospec=True)
+    def test_svc_src(self, cmn_hdr):
+        inst = self._setup(cmn_hdr, src_type=AddrType.SVC)
+        # Call
+        ntools.assert_raises(SCMPBadSrcType, inst._parse, bytes(32))
+
+    @patch("lib.packet.scion.SCIONCommonHdr", autospec=True)
+    def test_hdr_len(self, cmn_hdr):
+        inst = self._setup(cmn_hdr, hdr_len=40)
+        # Call
+        ntools.assert_raises(SCIONParseError, inst._parse, bytes(32))
+
+    def test_too_short(self):
+        inst = LazySCIONL4Packet()
+        # Call
+        ntools.assert_raises(SCIONParseError, inst._parse, bytes(4))
+
+
+class TestLazySCIONL4PacketParseExts(object):
+    """
+    Unit tests for lib.packet.scion.LazySCIONL4Packet._parse_exts
+    """
+    def _setup(self):
+        inst = LazySCIONL4Packet()
+        inst.cmn_hdr = create_mock(["hdr_len", "next_hdr"])
+        inst.cmn_hdr.hdr_len = 8
+        inst.cmn_hdr.next_hdr = ExtensionClass.HOP_BY_HOP
+        return inst
+
+    @patch("lib.packet.scion.Raw", autospec=True)
+    @patch("lib.packet.scion.parse_extensions", autospec=True)
+    def test_success(self, parse_exts, raw):
+        inst = self._setup()
+        parse_exts.return_value = "ext hdrs", L4Proto.UDP, "unknown"
+        # Two extensions (16B and 8B), followed by a UDP header.
+        data = bytes(8) + bytes([ExtensionClass.END_TO_END, 1, 0]) + bytes(13)
+        data += bytes([L4Proto.UDP, 0, 0]) + bytes(5) + bytes(8)
+        # Call
+        inst._parse_exts(memoryview(data))
+        # Tests
+        raw.assert_called_once_with(data[8:32], inst.NAME)
+        parse_exts.assert_called_once_with(
+            raw.return_value, ExtensionClass.HOP_BY_HOP)
+        ntools.eq_(inst.ext_hdrs, "ext hdrs")
+        ntools.eq_(inst._l4_proto, L4Proto.UDP)
+        ntools.eq_(inst._unknown_exts, "unknown")
+        ntools.eq_(inst._l4_offset, 32)
+
+    def test_truncated_ext(self):
+        inst = self._setup()
+        # Call
+        ntools.assert_raises(SCIONParseError, inst._parse_exts,
+                             memoryview(bytes(9)))
+
+    @patch("lib.packet.scion.Raw", autospec=True)
+    @patch("lib.packet.scion.parse_extensions", autospec=True)
+    def test_truncated_l4(self, parse_exts, raw):
+        inst = self._setup()
+        parse_exts.return_value = [], L4Proto.UDP, {}
+        data = bytes(8) + bytes([L4Proto.UDP, 0, 0]) + bytes(9)
+        # Call
+        ntools.assert_raises(SCIONParseError, inst._parse_exts,
+                             memoryview(data))
+
+
+class TestLazySCIONL4PacketDecodeL4(object):
+    """
+    Unit tests for lib.packet.scion.LazySCIONL4Packet._decode_l4
+    """
+    def _setup(self):
+        inst = LazySCIONL4Packet()
+        inst._raw = bytes(range(16))
+        inst._l4_offset = 4
+        inst._l4_proto = L4Proto.UDP
+        inst.addrs = create_mock(["src", "dst"])
+        return inst
+
+    @patch("lib.packet.scion.PayloadRaw", autospec=True)
+    @patch("lib.packet.scion.parse_l4_hdr", autospec=True)
+    @patch("lib.packet.scion.Raw", autospec=True)
+    def test_basic(self, raw, parse_l4_hdr, pld_raw):
+        inst = self._setup()
+        del inst.__dict__["l4_hdr"]
+        del inst.__dict__["_payload"]
+        # Call
+        ntools.eq_(inst.get_payload(), pld_raw.return_value)
+        # Tests
+        raw.assert_called_once_with(bytes(range(4, 16)), inst.NAME)
+        parse_l4_hdr.assert_called_once_with(
+            L4Proto.UDP, raw.return_value, src=inst.addrs.src,
+            dst=inst.addrs.dst)
+        ntools.eq_(inst.l4_hdr, parse_l4_hdr.return_value)
+        pld_raw.assert_called_once_with(raw.return_value.get.return_value)
+
+    @patch("lib.packet.scion.PayloadRaw", autospec=True)
+    @patch("lib.packet.scion.parse_l4_hdr", autospec=True)
+    @patch("lib.packet.scion.Raw", autospec=True)
+    def test_payload_set(self, raw, parse_l4_hdr, pld_raw):
+        inst = self._setup()
+        del inst.__dict__["l4_hdr"]
+        # Call
+        inst._decode_l4()
+        # Tests
+        ntools.assert_false(pld_raw.called)
+
+    @patch("lib.packet.scion.PayloadRaw", autospec=True)
+    @patch("lib.packet.scion.parse_l4_hdr", autospec=True)
+    @patch("lib.packet.scion.Raw", autospec=True)
+    def test_l4_hdr_set(self, raw, parse_l4_hdr, pld_raw):
+        inst = self._setup()
+        del inst.__dict__["_payload"]
+        inst.l4_hdr = "new l4 hdr"
+        # Call
+        ntools.eq_(inst.get_payload(), pld_raw.return_value)
+        # Tests
+        ntools.eq_(inst.l4_hdr, "new l4 hdr")
+
+
+class TestLazySCIONL4PacketPack(object):
+    """
+    Unit tests for lib.packet.scion.LazySCIONL4Packet.pack
+    """
+    def _setup(self):
+        inst = LazySCIONL4Packet()
+        inst._raw = b"cmn hdr addrpathl4pld"
+        inst._l4_offset = 16
+        inst.cmn_hdr = create_mock(["addrs_len", "pack", "total_len"])
+        inst.cmn_hdr.addrs_len = 4
+        inst.cmn_hdr.pack.return_value = b"CMN HDR "
+        inst.cmn_hdr.total_len = 21
+        inst.path = create_mock(["pack"])
+        inst.path.pack.return_value = b"PATH"
+        inst.pack_exts = create_mock()
+        inst.pack_exts.return_value = b""
+        inst.update = create_mock()
+        inst._decode_l4 = create_mock()
+        inst._unmodified = create_mock()
+        inst._unmodified.return_value = False
+        inst._patch_of_ptrs = create_mock()
+        for name in inst.LAZY_ATTRS:
+            del inst.__dict__[name]
+        return inst
+
+    def test_unmodified(self):
+        inst = self._setup()
+        inst._unmodified.return_value = True
+        # Call
+        ntools.eq_(inst.pack(), inst._patch_of_ptrs.return_value)
+        # Tests
+        ntools.assert_false(inst.update.called)
+
+    def test_not_decoded(self):
+        inst = self._setup()
+        # Call
+        ntools.eq_(inst.pack(), b"CMN HDR addrPATHl4pld")
+        # Tests
+        inst.update.assert_called_once_with()
+        ntools.assert_false(inst._decode_l4.called)
+
+    def test_addrs_unchanged(self):
+        inst = self._setup()
+        inst.addrs = create_mock(["pack"])
+        inst.addrs.pack.return_value = b"addr"
+        # Call
+        ntools.eq_(inst.pack(), b"CMN HDR addrPATHl4pld")
+        # Tests
+        ntools.assert_false(inst._decode_l4.called)
+
+    @patch("lib.packet.scion.SCIONL4Packet.pack", autospec=True)
+    def test_addrs_changed(self, super_pack):
+        inst = self._setup()
+        inst.addrs = create_mock(["pack"])
+        inst.addrs.pack.return_value = b"ADDR"
+
+        def decode():
+            inst.l4_hdr = "l4 hdr"
+        inst._decode_l4.side_effect = decode
+        # Call
+        ntools.eq_(inst.pack(), super_pack.return_value)
+        # Tests
+        inst._decode_l4.assert_called_once_with()
+        super_pack.assert_called_once_with(inst)
+
+    @patch("lib.packet.scion.SCIONL4Packet.pack", autospec=True)
+    def test_payload_set(self, super_pack):
+        inst = self._setup()
+        inst.__dict__["_payload"] = "payload"
+
+        def decode():
+            inst.__dict__["l4_hdr"] = "l4 hdr"
+        inst._decode_l4.side_effect = decode
+        # Call
+        ntools.eq_(inst.pack(), super_pack.return_value)
+        # Tests
+        inst._decode_l4.assert_called_once_with()
+        super_pack.assert_called_once_with(inst)
+
+
+class TestLazySCIONL4PacketUnmodified(object):
+    """
+    Unit tests for lib.packet.scion.LazySCIONL4Packet._unmodified
+    """
+    def _setup(self):
+        inst = LazySCIONL4Packet()
+        inst._modified = False
+        inst._raw = b"cmn hdr addr"
+        inst.cmn_hdr = create_mock(["addrs_len"])
+        inst.cmn_hdr.addrs_len = 4
+        for name in inst.LAZY_ATTRS:
+            del inst.__dict__[name]
+        return inst
+
+    def _addrs(self, inst, raw):
+        addrs = create_mock(["pack"])
+        addrs.pack.return_value = raw
+        inst.__dict__["addrs"] = addrs
+
+    def test_unmodified(self):
+        inst = self._setup()
+        # Call
+        ntools.ok_(inst._unmodified())
+
+    def test_addrs_unchanged(self):
+        inst = self._setup()
+        self._addrs(inst, b"addr")
+        # Call
+        ntools.ok_(inst._unmodified())
+
+    def test_addrs_changed(self):
+        inst = self._setup()
+        self._addrs(inst, b"ADDR")
+        # Call
+        ntools.assert_false(inst._unmodified())
+
+    def test_modified(self):
+        inst = self._setup()
+        inst._modified = True
+        # Call
+        ntools.assert_false(inst._unmodified())
+
+    def test_l4_decoded(self):
+        inst = self._setup()
+        inst.__dict__["l4_hdr"] = "l4 hdr"
+        # Call
+        ntools.assert_false(inst._unmodified())
+
+
+class TestLazySCIONL4PacketModified(object):
+    """
+    Unit tests for how lib.packet.scion.LazySCIONL4Packet tracks
+    modifications.
+    """
+    def _setup(self):
+        inst = LazySCIONL4Packet()
+        inst._modified = False
+        return inst
+
+    def _check_set(self, name):
+        inst = self._setup()
+        # Call
+        setattr(inst, name, "value")
+        # Tests
+        ntools.ok_(inst._modified)
+        ntools.eq_(getattr(inst, name), "value")
+
+    def test_set(self):
+        for name in "addrs", "path", "ext_hdrs":
+            yield self._check_set, name
+
+    @patch("lib.packet.scion.SCIONAddrHdr", autospec=True)
+    def test_decode_addrs(self, addr_hdr):
+        inst = self._setup()
+        inst._raw = bytes(16)
+        inst.cmn_hdr = create_mock(["addrs_len", "src_addr_type",
+                                    "dst_addr_type"])
+        inst.cmn_hdr.addrs_len = 8
+        del inst.__dict__["addrs"]
+        # Call
+        ntools.eq_(inst.addrs, addr_hdr.return_value)
+        # Tests
+        ntools.assert_false(inst._modified)
+
+    @patch("lib.packet.scion.SCIONL4Packet.reverse", autospec=True)
+    def test_reverse(self, super_reverse):
+        inst = self._setup()
+        # Call
+        inst.reverse()
+        # Tests
+        ntools.ok_(inst._modified)
+        super_reverse.assert_called_once_with(inst)
+
+
+class TestLazySCIONL4PacketRoundTrip(object):
+    """
+    Round-trip tests for lib.packet.scion.LazySCIONL4Packet, on real packets.
+    """
+    def _raw(self):
+        src = SCIONAddr.from_values(ISD_AS("1-11"), HostAddrIPv4("10.0.0.1"))
+        dst = SCIONAddr.from_values(ISD_AS("2-22"), HostAddrIPv4("10.0.0.2"))
+        cmn_hdr, addr_hdr = build_base_hdrs(src, dst)
+        l4_hdr = SCIONUDPHeader.from_values(src, 1234, dst, 5678)
+        return SCIONL4Packet.from_values(
+            cmn_hdr, addr_hdr, SCIONPath(), [], l4_hdr,
+            PayloadRaw(b"payload")).pack()
+
+    def _reparse(self, raw):
+        pkt = SCIONL4Packet(raw)
+        # Also checks the L4 checksum.
+        pkt.validate(len(raw))
+        return pkt
+
+    def test_unmodified(self):
+        raw = self._raw()
+        inst = LazySCIONL4Packet(raw)
+        inst.addrs
+        # Call
+        ntools.eq_(inst.pack(), raw)
+
+    def test_addrs_changed(self):
+        inst = LazySCIONL4Packet(self._raw())
+        # Call
+        inst.addrs.dst.host = HostAddrIPv4("10.0.0.3")
+        # Tests
+        pkt = self._reparse(inst.pack())
+        ntools.eq_(pkt.addrs.dst.host, HostAddrIPv4("10.0.0.3"))
+        ntools.eq_(pkt.get_payload(), PayloadRaw(b"payload"))
+
+    def test_payload_set(self):
+        inst = LazySCIONL4Packet(self._raw())
+        # Call
+        inst.set_payload(PayloadRaw(b"hello world"))
+        # Tests
+        pkt = self._reparse(inst.pack())
+        ntools.eq_(pkt.get_payload(), PayloadRaw(b"hello world"))
+        ntools.eq_(pkt.addrs.dst.host, HostAddrIPv4("10.0.0.2"))
+
+
+class TestLazySCIONL4PacketPatchOFPtrs(object):
+    """
+    Unit tests for lib.packet.scion.LazySCIONL4Packet._patch_of_ptrs
+    """
+    def test(self):
+        inst = LazySCIONL4Packet()
+        inst._raw = bytes(range(8))
+        inst.path = create_mock(["get_of_idxs"])
+        inst.path.get_of_idxs.return_value = "iof", "hof"
+        inst.cmn_hdr = create_mock(["get_of_ptrs", "set_of_idxs"])
+        inst.cmn_hdr.get_of_ptrs.return_value = 0x20, 0x30
+        # Call
+        ret = inst._patch_of_ptrs()
+        # Tests
+        inst.cmn_hdr.set_of_idxs.assert_called_once_with("iof", "hof")
+        ntools.eq_(ret, bytearray([0, 1, 2, 3, 0x20, 0x30, 6, 7]))
+        ntools.assert_is(ret, inst._raw)
+
+
 class TestBuildBaseHdrs(object):
     """
     Unit tests for lib.packet.scion.build_base_hdrs
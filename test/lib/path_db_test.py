@@ -49,40 +49,51 @@ class TestPathSegmentDBRecordInit(object):
         ntools.eq_(inst.exp_time, 71)
 
 
+def _mk_pcb(exp=0, hops_hash="hash", fidelity=42, first_ia=(1, 2),
+            last_ia=(3, 4), sibra=False, iftokens=()):
+    return create_mock_full({
+        'get_hops_hash()': hops_hash, "get_n_hops()": fidelity,
+        "get_expiration_time()": exp, "first_ia()": first_ia,
+        "last_ia()": last_ia, "is_sibra()": sibra, "short_desc()": "short",
+        "get_all_iftokens()": list(iftokens),
+    }, class_=PathSegment)
+
+
 class TestPathSegmentDBUpdate(object):
     """
     Unit tests for lib.path_db.PathSegmentDB.update
     """
-    def _mk_pcb(self, exp=0):
-        return create_mock_full({
-            'get_hops_hash()': "hash", "get_n_hops()": 42,
-            "get_expiration_time()": exp, "first_ia()": (1, 2),
-            "last_ia()": (3, 4), "is_sibra()": True, "short_desc()": "short",
-        })
-
     @patch("lib.path_db.PathSegmentDBRecord", autospec=True)
     def test_add(self, db_rec):
         inst = PathSegmentDB()
-        inst._db = create_mock_full({'insert()': None}, return_value=[])
-        pcb = self._mk_pcb()
+        inst._insert = create_mock()
+        pcb = _mk_pcb(sibra=True)
         record = create_mock_full({'id': "id str"})
         db_rec.return_value = record
         # Call
         ntools.eq_(inst.update(pcb), DBResult.ENTRY_ADDED)
         # Tests
         db_rec.assert_called_once_with(pcb)
-        inst._db.assert_called_once_with(id="id str", sibra=True)
-        inst._db.insert.assert_called_once_with(record, "id str", 1, 2, 3, 4,
-                                                True)
+        inst._insert.assert_called_once_with(record, True, (1, 2), (3, 4))
+
+    @patch("lib.path_db.PathSegmentDBRecord", autospec=True)
+    def test_reverse(self, db_rec):
+        inst = PathSegmentDB()
+        inst._insert = create_mock()
+        db_rec.return_value = create_mock_full({'id': "id str"})
+        # Call
+        inst.update(_mk_pcb(), reverse=True)
+        # Tests
+        inst._insert.assert_called_once_with(
+            db_rec.return_value, False, (3, 4), (1, 2))
 
     @patch("lib.path_db.PathSegmentDBRecord", autospec=True)
     def test_outdated(self, db_rec):
         inst = PathSegmentDB()
-        pcb = self._mk_pcb(-1)
-        cur_rec = create_mock_full({"pcb": self._mk_pcb(0)})
-        inst._db = create_mock_full(return_value={0: {'record': cur_rec}})
-        record = create_mock_full({'id': "idstr"})
-        db_rec.return_value = record
+        pcb = _mk_pcb(-1)
+        cur_rec = create_mock_full({"pcb": _mk_pcb(0)})
+        inst._records[("idstr", False)] = (cur_rec, [], None)
+        db_rec.return_value = create_mock_full({'id': "idstr"})
         # Call
         ntools.eq_(inst.update(pcb), DBResult.NONE)
         # Tests
@@ -92,15 +103,16 @@ class TestPathSegmentDBUpdate(object):
     @patch("lib.path_db.PathSegmentDBRecord", autospec=True)
     def test_update(self, db_rec):
         inst = PathSegmentDB()
-        pcb = self._mk_pcb(1)
-        cur_rec = create_mock_full({"pcb": self._mk_pcb(0), "id": "cur rec",
+        pcb = _mk_pcb(1)
+        cur_rec = create_mock_full({"pcb": _mk_pcb(0), "id": "record",
                                     "exp_time": 44})
-        inst._db = create_mock_full(return_value={0: {'record': cur_rec}})
+        inst._records[("record", False)] = (cur_rec, [], None)
         db_rec.return_value = create_mock_full({'id': "record", 'exp_time': 32})
         # Call
         ntools.eq_(inst.update(pcb), DBResult.ENTRY_UPDATED)
         # Tests
         ntools.eq_(cur_rec.pcb, pcb)
+        ntools.eq_(cur_rec.exp_time, 1)
 
     @patch("lib.path_store.SCIONTime.get_time", new_callable=create_mock)
     @patch("lib.path_db.PathSegmentDBRecord", autospec=True)
@@ -108,11 +120,11 @@ class TestPathSegmentDBUpdate(object):
         segment_ttl = 300
         inst = PathSegmentDB(segment_ttl)
         cur_rec = create_mock(['pcb', 'id', 'exp_time'])
-        cur_rec.pcb = self._mk_pcb(0)
+        cur_rec.pcb = _mk_pcb(0)
         cur_rec.exp_time = 10
-        inst._db = create_mock_full(return_value={0: {'record': cur_rec}})
-        pcb = self._mk_pcb(1)
-        db_rec.return_value = create_mock(['id'])
+        inst._records[("id", False)] = (cur_rec, [], None)
+        pcb = _mk_pcb(1)
+        db_rec.return_value = create_mock_full({'id': "id"})
         time.return_value = 1
         # Call
         inst.update(pcb)
@@ -121,23 +133,43 @@ class TestPathSegmentDBUpdate(object):
         ntools.eq_(cur_rec.exp_time, 301)
 
 
+class TestPathSegmentDBInsert(object):
+    """
+    Unit tests for lib.path_db.PathSegmentDB._insert
+    """
+    def test(self):
+        inst = PathSegmentDB()
+        recs = [PathSegmentDBRecord(_mk_pcb(5, i, fidelity))
+                for i, fidelity in enumerate((3, 1, 2))]
+        # Call
+        for rec in recs:
+            inst._insert(rec, False, (1, 2), (3, 4))
+        # Tests
+        ntools.eq_(len(inst._records), 3)
+        for key in ((None, None, False), ("first_ia", (1, 2), False),
+                    ("last_ia", (3, 4), False), ("first_isd", 1, False),
+                    ("last_isd", 3, False)):
+            ntools.eq_([i[2] for i in inst._indexes[key]],
+                       [recs[1], recs[2], recs[0]])
+
+
 class TestPathSegmentDBDelete(object):
     """
     Unit tests for lib.path_db.PathSegmentDB.delete
     """
     def test_basic(self):
-        pth_seg_db = PathSegmentDB()
-        pth_seg_db._db = create_mock(['delete'])
-        pth_seg_db._db.return_value = "data1"
-        ntools.eq_(pth_seg_db.delete("data2"), DBResult.ENTRY_DELETED)
-        pth_seg_db._db.assert_called_once_with(id="data2")
-        pth_seg_db._db.delete.assert_called_once_with("data1")
+        inst = PathSegmentDB()
+        rec = PathSegmentDBRecord(_mk_pcb(5, "id"))
+        inst._insert(rec, True, (1, 2), (3, 4))
+        # Call
+        ntools.eq_(inst.delete("id"), DBResult.ENTRY_DELETED)
+        # Tests
+        ntools.eq_(inst._records, {})
+        ntools.eq_(inst._indexes, {})
 
     def test_not_present(self):
-        pth_seg_db = PathSegmentDB()
-        pth_seg_db._db = create_mock()
-        pth_seg_db._db.return_value = False
-        ntools.eq_(pth_seg_db.delete("data"), DBResult.NONE)
+        inst = PathSegmentDB()
+        ntools.eq_(inst.delete("data"), DBResult.NONE)
 
 
 class TestPathSegmentDBDeleteAll(object):
@@ -156,46 +188,157 @@ class TestPathSegmentDBDeleteAll(object):
         assert_these_calls(inst.delete, [call(i) for i in (0, 1, 2)])
 
 
-class TestPathSegmentDBCall(object):
+class TestPathSegmentDBDeleteRevoked(object):
     """
-    Unit tests for lib.path_db.PathSegmentDB.__call__
+    Unit tests for lib.path_db.PathSegmentDB.delete_revoked
     """
     def test(self):
         inst = PathSegmentDB()
-        inst._parse_call_kwargs = create_mock()
-        inst._parse_call_kwargs.return_value = {"arg1": "val1"}
-        inst._exp_call_records = create_mock()
-        inst._sort_call_pcbs = create_mock()
-        inst._db = create_mock()
+        for hops_hash, sibra, iftokens in (
+                ("a", False, (b"t1", b"t2")), ("a", True, (b"t1",)),
+                ("b", False, (b"t3",)), ("c", False, (b"t2", b"t4"))):
+            pcb = _mk_pcb(5, hops_hash, sibra=sibra, iftokens=iftokens)
+            inst._insert(PathSegmentDBRecord(pcb), sibra, (1, 2), (3, 4))
+        # Call
+        ntools.eq_(inst.delete_revoked([b"t0", b"t1", b"t4"]), 3)
+        # Tests
+        ntools.eq_(list(inst._records), [("b", False)])
+        ntools.eq_(inst.delete_revoked([b"t1", b"t2"]), 0)
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_updated(self, time):
+        inst = PathSegmentDB()
+        time.return_value = 0
+        inst.update(_mk_pcb(5, "a", iftokens=(b"t1",)))
+        inst.update(_mk_pcb(6, "a", iftokens=(b"t2",)))
+        # Call
+        ntools.eq_(inst.delete_revoked([b"t1"]), 0)
+        ntools.eq_(inst.delete_revoked([b"t2"]), 1)
+
+
+class TestPathSegmentDBCall(object):
+    """
+    Unit tests for lib.path_db.PathSegmentDB.__call__
+    """
+    def _setup(self, max_res_no=None):
+        inst = PathSegmentDB(max_res_no=max_res_no)
+        pcbs = [
+            _mk_pcb(10, "a", 3, (1, 2), (3, 4)),
+            _mk_pcb(10, "b", 1, (1, 2), (3, 5)),
+            _mk_pcb(10, "c", 2, (1, 3), (3, 4)),
+            _mk_pcb(10, "d", 1, (1, 3), (3, 4), sibra=True),
+        ]
+        for pcb in pcbs:
+            inst._insert(PathSegmentDBRecord(pcb), pcb.is_sibra(),
+                         pcb.first_ia(), pcb.last_ia())
+        return inst, pcbs
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_all(self, time):
+        inst, pcbs = self._setup()
+        time.return_value = 0
         # Call
-        ntools.eq_(inst("data", a="b"), inst._sort_call_pcbs.return_value)
+        ntools.eq_(inst(), [pcbs[1], pcbs[2], pcbs[0]])
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_select(self, time):
+        inst, pcbs = self._setup()
+        time.return_value = 0
+        # Call
+        ntools.eq_(inst(first_isd=1, last_ia=(3, 4)), [pcbs[2], pcbs[0]])
+        ntools.eq_(inst(first_ia=(1, 2), last_ia=(3, 5)), [pcbs[1]])
+        ntools.eq_(inst(last_ia=(3, 4), sibra=True), [pcbs[3]])
+        ntools.eq_(inst(last_isd=2), [])
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_max_res_no(self, time):
+        inst, pcbs = self._setup(max_res_no=1)
+        time.return_value = 0
+        # Call
+        ntools.eq_(inst(), [pcbs[1]])
+        ntools.eq_(inst(full=True), [pcbs[1], pcbs[2], pcbs[0]])
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_expired(self, time):
+        inst, pcbs = self._setup()
+        inst._records[("b", False)][0].exp_time = 5
+        inst._push_expiry(inst._records[("b", False)][0], False)
+        time.return_value = 6
+        # Call
+        ntools.eq_(inst(), [pcbs[2], pcbs[0]])
         # Tests
-        inst._parse_call_kwargs.assert_called_once_with({"a": "b"})
-        inst._db.assert_called_once_with("data", arg1="val1")
-        inst._exp_call_records.assert_called_once_with(inst._db.return_value)
-        inst._sort_call_pcbs.assert_called_once_with(
-            False, inst._exp_call_records.return_value)
+        ntools.assert_not_in("b", inst)
 
 
-class TestPathSegmentDBExpCallRecords(object):
+class TestPathSegmentDBExpire(object):
     """
-    Unit tests for lib.path_db.PathSegmentDB._exp_call_records
+    Unit tests for lib.path_db.PathSegmentDB.expire
     """
-    @patch("lib.path_store.SCIONTime.get_time", new_callable=create_mock)
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
     def test(self, time):
         inst = PathSegmentDB()
-        inst._db = create_mock(['delete'])
-        recs = []
-        for i in range(5):
-            rec = create_mock(['exp_time', 'pcb'])
-            rec.exp_time = i
-            rec.pcb = create_mock(["short_desc"])
-            recs.append({'record': rec})
+        pcbs = []
+        for i in range(3):
+            pcb = _mk_pcb(i, i)
+            inst._insert(PathSegmentDBRecord(pcb), False, (1, 2), (3, 4))
+            pcbs.append(pcb)
         time.return_value = 2
         # Call
-        ntools.eq_(inst._exp_call_records(recs), recs[2:])
+        ntools.eq_(inst.expire(), pcbs[:2])
+        # Tests
+        ntools.eq_(list(inst._records), [(2, False)])
+        ntools.eq_(len(inst._exp_heap), 1)
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_refreshed(self, time):
+        inst = PathSegmentDB()
+        rec = PathSegmentDBRecord(_mk_pcb(1, "id"))
+        inst._insert(rec, False, (1, 2), (3, 4))
+        rec.exp_time = 5
+        inst._push_expiry(rec, False)
+        time.return_value = 3
+        # Call
+        ntools.eq_(inst.expire(), [])
+        # Tests
+        ntools.assert_in("id", inst)
+        ntools.eq_(len(inst._exp_heap), 1)
+
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test_deleted(self, time):
+        inst = PathSegmentDB()
+        inst._insert(PathSegmentDBRecord(_mk_pcb(1, "id")), False, (1, 2),
+                     (3, 4))
+        inst.delete("id")
+        time.return_value = 3
+        # Call
+        ntools.eq_(inst.expire(), [])
+        # Tests
+        ntools.eq_(inst._exp_heap, [])
+
+
+class TestPathSegmentDBGeneration(object):
+    """
+    Unit tests for lib.path_db.PathSegmentDB.get_generation
+    """
+    @patch("lib.path_db.SCIONTime.get_time", new_callable=create_mock)
+    def test(self, time):
+        inst = PathSegmentDB()
+        time.return_value = 0
+        gens = [inst.get_generation()]
+        inst.update(_mk_pcb(5, "a", iftokens=(b"t1",)))
+        gens.append(inst.get_generation())
+        # Outdated, so ignored.
+        inst.update(_mk_pcb(4, "a"))
+        gens.append(inst.get_generation())
+        inst.update(_mk_pcb(6, "a"))
+        gens.append(inst.get_generation())
+        inst.delete("b")
+        gens.append(inst.get_generation())
+        time.return_value = 7
+        gens.append(inst.get_generation())
         # Tests
-        inst._db.delete.assert_called_once_with(recs[:2])
+        ntools.eq_(gens, [0, 1, 1, 2, 2, 3])
+        ntools.eq_(len(inst), 0)
 
 
 if __name__ == "__main__":
@@ -176,10 +176,34 @@ class TestPathStoreRecordUpdate(object):
         deepcopy.assert_called_once_with(pcb)
         ntools.eq_(inst.pcb, deepcopy.return_value)
         ntools.eq_(inst.delay_time, 5)
+        ntools.eq_(inst.raw_delay_time, 6)
         ntools.eq_(inst.last_seen_time, 100)
         ntools.eq_(inst.expiration_time, pcb.get_expiration_time.return_value)
 
 
+class TestPathStoreRecordGetDjKeys(object):
+    """
+    Unit tests for lib.path_store.PathStoreRecord.get_dj_keys
+    """
+    @patch("lib.path_store.PathStoreRecord.__init__", autospec=True,
+           return_value=None)
+    def test(self, init):
+        inst = PathStoreRecord("pcb")
+        inst._dj_keys = None
+        asms = []
+        for i in range(2):
+            hof = create_mock_full({'egress_if': 10 + i})
+            asms.append(create_mock_full({
+                "isd_as()": (1, i), "pcbm()": create_mock_full({'hof()': hof})
+            }))
+        inst.pcb = create_mock_full({"iter_asms()": asms})
+        # Call
+        ntools.eq_(inst.get_dj_keys(), [0, 10, 1, 11])
+        inst.get_dj_keys()
+        # Tests
+        inst.pcb.iter_asms.assert_called_once_with()
+
+
 class TestPathStoreRecordUpdateFidelity(object):
     """
     Unit tests for lib.path_store.PathStoreRecord.update_fidelity
@@ -223,8 +247,9 @@ class TestPathStoreAddSegment(object):
         inst = PathStore("path_policy")
         inst.path_policy = create_mock(["check_filters"])
         inst.path_policy.check_filters.return_value = filter_
-        pcb = create_mock(["get_hops_hash", "get_timestamp"],
-                          class_=PathSegment)
+        inst._rev_index = create_mock(["add"])
+        pcb = create_mock(["get_all_iftokens", "get_hops_hash",
+                           "get_timestamp"], class_=PathSegment)
         return inst, pcb
 
     @patch("lib.path_store.PathStore.__init__", autospec=True,
@@ -246,13 +271,17 @@ class TestPathStoreAddSegment(object):
         Try to add a path that is already in the path store.
         """
         inst, pcb = self._setup()
-        candidate = create_mock(['id', 'update'])
+        candidate = create_mock(['id', 'update', 'expiration_time'])
         candidate.id = pcb.get_hops_hash.return_value
-        inst.candidates = [candidate]
+        inst._candidates = {candidate.id: candidate}
+        inst._push_expiry = create_mock()
         # Call
         inst.add_segment(pcb)
         # Tests
         candidate.update.assert_called_once_with(pcb)
+        ntools.assert_false(inst._push_expiry.called)
+        inst._rev_index.add.assert_called_once_with(
+            candidate.id, pcb.get_all_iftokens.return_value)
 
     @patch("lib.path_store.PathStoreRecord", autospec=True)
     @patch("lib.path_store.PathStore.__init__", autospec=True,
@@ -262,13 +291,19 @@ class TestPathStoreAddSegment(object):
         Add a single path segment to the set of candidate paths.
         """
         inst, pcb = self._setup()
-        inst.candidates = []
+        inst._candidates = {}
+        inst._push_expiry = create_mock()
         inst._trim_candidates = create_mock()
+        record = psr.return_value
+        record.id = "id"
         # Call
         inst.add_segment(pcb)
         # Tests
-        ntools.eq_(inst.candidates, [psr.return_value])
+        ntools.eq_(inst._candidates, {record.id: record})
+        inst._push_expiry.assert_called_once_with(record)
         inst._trim_candidates.assert_called_once_with()
+        inst._rev_index.add.assert_called_once_with(
+            "id", pcb.get_all_iftokens.return_value)
 
 
 class TestPathStoreTrimCandidates(object):
@@ -286,11 +321,11 @@ class TestPathStoreTrimCandidates(object):
         pth_str = PathStore("path_policy")
         pth_str.path_policy = MagicMock(spec_set=['candidates_set_size'])
         pth_str.path_policy.candidates_set_size = 0
-        pth_str.candidates = [0]
+        pth_str._candidates = {0: 0}
         pth_str._remove_expired_segments = (
-            lambda: pth_str.candidates.pop())
+            lambda: pth_str._candidates.pop(0))
         pth_str._trim_candidates()
-        ntools.eq_(pth_str.candidates, [])
+        ntools.eq_(pth_str._candidates, {})
 
     @patch("lib.path_store.PathStore.__init__", autospec=True,
            return_value=None)
@@ -302,36 +337,34 @@ class TestPathStoreTrimCandidates(object):
         pth_str = PathStore("path_policy")
         pth_str.path_policy = MagicMock(spec_set=['candidates_set_size'])
         pth_str.path_policy.candidates_set_size = 2
-        pth_str.candidates = [create_mock(['fidelity']) for i in range(3)]
-        pth_str.candidates[0].fidelity = 2
-        pth_str.candidates[1].fidelity = 0
-        pth_str.candidates[2].fidelity = 1
-        remainder = [pth_str.candidates[0], pth_str.candidates[2]]
+        candidates = [create_mock(['fidelity', 'id']) for i in range(3)]
+        for i, fidelity in enumerate([2, 0, 1]):
+            candidates[i].id = i
+            candidates[i].fidelity = fidelity
+        pth_str._candidates = {c.id: c for c in candidates}
+        pth_str._rev_index = create_mock(["remove"])
         pth_str._remove_expired_segments = create_mock()
         pth_str._update_all_fidelity = create_mock()
         pth_str._trim_candidates()
         pth_str._remove_expired_segments.assert_called_once_with()
         pth_str._update_all_fidelity.assert_called_once_with()
-        ntools.eq_(pth_str.candidates, remainder)
+        ntools.eq_(list(pth_str._candidates), [0, 2])
+        pth_str._rev_index.remove.assert_called_once_with(1)
 
 
-class TestPathStoreUpdateDisjointnessDB(object):
+class TestPathStoreGetDisjointness(object):
     """
-    Unit tests for lib.path_store._update_disjointness_db
+    Unit tests for lib.path_store._get_disjointness
     """
-    @patch("lib.path_store.SCIONTime.get_time", spec_set=[],
-           new_callable=MagicMock)
-    def test_basic(self, time_):
-        path_policy = MagicMock(spec_set=['history_limit'])
-        path_policy.history_limit = 3
-        pth_str = PathStore(path_policy)
-        pth_str.disjointness = {0: math.e, 1: math.e**2}
-        pth_str.last_dj_update = 22
-        time_.return_value = 23
-        pth_str._update_disjointness_db()
-        ntools.eq_(pth_str.last_dj_update, time_.return_value)
-        ntools.assert_almost_equal(pth_str.disjointness[0], 1.0)
-        ntools.assert_almost_equal(pth_str.disjointness[1], math.e)
+    def test(self):
+        inst = PathStore(create_mock_full({'history_limit': 3}))
+        inst.disjointness = {0: (math.e, 22), 1: (math.e**2, 22)}
+        # Call
+        ntools.assert_almost_equal(inst._get_disjointness(0, 23), 1.0)
+        ntools.assert_almost_equal(inst._get_disjointness(1, 23), math.e)
+        ntools.eq_(inst._get_disjointness(2, 23), 0.0)
+        # Tests
+        ntools.eq_(len(inst.disjointness), 2)
 
 
 class TestPathStoreUpdateAllDisjointness(object):
@@ -342,28 +375,33 @@ class TestPathStoreUpdateAllDisjointness(object):
         inst = PathStore(create_mock_full({'history_limit': 3}))
         numCandidates = 5
         pathLength = 5
-        inst.candidates = []
-        inst.disjointness = {}
         for i in range(numCandidates):
             id_ = i * (2 * pathLength + 1)
-            asms = []
+            dj_keys = []
             for j in range(pathLength):
-                isdas = 9, id_ + j + 1
-                hof = create_mock_full({'egress_if': isdas[1] + pathLength})
-                pcbm = create_mock_full({'hof()': hof})
-                asms.append(create_mock_full({
-                    "isd_as()": isdas, "pcbm()": pcbm}))
-                inst.disjointness[isdas[1]] = 1.0
-                inst.disjointness[hof.egress_if] = 1.0
-            pcb = create_mock_full({"iter_asms()": asms})
+                as_ = id_ + j + 1
+                dj_keys.extend([as_, as_ + pathLength])
+            for key in dj_keys:
+                inst.disjointness[key] = (1.0, 3)
             record = create_mock_full(
-                {'pcb': pcb, 'disjointness': 0, 'id': id_})
-            inst.disjointness[id_] = 1.0
-            inst.candidates.append(record)
-        inst._update_disjointness_db = create_mock()
-        inst._update_all_disjointness()
-        for i in range(numCandidates):
-            ntools.assert_almost_equal(inst.candidates[i].disjointness, 1.0)
+                {'get_dj_keys()': dj_keys, 'disjointness': 0, 'id': id_})
+            inst.disjointness[id_] = (1.0, 3)
+            inst._candidates[id_] = record
+        # Call
+        inst._update_all_disjointness(3)
+        # Tests
+        for candidate in inst.candidates:
+            ntools.assert_almost_equal(candidate.disjointness, 1.0)
+
+    def test_empty(self):
+        inst = PathStore(create_mock_full({'history_limit': 3}))
+        record = create_mock_full({'get_dj_keys()': [], 'disjointness': 5})
+        inst._candidates[0] = record
+        # Call
+        inst._update_all_disjointness(3)
+        # Tests
+        ntools.eq_(record.disjointness, 0)
+        ntools.assert_false(record.get_dj_keys.called)
 
 
 class TestPathStoreUpdateAllDelayTime(object):
@@ -374,18 +412,12 @@ class TestPathStoreUpdateAllDelayTime(object):
         path_policy = MagicMock(spec_set=['history_limit'])
         path_policy.history_limit = 3
         pth_str = PathStore(path_policy)
-        pth_str.candidates = [MagicMock(spec_set=['pcb', 'delay_time',
-                                                  'last_seen_time'])
-                              for i in range(5)]
         for i in range(5):
-            pcb = MagicMock(spec_set=['get_timestamp'])
-            pcb.get_timestamp.return_value = 1
-            pth_str.candidates[i].pcb = pcb
-            pth_str.candidates[i].last_seen_time = 2 * i + 2
+            pth_str._candidates[i] = create_mock_full(
+                {'raw_delay_time': 2 * i + 2, 'delay_time': None})
         pth_str._update_all_delay_time()
-        for i in range(5):
-            pth_str.candidates[i].pcb.get_timestamp.assert_called_once_with()
-            ntools.assert_almost_equal(pth_str.candidates[i].delay_time,
+        for i, candidate in enumerate(pth_str.candidates):
+            ntools.assert_almost_equal(candidate.delay_time,
                                        ((2 * i + 2) / 10))
 
 
@@ -393,20 +425,21 @@ class TestPathStoreUpdateAllFidelity(object):
     """
     Unit tests for lib.path_store._update_all_fidelity
     """
-    def test_basic(self):
+    @patch("lib.path_store.SCIONTime.get_time", new_callable=create_mock)
+    def test_basic(self, time_):
         path_policy = MagicMock(spec_set=['history_limit'])
         path_policy.history_limit = 3
         pth_str = PathStore(path_policy)
         pth_str._update_all_disjointness = MagicMock(spec_set=[])
         pth_str._update_all_delay_time = MagicMock(spec_set=[])
-        pth_str.candidates = [MagicMock(spec_set=['update_fidelity'])
-                              for i in range(5)]
+        for i in range(5):
+            pth_str._candidates[i] = MagicMock(spec_set=['update_fidelity'])
         pth_str._update_all_fidelity()
-        pth_str._update_all_disjointness.assert_called_once_with()
+        pth_str._update_all_disjointness.assert_called_once_with(
+            time_.return_value)
         pth_str._update_all_delay_time.assert_called_once_with()
-        for i in range(5):
-            pth_str.candidates[i].update_fidelity.assert_called_once_with(
-                path_policy)
+        for candidate in pth_str.candidates:
+            candidate.update_fidelity.assert_called_once_with(path_policy)
 
 
 class TestPathStoreGetBestSegments(object):
@@ -417,12 +450,12 @@ class TestPathStoreGetBestSegments(object):
         inst = PathStore("path_policy")
         inst._remove_expired_segments = create_mock()
         inst._update_all_fidelity = create_mock()
-        inst.candidates = []
+        inst._candidates = {}
         for i, fidelity in enumerate([0, 5, 2, 6, 3]):
             candidate = create_mock(["pcb", "fidelity", "sending"])
             candidate.pcb = "pcb%d" % i
             candidate.fidelity = fidelity
-            inst.candidates.append(candidate)
+            inst._candidates[i] = candidate
         return inst
 
     @patch("lib.path_store.PathStore.__init__", autospec=True,
@@ -501,15 +534,17 @@ class TestPathStoreRemoveExpiredSegments(object):
         path_policy = MagicMock(spec_set=['history_limit'])
         path_policy.history_limit = 3
         pth_str = PathStore(path_policy)
-        pth_str.candidates = [MagicMock(spec_set=['expiration_time', 'id'])
-                              for i in range(5)]
         for i in range(5):
-            pth_str.candidates[i].expiration_time = i
-            pth_str.candidates[i].id = i
+            candidate = create_mock_full({'expiration_time': i, 'id': i})
+            pth_str._candidates[i] = candidate
+            pth_str._push_expiry(candidate)
+        # Updated since the expiry entry was added.
+        pth_str._candidates[1].expiration_time = 3
+        pth_str._push_expiry(pth_str._candidates[1])
         time_.return_value = 2
-        pth_str.remove_segments = MagicMock(spec_set=[])
         pth_str._remove_expired_segments()
-        pth_str.remove_segments.assert_called_once_with([0, 1, 2])
+        ntools.eq_(list(pth_str._candidates), [1, 3, 4])
+        ntools.eq_(len(pth_str._exp_heap), 3)
 
 
 class TestPathStoreRemoveSegments(object):
@@ -525,27 +560,35 @@ class TestPathStoreRemoveSegments(object):
 
     def test_basic(self):
         pth_str = PathStore(self.path_policy)
-        pth_str.candidates = [MagicMock(spec_set=['id', 'fidelity'])
-                              for i in range(5)]
         for i in range(5):
-            pth_str.candidates[i].id = i
-            pth_str.candidates[i].fidelity = i
-        pth_str._update_all_fidelity = MagicMock(spec_set=[])
-        pth_str.remove_segments([1, 2, 3])
-        ntools.eq_(len(pth_str.candidates), 2)
-        ntools.eq_(pth_str.candidates[0].id, 4)
-        ntools.eq_(pth_str.candidates[1].id, 0)
-        pth_str._update_all_fidelity.assert_called_once_with()
+            pth_str._candidates[i] = create_mock_full({'id': i})
+        pth_str.remove_segments([1, 2, 3, 7])
+        ntools.eq_(list(pth_str._candidates), [0, 4])
 
     def test_none(self):
         pth_str = PathStore(self.path_policy)
-        pth_str.candidates = [MagicMock(spec_set=['id']) for i in range(5)]
         for i in range(5):
-            pth_str.candidates[i].id = i
+            pth_str._candidates[i] = create_mock_full({'id': i})
         pth_str.remove_segments([0, 1, 2, 3, 4])
         ntools.eq_(pth_str.candidates, [])
 
 
+class TestPathStoreGetRevokedIds(object):
+    """
+    Unit tests for lib.path_store.PathStore.get_revoked_ids
+    """
+    def test(self):
+        path_policy = create_mock_full({'history_limit': 3})
+        inst = PathStore(path_policy)
+        for i in range(3):
+            inst._candidates[i] = create_mock_full({'id': i})
+            inst._rev_index.add(i, [bytes([i]), b"x%d" % (i % 2)])
+        # Call
+        ntools.eq_(inst.get_revoked_ids([b"\x00", b"x1"]), {0, 1})
+        inst.remove_segments([1])
+        ntools.eq_(inst.get_revoked_ids([b"x1"]), set())
+
+
 class TestPathStoreGetSegment(object):
     """
     Unit tests for lib.path_store.get_segment
@@ -559,16 +602,12 @@ class TestPathStoreGetSegment(object):
 
     def test_basic(self):
         pth_str = PathStore(self.path_policy)
-        pth_str.candidates = [MagicMock(spec_set=['id', 'pcb'])
-                              for i in range(5)]
         for i in range(5):
-            pth_str.candidates[i].id = i
-            pth_str.candidates[i].pcb = i
+            pth_str._candidates[i] = create_mock_full({'id': i, 'pcb': i})
         ntools.eq_(pth_str.get_segment(2), 2)
 
     def test_not_present(self):
         pth_str = PathStore(self.path_policy)
-        pth_str.candidates = [MagicMock(spec_set=['id']) for i in range(5)]
         ntools.assert_is_none(pth_str.get_segment(2))
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+# Copyright 2016 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`lib_rev_index_test` --- lib.rev_index unit tests
+======================================================
+"""
+# External packages
+import nose
+import nose.tools as ntools
+
+# SCION
+from lib.rev_index import RevocationIndex
+
+
+class TestRevocationIndexAdd(object):
+    """
+    Unit tests for lib.rev_index.RevocationIndex.add
+    """
+    def test(self):
+        inst = RevocationIndex()
+        # Call
+        inst.add("a", [b"t1", b"t2"])
+        inst.add("b", [b"t2"])
+        # Tests
+        ntools.eq_(inst._tokens, {b"t1": {"a"}, b"t2": {"a", "b"}})
+        ntools.eq_(inst._ids, {"a": {b"t1", b"t2"}, "b": {b"t2"}})
+
+    def test_replace(self):
+        inst = RevocationIndex()
+        inst.add("a", [b"t1", b"t2"])
+        # Call
+        inst.add("a", [b"t2", b"t3"])
+        # Tests
+        ntools.eq_(inst._tokens, {b"t2": {"a"}, b"t3": {"a"}})
+        ntools.eq_(inst._ids, {"a": {b"t2", b"t3"}})
+
+
+class TestRevocationIndexRemove(object):
+    """
+    Unit tests for lib.rev_index.RevocationIndex.remove
+    """
+    def test(self):
+        inst = RevocationIndex()
+        inst.add("a", [b"t1", b"t2"])
+        inst.add("b", [b"t2"])
+        # Call
+        inst.remove("a")
+        inst.remove("c")
+        # Tests
+        ntools.eq_(inst._tokens, {b"t2": {"b"}})
+        ntools.eq_(inst._ids, {"b": {b"t2"}})
+
+
+class TestRevocationIndexLookup(object):
+    """
+    Unit tests for lib.rev_index.RevocationIndex.lookup
+    """
+    def test(self):
+        inst = RevocationIndex()
+        inst.add("a", [b"t1", b"t2"])
+        inst.add("b", [b"t2"])
+        inst.add("c", [b"t3"])
+        # Call
+        ntools.eq_(inst.lookup([b"t0", b"t2"]), {"a", "b"})
+        ntools.eq_(inst.lookup([b"t4"]), set())
+
+
+if __name__ == "__main__":
+    nose.run(defaultTest=__name__)
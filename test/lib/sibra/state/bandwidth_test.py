@@ -20,10 +20,51 @@ import nose
 import nose.tools as ntools
 
 # SCION
-from lib.sibra.state.bandwidth import LinkBandwidth
+from lib.sibra.state.bandwidth import BWTimeline, LinkBandwidth
 from lib.sibra.util import BWSnapshot
 
 
+class TestBWTimelineRollover(object):
+    """
+    Unit tests for lib.sibra.state.bandwidth.BWTimeline.rollover
+    """
+    def test(self):
+        inst = BWTimeline(4)
+        for i, bw in enumerate([50, -10, 0, -20]):
+            inst.set(i, bw, bw * 2)
+        # Call
+        inst.rollover()
+        inst.rollover()
+        # Tests
+        for i, bw in enumerate([40, -20, 0, 0]):
+            ntools.eq_(inst.get(i), (bw, bw * 2))
+
+    def test_multiple(self):
+        inst = BWTimeline(4)
+        for i, bw in enumerate([50, -10, 0, -20]):
+            inst.set(i, bw, bw * 2)
+        # Call
+        inst.rollover(2)
+        # Tests
+        for i, bw in enumerate([40, -20, 0, 0]):
+            ntools.eq_(inst.get(i), (bw, bw * 2))
+
+    def test_past_end(self):
+        inst = BWTimeline(4)
+        for i, bw in enumerate([50, -10, 0, -20]):
+            inst.set(i, bw, bw * 2)
+        # Call
+        inst.rollover(10)
+        # Tests
+        for i, bw in enumerate([20, 0, 0, 0]):
+            ntools.eq_(inst.get(i), (bw, bw * 2))
+
+    def test_out_of_range(self):
+        inst = BWTimeline(4)
+        inst.rollover()
+        ntools.assert_raises(IndexError, inst.get, 4)
+
+
 class TestLinkBandwidthUpdate(object):
     """
     Unit tests for lib.sibra.state.bandwidth.LinkBandwidth.update
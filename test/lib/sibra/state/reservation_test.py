@@ -23,6 +23,7 @@ import nose
 import nose.tools as ntools
 
 # SCION
+from lib.sibra.state.bandwidth import BWTimeline
 from lib.sibra.state.reservation import ReservationBase, SteadyReservation
 from lib.sibra.util import BWSnapshot
 from test.testcommon import create_mock
@@ -96,9 +97,9 @@ class TestReservationBaseUpdate(object):
     def _check(self, old_resvs, resvs, updates, super_init):
         inst = ReservationBaseTesting("path id", "owner", "parent")
         inst.parent = create_mock(["update"])
-        inst.resvs = []
-        for bw in old_resvs:
-            inst.resvs.append(BWSnapshot(bw * 1024, bw * 1024))
+        inst.resvs = BWTimeline(len(old_resvs))
+        for i, bw in enumerate(old_resvs):
+            inst.resvs[i] = BWSnapshot(bw * 1024, bw * 1024)
         for idx, exp_tick, bw in resvs:
             inst.order.append(idx)
             resv = create_mock(["bwsnap", "exp_tick"])
@@ -133,6 +134,10 @@ class TestReservationBaseUpdate(object):
         update = [(0, -10), (1, -10), (2, +10), (6, 10)]
         self._check(old_resvs, resvs, update)
 
+    def test_remove_all(self):
+        old_resvs = [50, 0, -10, -20, -20]
+        self._check(old_resvs, [], [(0, -50)])
+
 
 class TestReservationBaseNext(object):
     """
@@ -147,6 +152,7 @@ class TestReservationBaseNext(object):
         inst._rollover = create_mock()
         inst._expire = create_mock()
         inst.resvs = ["new max bw"]
+        inst.last_tick = 7
         for i in range(3):
             resv = create_mock(["exp_tick"])
             resv.exp_tick = 9 + i
@@ -154,12 +160,36 @@ class TestReservationBaseNext(object):
         # Call
         inst.next(10)
         # Tests
-        super_next.assert_called_once_with(inst)
-        inst._rollover.assert_called_once_with(inst.child_resvs)
+        ntools.eq_(inst.last_tick, 10)
+        super_next.assert_called_once_with(inst, 3)
+        inst._rollover.assert_called_once_with(inst.child_resvs, 3)
         ntools.eq_(inst.max_bw, "new max bw")
         ntools.eq_(inst.child_used, bwsnap.return_value)
         inst._expire.assert_called_once_with([0], 10)
 
+    @patch("lib.sibra.state.reservation.BandwidthBase.next", autospec=True)
+    @patch("lib.sibra.state.reservation.BandwidthBase.__init__", autospec=True,
+           return_value=None)
+    def test_up_to_date(self, super_init, super_next):
+        inst = ReservationBaseTesting("path id", "owner", "parent")
+        inst.idxes = {0: "idx 0"}
+        inst.last_tick = 10
+        # Call
+        ntools.eq_(inst.next(10), 1)
+        # Tests
+        ntools.assert_false(super_next.called)
+
+    @patch("lib.sibra.state.reservation.BandwidthBase.next", autospec=True)
+    @patch("lib.sibra.state.reservation.BandwidthBase.__init__", autospec=True,
+           return_value=None)
+    def test_new(self, super_init, super_next):
+        inst = ReservationBaseTesting("path id", "owner", "parent")
+        # Call
+        ntools.eq_(inst.next(10), 0)
+        # Tests
+        ntools.eq_(inst.last_tick, 10)
+        ntools.assert_false(super_next.called)
+
 
 class TestReservationBaseUse(object):
     """
@@ -37,22 +37,49 @@ class TestSibraStateUpdateTick(object):
         inst = SibraState("bw", "isd as")
         inst.curr_tick = 0
         inst.link = create_mock(["next"])
-        inst.steady = "steady"
-        inst.ephemeral = "ephemeral"
-        inst._resv_tick = create_mock()
         curr_tick.return_value = 3
         # Call
         inst.update_tick()
         # Tests
         ntools.eq_(inst.curr_tick, 3)
-        assert_these_calls(inst.link.next, [call()] * 3)
-        assert_these_calls(inst._resv_tick,
-                           [call("steady"), call("ephemeral")] * 3)
+        inst.link.next.assert_called_once_with(3)
+
+    @patch("lib.sibra.state.state.current_tick", autospec=True)
+    @patch("lib.sibra.state.state.LinkBandwidth", autospec=True)
+    def test_same_tick(self, _, curr_tick):
+        inst = SibraState("bw", "isd as")
+        inst.curr_tick = 3
+        inst.link = create_mock(["next"])
+        curr_tick.return_value = 3
+        # Call
+        inst.update_tick()
+        # Tests
+        ntools.assert_false(inst.link.next.called)
 
 
-class TestSibraStateResvTick(object):
+class TestSibraStateSweep(object):
     """
-    Unit tests for lib.sibra.state.state.SibraState._resv_tick
+    Unit tests for lib.sibra.state.state.SibraState.sweep
+    """
+    @patch("lib.sibra.state.state.LinkBandwidth", autospec=True)
+    def test(self, _):
+        inst = SibraState("bw", "isd as")
+        inst.update_tick = create_mock()
+        inst._advance = create_mock()
+        inst.steady = {"s0": "resv s0"}
+        inst.ephemeral = {"e0": "resv e0", "e1": "resv e1"}
+        # Call
+        inst.sweep()
+        # Tests
+        inst.update_tick.assert_called_once_with()
+        assert_these_calls(inst._advance, [
+            call(inst.steady, "s0"), call(inst.ephemeral, "e0"),
+            call(inst.ephemeral, "e1")], any_order=True)
+
+
+class TestSibraStateAdvance(object):
+    """
+    Unit tests for lib.sibra.state.state.SibraState._advance
     """
     @patch("lib.sibra.state.state.LinkBandwidth", autospec=True)
     def test(self, _):
@@ -61,16 +88,23 @@ class TestSibraStateResvTick(object):
         resvs = []
         for i in range(4):
             resv = create_mock(["next"])
-            resv.next.return_value = bool(i % 2)
+            resv.next.return_value = i % 2
             resvs.append(resv)
         resv_dict = dict(enumerate(resvs))
         # Calls
-        inst._resv_tick(resv_dict)
+        for i in range(4):
+            ntools.eq_(inst._advance(resv_dict, i), resvs[i] if i % 2 else None)
         # Tests
         for resv in resvs:
             resv.next.assert_called_once_with("curr tick")
         ntools.eq_(resv_dict, {1: resvs[1], 3: resvs[3]})
 
+    @patch("lib.sibra.state.state.LinkBandwidth", autospec=True)
+    def test_missing(self, _):
+        inst = SibraState("bw", "isd as")
+        # Call
+        ntools.assert_is_none(inst._advance({}, "path id"))
+
 
 class TestSibraStateAddSteady(object):
     """
@@ -98,6 +132,7 @@ class TestSibraStateAddSteady(object):
     def test_renewal_denied(self, _):
         inst = SibraState("bw", "isd as")
         inst.update_tick = create_mock()
+        inst._advance = create_mock()
         inst._add = create_mock()
         inst.steady["path id"] = "resv"
         # Call
@@ -106,6 +141,7 @@ class TestSibraStateAddSteady(object):
                             "accepted", setup=False),
             inst._add.return_value)
         # Tests
+        inst._advance.assert_called_once_with(inst.steady, "path id")
         inst._add.assert_called_once_with(
             "resv", "resv idx", "bwsnap", "exp_tick", "accepted")
 
@@ -118,6 +154,7 @@ class TestSibraStateAddEphemeral(object):
     def test_setup_success(self, _):
         inst = SibraState("bw", "isd as")
         inst.update_tick = create_mock()
+        inst._advance = create_mock()
         inst._create_ephemeral = create_mock()
         inst._create_ephemeral.return_value = "resv"
         inst._add = create_mock()
@@ -128,6 +165,7 @@ class TestSibraStateAddEphemeral(object):
                            "exp_tick", "accepted")
         # Tests
         inst.update_tick.assert_called_once_with()
+        inst._advance.assert_called_once_with(inst.steady, "steady id")
         inst._create_ephemeral.assert_called_once_with("path id", "steady id")
         inst._add.assert_called_once_with(
             "resv", "resv idx", "bwsnap", "exp_tick", "accepted")
@@ -139,6 +177,7 @@ class TestSibraStateAddEphemeral(object):
     def test_renewal_denied(self, _):
         inst = SibraState("bw", "isd as")
         inst.update_tick = create_mock()
+        inst._advance = create_mock()
         inst._add = create_mock()
         inst.ephemeral["path id"] = "resv"
         # Call
@@ -147,6 +186,7 @@ class TestSibraStateAddEphemeral(object):
                                "exp_tick", "accepted", setup=False),
             inst._add.return_value)
         # Tests
+        inst._advance.assert_called_once_with(inst.ephemeral, "path id")
         inst._add.assert_called_once_with(
             "resv", "resv idx", "bwsnap", "exp_tick", "accepted")
 
@@ -159,7 +199,7 @@ class TestSibraStateAdd(object):
     def test_full(self, _):
         inst = SibraState("bw", "isd as")
         inst.curr_tick = "curr tick"
-        resv = create_mock(["add"])
+        resv = create_mock(["add", "next"])
         bwhint_cls = create_mock(["floor"])
         bwhint = create_mock(["to_classes"])
         bwhint.to_classes.return_value = bwhint_cls
@@ -168,6 +208,7 @@ class TestSibraStateAdd(object):
         ntools.eq_(inst._add(resv, "resv idx", "bwsnap", "exp_tick", False),
                    bwhint_cls.floor.return_value)
         # Tests
+        resv.next.assert_called_once_with("curr tick")
         resv.add.assert_called_once_with("resv idx", "bwsnap", "exp_tick",
                                          "curr tick")
         bwhint.to_classes.assert_called_once_with(floor=True)
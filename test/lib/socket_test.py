@@ -61,6 +61,16 @@ class TestUDPSocketInit(object):
         socket_.assert_called_once_with(socket.AF_INET6, socket.SOCK_DGRAM)
         ntools.assert_false(bind.called)
 
+    @patch("lib.socket.UDPSocket.bind", autospec=True)
+    @patch("lib.socket.socket", autospec=True)
+    def test_reuse_port(self, socket_, bind):
+        socket_.return_value = create_mock(["setsockopt"])
+        # Call
+        UDPSocket(reuse_port=True)
+        # Tests
+        socket_.return_value.setsockopt.assert_called_once_with(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
 
 class TestUDPSocketBind(object):
     """
@@ -181,6 +191,48 @@ class TestUDPSocketRecv(object):
         ntools.eq_(inst.sock.recvfrom.call_count, 3)
 
 
+class TestUDPSocketRecvMany(object):
+    """
+    Unit tests for lib.socket.UDPSocket.recv_many
+    """
+    def _setup(self, *sizes):
+        inst = UDPSocket()
+        inst._recv_buf = bytearray(SCION_BUFLEN)
+        inst.sock = create_mock(["recvfrom_into"])
+        sizes = list(sizes)
+
+        def recvfrom_into(buf, nbytes, flags):
+            size = sizes.pop(0)
+            if not isinstance(size, int):
+                raise size
+            buf[:size] = bytes([size]) * size
+            return size, "addr%d" % size
+        inst.sock.recvfrom_into.side_effect = recvfrom_into
+        return inst
+
+    @patch("lib.socket.UDPSocket.__init__", autospec=True, return_value=None)
+    def test_count(self, init):
+        inst = self._setup(3, 4, 5)
+        # Call
+        ret = inst.recv_many(2)
+        # Tests
+        ntools.eq_(ret, [(bytearray(b"\x03" * 3), "addr3"),
+                         (bytearray(b"\x04" * 4), "addr4")])
+        ntools.eq_(inst.sock.recvfrom_into.call_count, 2)
+        for _, args, _ in inst.sock.recvfrom_into.mock_calls:
+            # The same buffer is reused for each datagram.
+            ntools.assert_is(args[0], inst._recv_buf)
+            ntools.eq_(args[1:], (0, socket.MSG_DONTWAIT))
+        for raw, _ in ret:
+            ntools.assert_is_instance(raw, bytearray)
+
+    @patch("lib.socket.UDPSocket.__init__", autospec=True, return_value=None)
+    def test_drained(self, init):
+        inst = self._setup(InterruptedError, 3, BlockingIOError)
+        # Call
+        ntools.eq_(inst.recv_many(5), [(bytearray(b"\x03" * 3), "addr3")])
+
+
 class TestSocketMgrSelect(object):
     """
     Unit tests for lib.socket.SocketMgr.select
@@ -32,7 +32,8 @@ class TestTrustStoreGetTrc(object):
     """
     def _init(self):
         inst = TrustStore("conf_dir")
-        inst._trcs[1] = [(1, 'trc1'), (3, 'trc3'), (0, 'trc0')]
+        inst._trcs[1] = {1: 'trc1', 3: 'trc3', 0: 'trc0'}
+        inst._latest_trcs[1] = 3, 'trc3'
         return inst
 
     def test_non_existing_isd(self):
@@ -62,7 +63,8 @@ class TestTrustStoreGetCert(object):
     """
     def _init(self):
         inst = TrustStore("conf_dir")
-        inst._certs["1-1"] = [(1, 'cert1'), (3, 'cert3'), (0, 'cert0')]
+        inst._certs["1-1"] = {1: 'cert1', 3: 'cert3', 0: 'cert0'}
+        inst._latest_certs["1-1"] = 3, 'cert3'
         return inst
 
     def test_non_existing_as(self):
@@ -86,35 +88,72 @@ class TestTrustStoreGetCert(object):
         ntools.eq_(inst.get_cert("1-1", 1), 'cert1')
 
 
+class TestTrustStoreGetPackedCert(object):
+    """
+    Unit tests for lib.trust_store.TrustStore.get_packed_cert
+    """
+    def test(self):
+        inst = TrustStore("conf_dir")
+        cert = create_mock(['pack'])
+        inst._certs["1-1"] = {1: cert}
+        # Call
+        ntools.eq_(inst.get_packed_cert("1-1", 1), cert.pack.return_value)
+        ntools.eq_(inst.get_packed_cert("1-1", 1), cert.pack.return_value)
+        # Tests
+        cert.pack.assert_called_once_with(lz4_=True)
+
+    def test_non_existing_version(self):
+        inst = TrustStore("conf_dir")
+        inst._certs["1-1"] = {1: 'cert1'}
+        # Call
+        ntools.eq_(inst.get_packed_cert("1-1", 2), None)
+
+
 class TestTrustStoreAddTrc(object):
     """
     Unit tests for lib.trust_store.TrustStore.add_trc
     """
+    def _init(self):
+        inst = TrustStore("conf_dir")
+        inst._trcs[1] = {0: 'trc0', 1: 'trc1'}
+        inst._latest_trcs[1] = 1, 'trc1'
+        return inst
+
     @patch("lib.trust_store.write_file", autospec=True)
     def test_add_unique_version(self, write_file):
-        inst = TrustStore("conf_dir")
-        inst._trcs[1] = [(0, 'trc0'), (1, 'trc1')]
-        trcs_before = inst._trcs[1][:]
+        inst = self._init()
         trc = create_mock(['get_isd_ver'])
         trc.get_isd_ver.return_value = (1, 2)
         # Call
         inst.add_trc(trc)
         # Tests
-        ntools.eq_(inst._trcs[1], trcs_before + [(2, trc)])
+        ntools.eq_(inst._trcs[1], {0: 'trc0', 1: 'trc1', 2: trc})
+        ntools.eq_(inst._latest_trcs[1], (2, trc))
         write_file.assert_called_once_with(
             "conf_dir/certs/ISD1-V2.trc", str(trc))
 
+    @patch("lib.trust_store.write_file", autospec=True)
+    def test_add_old_version(self, write_file):
+        inst = self._init()
+        del inst._trcs[1][0]
+        trc = create_mock(['get_isd_ver'])
+        trc.get_isd_ver.return_value = (1, 0)
+        # Call
+        inst.add_trc(trc)
+        # Tests
+        ntools.eq_(inst._trcs[1], {0: trc, 1: 'trc1'})
+        ntools.eq_(inst._latest_trcs[1], (1, 'trc1'))
+
     @patch("lib.trust_store.write_file", autospec=True)
     def test_add_non_unique_version(self, write_file):
-        inst = TrustStore("conf_dir")
-        inst._trcs[1] = [(0, 'trc0'), (1, 'trc1')]
-        trcs_before = inst._trcs[1][:]
+        inst = self._init()
         trc = create_mock(['get_isd_ver'])
         trc.get_isd_ver.return_value = (1, 1)
         # Call
         inst.add_trc(trc)
         # Tests
-        ntools.eq_(inst._trcs[1], trcs_before)
+        ntools.eq_(inst._trcs[1], {0: 'trc0', 1: 'trc1'})
+        ntools.eq_(inst._latest_trcs[1], (1, 'trc1'))
         ntools.assert_false(write_file.called)
 
 
@@ -122,29 +161,33 @@ class TestTrustStoreAddCert(object):
     """
     Unit tests for lib.trust_store.TrustStore.add_cert
     """
+    def _init(self):
+        inst = TrustStore("conf_dir")
+        inst._certs[(1, 1)] = {0: 'cert0', 1: 'cert1'}
+        inst._latest_certs[(1, 1)] = 1, 'cert1'
+        return inst
+
     @patch("lib.trust_store.write_file", autospec=True)
     def test_add_unique_version(self, write_file):
-        inst = TrustStore("conf_dir")
-        inst._certs[(1, 1)] = [(0, 'cert0'), (1, 'cert1')]
-        certs_before = inst._certs[(1, 1)][:]
+        inst = self._init()
         cert = create_mock(['get_leaf_isd_as_ver'])
         cert.get_leaf_isd_as_ver.return_value = ((1, 1), 2)
         # Call
         inst.add_cert(cert)
         # Tests
-        ntools.eq_(inst._certs[(1, 1)], certs_before + [(2, cert)])
+        ntools.eq_(inst._certs[(1, 1)], {0: 'cert0', 1: 'cert1', 2: cert})
+        ntools.eq_(inst._latest_certs[(1, 1)], (2, cert))
         write_file.assert_called_once_with(
             "conf_dir/certs/ISD1-AS1-V2.crt", str(cert))
 
     @patch("lib.trust_store.write_file", autospec=True)
     def test_add_non_unique_version(self, write_file):
-        inst = TrustStore("conf_dir")
-        inst._certs[(1, 1)] = [(0, 'cert0'), (1, 'cert1')]
-        certs_before = inst._certs[(1, 1)][:]
+        inst = self._init()
         cert = create_mock(['get_leaf_isd_as_ver'])
         cert.get_leaf_isd_as_ver.return_value = ((1, 1), 1)
         # Call
         inst.add_cert(cert)
         # Tests
-        ntools.eq_(inst._certs[(1, 1)], certs_before)
+        ntools.eq_(inst._certs[(1, 1)], {0: 'cert0', 1: 'cert1'})
+        ntools.eq_(inst._latest_certs[(1, 1)], (1, 'cert1'))
         ntools.assert_false(write_file.called)
@@ -17,6 +17,8 @@
 """
 # Stdlib
 import logging
+import threading
+from collections import deque
 from unittest.mock import MagicMock, call, patch
 
 # External packages
@@ -36,7 +38,6 @@ from kazoo.handlers.threading import KazooTimeoutError
 from lib.thread import thread_safety_net
 from lib.zookeeper import (
     ZkNoConnection,
-    ZkNoNodeError,
     ZkParty,
     ZkRetryLimit,
     ZkSharedCache,
@@ -457,6 +458,94 @@ class TestZookeeperEnsurePath(BaseZookeeper):
             yield self._check_error, excp
 
 
+class TestZookeeperGetData(BaseZookeeper):
+    """
+    Unit tests for lib.zookeeper.Zookeeper.get_data
+    """
+    def _setup(self):
+        inst = self._init_basic_setup()
+        inst.prefix = "/prefix"
+        inst.kazoo = create_mock(["get"])
+        return inst
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def test_success(self, init):
+        inst = self._setup()
+        inst.kazoo.get.return_value = ("data", "meta")
+        # Call
+        ntools.eq_(inst.get_data("node"), "data")
+        # Tests
+        inst.kazoo.get.assert_called_once_with("/prefix/node")
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def test_no_node(self, init):
+        inst = self._setup()
+        inst.kazoo.get.side_effect = NoNodeError
+        # Call
+        ntools.assert_is_none(inst.get_data("node"))
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def _check_error(self, excp, init):
+        inst = self._setup()
+        inst.kazoo.get.side_effect = excp
+        # Call
+        ntools.assert_raises(ZkNoConnection, inst.get_data, "node")
+
+    def test_errors(self):
+        for excp in ConnectionLoss, SessionExpiredError:
+            yield self._check_error, excp
+
+
+class TestZookeeperSetData(BaseZookeeper):
+    """
+    Unit tests for lib.zookeeper.Zookeeper.set_data
+    """
+    def _setup(self):
+        inst = self._init_basic_setup()
+        inst.prefix = "/prefix"
+        inst.kazoo = create_mock(["create", "set"])
+        return inst
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def test_set(self, init):
+        inst = self._setup()
+        # Call
+        inst.set_data("node", "data")
+        # Tests
+        inst.kazoo.set.assert_called_once_with("/prefix/node", "data")
+        ntools.assert_false(inst.kazoo.create.called)
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def test_create(self, init):
+        inst = self._setup()
+        inst.kazoo.set.side_effect = NoNodeError
+        # Call
+        inst.set_data("node", "data")
+        # Tests
+        inst.kazoo.create.assert_called_once_with("/prefix/node", "data",
+                                                  makepath=True)
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def test_suddenly_exists(self, init):
+        inst = self._setup()
+        inst.kazoo.set.side_effect = NoNodeError
+        inst.kazoo.create.side_effect = NodeExistsError
+        # Call
+        inst.set_data("node", "data")
+
+    @patch("lib.zookeeper.Zookeeper.__init__", autospec=True, return_value=None)
+    def _check_error(self, excp, init):
+        inst = self._setup()
+        inst.kazoo.set.side_effect = NoNodeError
+        inst.kazoo.create.side_effect = excp
+        # Call
+        ntools.assert_raises(ZkNoConnection, inst.set_data, "node", "data")
+
+    def test_errors(self):
+        for excp in ConnectionLoss, SessionExpiredError:
+            yield self._check_error, excp
+
+
 class TestZookeeperPartySetup(BaseZookeeper):
     """
     Unit tests for lib.zookeeper.Zookeeper.party_setup
@@ -915,10 +1004,9 @@ class TestZkSharedCacheStore(object):
     """
     def _setup(self):
         inst = ZkSharedCache("zk", "path", "handler")
-        inst._path = "/path"
         inst._zk = create_mock(["is_connected"])
-        inst._kazoo = create_mock(["create", "set"])
-        inst._incoming_entries = create_mock(["append"])
+        inst._pending = deque(maxlen=2)
+        inst._pending_lock = threading.Lock()
         return inst
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
@@ -930,67 +1018,132 @@ class TestZkSharedCacheStore(object):
         ntools.assert_raises(ZkNoConnection, inst.store, 'n', 'v')
         # Tests
         inst._zk.is_connected.assert_called_once_with()
+        ntools.eq_(list(inst._pending), [])
 
     @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_set(self, init, get_time):
+    def test(self, init, get_time):
         inst = self._setup()
         # Call
         inst.store('n', 'v')
         # Tests
-        inst._kazoo.set.assert_called_once_with("/path/n", "v")
-        ntools.assert_false(inst._kazoo.create.called)
-        inst._incoming_entries.append.assert_called_once_with(
-            ("n", get_time.return_value))
+        ntools.eq_(list(inst._pending), [("n", "v", get_time.return_value)])
 
+    @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def _check_set_conn_loss(self, excp, init):
+    def test_full(self, init, get_time):
         inst = self._setup()
-        inst._kazoo.set.side_effect = excp
+        get_time.side_effect = [0, 1, 2]
         # Call
-        ntools.assert_raises(ZkNoConnection, inst.store, 'n', 'v')
+        for i in range(3):
+            inst.store("n%d" % i, "v%d" % i)
+        # Tests
+        ntools.eq_(list(inst._pending), [("n1", "v1", 1), ("n2", "v2", 2)])
 
-    def test_set_conn_loss(self):
-        for excp in ConnectionLoss, SessionExpiredError:
-            yield self._check_set_conn_loss, excp
 
-    @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
+class TestZkSharedCacheFlush(object):
+    """
+    Unit tests for lib.zookeeper.ZkSharedCache.flush
+    """
+    def _setup(self, create_excps=(), set_excps=()):
+        inst = ZkSharedCache("zk", "path", "handler")
+        inst._path = "/path"
+        inst._kazoo = create_mock(["create_async", "set_async"])
+        inst._incoming_entries = {}
+        inst._pending = deque()
+        inst._pending_lock = threading.Lock()
+        results = []
+        for i, excp in enumerate(create_excps):
+            inst._pending.append(("n%d" % i, "v%d" % i, i))
+            result = create_mock(["get"])
+            result.get.side_effect = excp
+            results.append(result)
+        inst._kazoo.create_async.side_effect = results
+        set_results = []
+        for excp in set_excps:
+            result = create_mock(["get"])
+            result.get.side_effect = excp
+            set_results.append(result)
+        inst._kazoo.set_async.side_effect = set_results
+        return inst
+
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_create(self, init, get_time):
+    def test_empty(self, init):
         inst = self._setup()
-        inst._kazoo.set.side_effect = NoNodeError
         # Call
-        inst.store('n', 'v')
+        inst.flush()
         # Tests
-        inst._kazoo.create.assert_called_once_with("/path/n", "v",
-                                                   makepath=True)
-        inst._incoming_entries.append.assert_called_once_with(
-            ("n", get_time.return_value))
+        ntools.assert_false(inst._kazoo.create_async.called)
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_suddenly_exists(self, init):
-        inst = self._setup()
-        inst._kazoo.set.side_effect = NoNodeError
-        inst._kazoo.create.side_effect = NodeExistsError
+    def test_success(self, init):
+        inst = self._setup(
+            create_excps=(None, NodeExistsError, None, NodeExistsError),
+            set_excps=(None, NoNodeError))
         # Call
-        inst.store('n', 'v')
+        inst.flush()
+        # Tests
+        assert_these_calls(inst._kazoo.create_async, [
+            call("/path/n%d" % i, "v%d" % i, makepath=True) for i in range(4)
+        ])
+        assert_these_calls(inst._kazoo.set_async, [
+            call("/path/n1", "v1"), call("/path/n3", "v3")])
+        ntools.eq_(inst._incoming_entries, {"n0": 0, "n2": 2, "n1": 1})
+        ntools.eq_(list(inst._pending), [])
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def _check_create_conn_loss(self, excp, init):
-        inst = self._setup()
-        inst._kazoo.set.side_effect = NoNodeError
-        inst._kazoo.create.side_effect = excp
-        # Call
-        ntools.assert_raises(ZkNoConnection, inst.store, 'n', 'v')
+    def _check_conn_loss(self, excp, init):
+        inst = self._setup(create_excps=(None, excp, NodeExistsError))
+        set_result = create_mock(["get"])
+        set_result.get.side_effect = excp
+
+        def set_async(*args):
+            # Simulate an entry being stored while flushing.
+            inst._pending.append(("stored", "v", 5))
+            return set_result
+        inst._kazoo.set_async.side_effect = set_async
+        # Call
+        ntools.assert_raises(ZkNoConnection, inst.flush)
+        # Tests
+        ntools.eq_(inst._incoming_entries, {"n0": 0})
+        ntools.eq_(list(inst._pending),
+                   [("n1", "v1", 1), ("n2", "v2", 2), ("stored", "v", 5)])
 
-    def test_create_conn_loss(self):
+    def test_conn_loss(self):
         for excp in ConnectionLoss, SessionExpiredError:
-            yield self._check_create_conn_loss, excp
+            yield self._check_conn_loss, excp
+
+    @patch("lib.zookeeper.ZkSharedCache.MAX_PENDING", new=4)
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_conn_loss_full(self, init):
+        inst = self._setup()
+        results = []
+        for i in range(3):
+            inst._pending.append(("n%d" % i, "v%d" % i, i))
+            result = create_mock(["get"])
+            result.get.side_effect = self._store_conn_loss(inst)
+            results.append(result)
+        inst._kazoo.create_async.side_effect = results
+        # Call
+        ntools.assert_raises(ZkNoConnection, inst.flush)
+        # Tests
+        # Entries stored since are kept, the oldest failed ones are dropped.
+        ntools.eq_(list(inst._pending), [
+            ("n2", "v2", 2), ("stored0", "v", 5), ("stored1", "v", 5),
+            ("stored2", "v", 5)])
+
+    def _store_conn_loss(self, inst):
+        def get():
+            # Simulate an entry being stored while flushing.
+            inst._pending.append(("stored%d" % len(inst._pending), "v", 5))
+            raise ConnectionLoss
+        return get
 
 
 class TestZkSharedCacheProcess(object):
@@ -1008,142 +1161,290 @@ class TestZkSharedCacheProcess(object):
         # Tests
         inst._zk.is_connected.assert_called_once_with()
 
+    @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_full(self, init):
+    def test_full(self, init, get_time):
         inst = ZkSharedCache("zk", "path", "handler")
         inst._zk = create_mock(["conn_epoch", "is_connected"])
-        inst._incoming_entries = create_mock(["__bool__", "popleft"])
-        inst._incoming_entries.__bool__.side_effect = True, True, False
-        inst._incoming_entries.popleft.side_effect = ("inc0", 1), ("inc1", 0)
-        inst._entries = {"inc0": 0, "old0": 0}
-        inst._list_entries = create_mock()
-        inst._list_entries.return_value = "inc0", "inc1", "new0"
-        inst._handle_entries = create_mock()
+        inst.flush = create_mock()
+        inst._watch_ended = create_mock()
+        inst._watch_ended.return_value = True
+        inst._setup_watch = create_mock()
+        inst._incoming_entries = {"inc0": 1, "inc1": 0}
+        inst._entries = {"inc0": 0, "old0": 0, "old1": 0}
+        inst._removed = deque(["old0", "gone0"])
+        inst._retry = deque(["retry0"])
+        inst._get_async = create_mock()
+        inst._fetched = deque([("inc1", "data inc1"), ("new0", "data0"),
+                               ("new1", "data1")])
+        inst._handler = create_mock()
         inst._path = "/path"
+        get_time.return_value = 5
         # Call
         inst.process()
         # Tests
-        ntools.eq_(inst._entries, {"inc0": 0, "inc1": 0})
-        inst._handle_entries.assert_called_once_with({"new0"})
+        inst.flush.assert_called_once_with()
+        inst._setup_watch.assert_called_once_with()
+        ntools.eq_(inst._entries, {"inc0": 0, "inc1": 0, "old1": 0,
+                                   "new0": 5, "new1": 5})
+        inst._get_async.assert_called_once_with("retry0")
+        inst._handler.assert_called_once_with(["data0", "data1"])
 
 
-class TestZkSharedCacheGet(object):
+class TestZkSharedCacheWatchEnded(object):
     """
-    Unit tests for lib.zookeeper.ZkSharedCache._get
+    Unit tests for lib.zookeeper.ZkSharedCache._watch_ended
     """
-    @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
+    def _setup(self, epoch=1, stopped=False):
+        inst = ZkSharedCache("zk", "path", "handler")
+        inst._zk = create_mock(["conn_epoch"])
+        inst._zk.conn_epoch = 1
+        inst._watch = "watch"
+        inst._watch_stopped = stopped
+        inst._watch_epoch = epoch
+        return inst
+
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_success(self, init, get_time):
+    def test_running(self, init):
+        inst = self._setup()
+        # Call
+        ntools.assert_false(inst._watch_ended())
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_no_watch(self, init):
+        inst = self._setup()
+        inst._watch = None
+        # Call
+        ntools.ok_(inst._watch_ended())
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_epoch_changed(self, init):
+        inst = self._setup(epoch=0)
+        # Call
+        ntools.ok_(inst._watch_ended())
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_stopped(self, init):
+        inst = self._setup(stopped=True)
+        # Call
+        ntools.ok_(inst._watch_ended())
+
+
+class TestZkSharedCacheSetupWatch(object):
+    """
+    Unit tests for lib.zookeeper.ZkSharedCache._setup_watch
+    """
+    def _setup(self):
         inst = ZkSharedCache("zk", "path", "handler")
         inst._path = "/path"
-        inst._kazoo = create_mock(["get"])
-        inst._kazoo.get.return_value = ("data", "meta")
-        inst._entries = create_mock(["setdefault"])
+        inst._zk = create_mock(["conn_epoch", "ensure_path"])
+        inst._zk.conn_epoch = 3
+        inst._kazoo = create_mock(["ChildrenWatch", "exists"])
+        inst._entries = {"e0": 0, "e1": 0}
+        inst._watched = {"old"}
+        inst._watch = "old watch"
+        inst._watch_id = 1
+        inst._watch_stopped = True
+        inst._watch_lock = threading.Lock()
+        return inst
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test(self, init):
+        inst = self._setup()
+        inst._children_changed = create_mock()
+        inst._path_changed = create_mock()
         # Call
-        ntools.eq_(inst._get("name"), "data")
+        inst._setup_watch()
         # Tests
-        inst._kazoo.get.assert_called_once_with("/path/name")
-        inst._entries.setdefault.assert_called_once_with(
-            "name", get_time.return_value)
+        inst._zk.ensure_path.assert_called_once_with("/path", abs=True)
+        ntools.eq_(inst._watch_id, 2)
+        ntools.eq_(inst._watched, {"e0", "e1"})
+        ntools.eq_(inst._watch_epoch, 3)
+        ntools.assert_false(inst._watch_stopped)
+        ntools.eq_(inst._kazoo.exists.call_count, 1)
+        args, kwargs = inst._kazoo.exists.call_args
+        ntools.eq_(args, ("/path",))
+        kwargs["watch"]("event")
+        inst._path_changed.assert_called_once_with(2, "event")
+        ntools.eq_(inst._kazoo.ChildrenWatch.call_count, 1)
+        args, kwargs = inst._kazoo.ChildrenWatch.call_args
+        ntools.eq_(args[0], "/path")
+        ntools.eq_(kwargs, {"allow_session_lost": False})
+        args[1]("children")
+        inst._children_changed.assert_called_once_with(2, "children")
+        ntools.eq_(inst._watch, inst._kazoo.ChildrenWatch.return_value)
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_no_entry(self, init):
-        inst = ZkSharedCache("zk", "path", "handler")
-        inst._path = "/path"
-        inst._kazoo = create_mock(["get"])
-        inst._kazoo.get.side_effect = NoNodeError
-        inst._entries = create_mock(["pop"])
+    def test_deleted(self, init):
+        inst = self._setup()
+        inst._kazoo.exists.return_value = None
         # Call
-        ntools.assert_raises(ZkNoNodeError, inst._get, "name")
+        inst._setup_watch()
         # Tests
-        inst._kazoo.get.assert_called_once_with("/path/name")
-        inst._entries.pop.assert_called_once_with("name", None)
+        ntools.ok_(inst._watch_stopped)
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def _check_exception(self, excp, expected, init):
-        inst = ZkSharedCache("zk", "path", "handler")
-        inst._path = "/path"
-        inst._kazoo = create_mock(["get"])
-        inst._kazoo.get.side_effect = excp
+    def _check_exception(self, excp, method, init):
+        inst = self._setup()
+        getattr(inst._kazoo, method).side_effect = excp
         # Call
-        ntools.assert_raises(expected, inst._get, "name")
+        ntools.assert_raises(ZkNoConnection, inst._setup_watch)
+        # Tests
+        ntools.assert_is_none(inst._watch)
 
     def test_exceptions(self):
-        for excp, expected in (
-            (ConnectionLoss, ZkNoConnection),
-            (SessionExpiredError, ZkNoConnection),
-        ):
-            yield self._check_exception, excp, expected
+        for excp in ConnectionLoss, SessionExpiredError:
+            for method in "exists", "ChildrenWatch":
+                yield self._check_exception, excp, method
 
 
-class TestZkSharedCacheListEntries(object):
+class TestZkSharedCachePathChanged(object):
     """
-    Unit tests for lib.zookeeper.ZkSharedCache._list_entries
+    Unit tests for lib.zookeeper.ZkSharedCache._path_changed
     """
+    def _setup(self):
+        inst = ZkSharedCache("zk", "path", "handler")
+        inst._watch_id = 2
+        inst._watch_stopped = False
+        inst._watch_lock = threading.Lock()
+        return inst
+
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_sucesss(self, init):
-        inst = ZkSharedCache("zk", "path", "handler")
-        inst._path = "/path"
-        inst._kazoo = create_mock(["get_children"])
-        inst._kazoo.get_children.return_value = [
-            "node0", "node1", "node2", "node3"]
+    def test(self, init):
+        inst = self._setup()
         # Call
-        ntools.eq_(inst._list_entries(),
-                   {"node0", "node1", "node2", "node3"})
+        inst._path_changed(2, "event")
+        # Tests
+        ntools.ok_(inst._watch_stopped)
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def test_no_cache(self, init):
-        inst = ZkSharedCache("zk", "path", "handler")
-        inst._path = "/path"
-        inst._kazoo = create_mock(["get_children"])
-        inst._kazoo.get_children.side_effect = NoNodeError
+    def test_superseded(self, init):
+        inst = self._setup()
         # Call
-        ntools.eq_(inst._list_entries(), set())
+        inst._path_changed(1, "event")
+        # Tests
+        ntools.assert_false(inst._watch_stopped)
+
+
+class TestZkSharedCacheChildrenChanged(object):
+    """
+    Unit tests for lib.zookeeper.ZkSharedCache._children_changed
+    """
+    def _setup(self):
+        inst = ZkSharedCache("zk", "path", "handler")
+        inst._watch_id = 2
+        inst._watch_lock = threading.Lock()
+        inst._watched = {"old0", "old1"}
+        inst._entries = {"old0": 0, "old1": 0, "known": 0}
+        inst._incoming_entries = {"stored": 1}
+        inst._removed = deque()
+        inst._get_async = create_mock()
+        return inst
 
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def _check_children_exception(self, excp, expected, init):
-        inst = ZkSharedCache("zk", "path", "handler")
-        inst._path = "/path"
-        inst._kazoo = create_mock(["get_children"])
-        inst._kazoo.get_children.side_effect = excp
+    def test(self, init):
+        inst = self._setup()
         # Call
-        ntools.assert_raises(expected, inst._list_entries)
+        ntools.assert_is_none(inst._children_changed(
+            2, ["old1", "new0", "new1", "known", "stored"]))
+        # Tests
+        assert_these_calls(inst._get_async, [call("new0"), call("new1")],
+                           any_order=True)
+        ntools.eq_(list(inst._removed), ["old0"])
+        ntools.eq_(inst._watched, {"old1", "new0", "new1", "known", "stored"})
 
-    def test_children_exceptions(self):
-        for excp, expected in (
-            (ConnectionLoss, ZkNoConnection),
-            (SessionExpiredError, ZkNoConnection),
-        ):
-            yield self._check_children_exception, excp, expected
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_superseded(self, init):
+        inst = self._setup()
+        # Call
+        ntools.eq_(inst._children_changed(1, ["new0"]), False)
+        # Tests
+        ntools.assert_false(inst._get_async.called)
+        ntools.eq_(list(inst._removed), [])
+        ntools.eq_(inst._watched, {"old0", "old1"})
 
 
-class TestZkSharedCacheHandleEntries(object):
+class TestZkSharedCacheGetAsync(object):
     """
-    Unit test for lib.zookeeper.ZkSharedCache._handle_entries
+    Unit tests for lib.zookeeper.ZkSharedCache._get_async
     """
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
     def test(self, init):
         inst = ZkSharedCache("zk", "path", "handler")
-        entry_names = ["entry0", "entry1", "entry2", "entry3"]
-        inst._get = create_mock()
-        inst._get.side_effect = [
-            "data0", ZkNoNodeError, "data2", ZkNoConnection
-        ]
         inst._path = "/path"
-        inst._handler = create_mock()
+        inst._kazoo = create_mock(["get_async"])
+        inst._got = create_mock()
+        # Call
+        inst._get_async("name")
+        # Tests
+        inst._kazoo.get_async.assert_called_once_with("/path/name")
+        rawlink = inst._kazoo.get_async.return_value.rawlink
+        ntools.eq_(rawlink.call_count, 1)
+        rawlink.call_args[0][0]("result")
+        inst._got.assert_called_once_with("name", "result")
+
+
+class TestZkSharedCacheGot(object):
+    """
+    Unit tests for lib.zookeeper.ZkSharedCache._got
+    """
+    def _setup(self):
+        inst = ZkSharedCache("zk", "path", "handler")
+        inst._path = "/path"
+        inst._fetched = deque()
+        inst._retry = deque()
+        result = create_mock(["get"])
+        return inst, result
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_success(self, init):
+        inst, result = self._setup()
+        result.get.return_value = ("data", "meta")
+        # Call
+        inst._got("name", result)
+        # Tests
+        ntools.eq_(list(inst._fetched), [("name", "data")])
+        ntools.eq_(list(inst._retry), [])
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def test_no_node(self, init):
+        inst, result = self._setup()
+        result.get.side_effect = NoNodeError
         # Call
-        ntools.eq_(inst._handle_entries(entry_names), 2)
+        inst._got("name", result)
         # Tests
-        assert_these_calls(inst._get, ([call(i) for i in entry_names]))
-        inst._handler.assert_called_once_with(["data0", "data2"])
+        ntools.eq_(list(inst._fetched), [])
+        ntools.eq_(list(inst._retry), [])
+
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def _check_conn_loss(self, excp, init):
+        inst, result = self._setup()
+        result.get.side_effect = excp
+        # Call
+        inst._got("name", result)
+        # Tests
+        ntools.eq_(list(inst._fetched), [])
+        ntools.eq_(list(inst._retry), ["name"])
+
+    def test_conn_loss(self):
+        for excp in ConnectionLoss, SessionExpiredError:
+            yield self._check_conn_loss, excp
 
 
 class TestZkSharedCacheExpire(object):
@@ -1161,13 +1462,20 @@ class TestZkSharedCacheExpire(object):
         # Tests
         inst._zk.is_connected.assert_called_once_with()
 
-    def _setup(self, get_time, entries):
+    def _setup(self, get_time, entries, excps=None):
         inst = ZkSharedCache("zk", "path", "handler")
         inst._zk = create_mock(["is_connected"])
         get_time.return_value = 1000
         inst._entries = entries
-        inst._kazoo = create_mock(["delete"])
+        inst._kazoo = create_mock(["delete_async"])
         inst._path = "/path"
+        excps = excps or {}
+
+        def _delete_async(path):
+            result = create_mock(["get"])
+            result.get.side_effect = excps.get(path)
+            return result
+        inst._kazoo.delete_async.side_effect = _delete_async
         return inst
 
     @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
@@ -1179,28 +1487,39 @@ class TestZkSharedCacheExpire(object):
             entries["entry%d" % last_seen] = last_seen
         inst = self._setup(get_time, entries)
         # Call
-        inst.expire(5)
+        ntools.eq_(inst.expire(5), 2)
         # Tests
-        assert_these_calls(inst._kazoo.delete, [
+        assert_these_calls(inst._kazoo.delete_async, [
             call("/path/entry994"), call("/path/entry990")
         ], any_order=True)
+        ntools.eq_(set(inst._entries), {
+            "entry1000", "entry999", "entry996", "entry995", "entry1001"})
 
     @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
     @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
            return_value=None)
-    def _check_exception(self, excp, expected, init, get_time):
-        inst = self._setup(get_time, {"entry1": 0})
-        inst._kazoo.delete.side_effect = excp
+    def test_already_deleted(self, init, get_time):
+        inst = self._setup(get_time, {"entry0": 0, "entry1": 0},
+                           {"/path/entry0": NoNodeError})
         # Call
-        ntools.assert_raises(expected, inst.expire, 5)
+        ntools.eq_(inst.expire(5), 1)
+        # Tests
+        ntools.eq_(inst._entries, {})
 
-    def test_exceptions(self):
-        for excp, expected in (
-            (NoNodeError, ZkNoNodeError),
-            (ConnectionLoss, ZkNoConnection),
-            (SessionExpiredError, ZkNoConnection),
-        ):
-            yield self._check_exception, excp, expected
+    @patch("lib.zookeeper.SCIONTime.get_time", new_callable=create_mock)
+    @patch("lib.zookeeper.ZkSharedCache.__init__", autospec=True,
+           return_value=None)
+    def _check_conn_loss(self, excp, init, get_time):
+        inst = self._setup(get_time, {"entry0": 0, "entry1": 0},
+                           {"/path/entry0": excp})
+        # Call
+        ntools.assert_raises(ZkNoConnection, inst.expire, 5)
+        # Tests
+        ntools.eq_(inst._entries, {"entry0": 0})
+
+    def test_conn_loss(self):
+        for excp in ConnectionLoss, SessionExpiredError:
+            yield self._check_conn_loss, excp
 
 
 if __name__ == "__main__":